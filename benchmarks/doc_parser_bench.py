@@ -0,0 +1,245 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Doc Parser Benchmark - PlatformDocParser 每个提取器的耗时和峰值内存
+在 benchmarks/corpus/ 中保存的平台文档 (Snapchat, Pinterest, TikTok, Facebook)
+以及放大N倍的合成版本上运行，结果写入JSON文件，可以在不同提交之间比较。
+
+使用方法:
+    python benchmarks/doc_parser_bench.py                         # 结果写入 benchmarks/results/doc_parser.json
+    python benchmarks/doc_parser_bench.py --scales 1 10 50 --repeat 5
+    python benchmarks/doc_parser_bench.py --compare baseline.json --threshold 0.2   # 变慢超过20%时退出码为1
+    python benchmarks/doc_parser_bench.py --record                # 重新下载manifest.json中的文档到语料库
+
+时间取重复运行的最小值/中位数 (不开启tracemalloc)；峰值内存单独运行一次，用tracemalloc测量。
+parse_stream 是流式模式 (64KiB的数据块)；tracemalloc看不到libxml2自己分配的内存，
+它的峰值只包含Python对象 (代码块和提取器在片段之间保留的状态)，不能直接和 parse_api_structure 比较。
+"""
+import argparse
+import json
+import os
+import platform as platform_module
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.service.platform_doc_parser import PlatformDocParser
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'doc_parser.json')
+
+
+def load_corpus(corpus_dir: str = CORPUS_DIR) -> Dict[str, str]:
+    """platform -> recorded HTML"""
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    corpus = {}
+    for name, entry in manifest.items():
+        with open(os.path.join(corpus_dir, entry['file']), 'r', encoding='utf-8') as f:
+            corpus[name] = f.read()
+    return corpus
+
+
+def record_corpus(corpus_dir: str = CORPUS_DIR):
+    """Download the pages listed in manifest.json into the corpus"""
+    parser = PlatformDocParser()
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    for name, entry in manifest.items():
+        try:
+            html = parser.fetch_documentation(entry['url'])
+        except Exception as e:
+            print(f"⚠ {name}: {e}")
+            continue
+        with open(os.path.join(corpus_dir, entry['file']), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"✓ {name}: {len(html)} bytes")
+
+
+def scale_document(html: str, factor: int) -> str:
+    """Synthetic variant: the <body> content repeated factor times"""
+    if factor <= 1:
+        return html
+    match = re.search(r'<body[^>]*>(.*)</body>', html, re.DOTALL | re.IGNORECASE)
+    if match is None:
+        return html * factor
+    body = match.group(1)
+    return html[:match.start(1)] + body * factor + html[match.end(1):]
+
+
+def pipeline_steps(parser: PlatformDocParser, html: str, platform: str) -> List[Tuple[str, Callable]]:
+    """
+    The steps of parse_api_structure() as separately timed callables
+
+    Each step receives the outputs of the previous ones, like in the parser.
+    """
+    from bs4 import BeautifulSoup
+
+    state: Dict = {}
+
+    def soup():
+        state['soup'] = BeautifulSoup(html, 'html.parser')
+
+    def get_text():
+        state['text'] = state['soup'].get_text(separator='\n', strip=True)
+
+    def code_blocks():
+        state['code_blocks'] = parser._extract_code_blocks(state['soup'])
+
+    def endpoints():
+        state['endpoints'] = parser._extract_detailed_endpoints(state['text'], state['code_blocks'], state['soup'])
+
+    return [
+        ('html_parse', soup),
+        ('get_text', get_text),
+        ('extract_code_blocks', code_blocks),
+        ('extract_detailed_endpoints', endpoints),
+        ('extract_auth_info', lambda: parser._extract_auth_info(state['text'])),
+        ('extract_hierarchy', lambda: parser._extract_hierarchy(state['text'], platform)),
+        ('extract_schemas', lambda: parser._extract_schemas(state['soup'], state['text'])),
+        ('extract_workflow', lambda: parser._extract_workflow(state['text'], state['endpoints'], platform)),
+        ('extract_base_url', lambda: parser._extract_base_url(state['text'], state['endpoints'], platform)),
+        ('parse_api_structure', lambda: parser.parse_api_structure(html, platform)),
+        ('parse_stream', lambda: parser.parse_stream(chunks(html), platform)),
+    ]
+
+
+def chunks(html: str, size: int = 64 * 1024):
+    """The document as the byte chunks of a streamed download"""
+    data = html.encode('utf-8')
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def measure(html: str, platform: str, repeat: int) -> List[Dict]:
+    """Time and peak memory of every step on one document"""
+    parser = PlatformDocParser()
+    timings: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        for step, fn in pipeline_steps(parser, html, platform):
+            start = time.perf_counter()
+            fn()
+            timings.setdefault(step, []).append(time.perf_counter() - start)
+
+    peaks: Dict[str, int] = {}
+    tracemalloc.start()
+    try:
+        for step, fn in pipeline_steps(parser, html, platform):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks[step] = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    return [
+        {
+            'step': step,
+            'min_ms': round(min(values) * 1000, 3),
+            'median_ms': round(statistics.median(values) * 1000, 3),
+            'peak_kib': round(peaks[step] / 1024, 1),
+        }
+        for step, values in timings.items()
+    ]
+
+
+def run(corpus: Dict[str, str], scales: List[int], repeat: int) -> Dict:
+    results = []
+    for name, html in corpus.items():
+        for factor in scales:
+            document = scale_document(html, factor)
+            for row in measure(document, name, repeat):
+                results.append({'document': name, 'scale': factor, 'bytes': len(document), **row})
+    return {'meta': environment(), 'results': results}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        commit = None
+    import bs4
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform_module.python_version(),
+        'bs4': bs4.__version__,
+        'machine': platform_module.machine(),
+    }
+
+
+def print_table(report: Dict):
+    print(f"{'document':<12}{'scale':>6}{'bytes':>10}  {'step':<28}{'min ms':>10}{'median ms':>11}{'peak KiB':>10}")
+    for row in report['results']:
+        print(f"{row['document']:<12}{row['scale']:>6}{row['bytes']:>10}  {row['step']:<28}"
+              f"{row['min_ms']:>10.3f}{row['median_ms']:>11.3f}{row['peak_kib']:>10.1f}")
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Steps whose min time grew by more than threshold (fraction) over the baseline"""
+    key = lambda row: (row['document'], row['scale'], row['step'])
+    previous = {key(row): row for row in baseline['results']}
+    regressions = []
+    for row in report['results']:
+        old = previous.get(key(row))
+        if old is None or old['min_ms'] <= 0:
+            continue
+        change = row['min_ms'] / old['min_ms'] - 1
+        if change > threshold:
+            regressions.append(
+                f"{row['document']} x{row['scale']} {row['step']}: "
+                f"{old['min_ms']:.3f} -> {row['min_ms']:.3f} ms (+{change:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PlatformDocParser extractors over the recorded corpus')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help='Synthetic size factors (default: 1 10)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per step (default: 5)')
+    parser.add_argument('--documents', nargs='+', help='Only these corpus documents')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Results JSON file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown vs baseline (default: 0.2)')
+    parser.add_argument('--record', action='store_true', help='Re-download the corpus pages and exit')
+    args = parser.parse_args()
+
+    if args.record:
+        record_corpus()
+        return
+
+    corpus = load_corpus()
+    if args.documents:
+        corpus = {name: html for name, html in corpus.items() if name in args.documents}
+
+    report = run(corpus, args.scales, args.repeat)
+    print_table(report)
+
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} step(s) slower than baseline by more than {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✓ No step slower than baseline by more than {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Fake LLM - 本地的OpenAI兼容 chat completions 服务器
+返回脚本化的回复，模拟首token延迟和每个token的生成延迟，支持流式输出 (SSE)。
+把 API_BASE 指向它就可以离线、可重复地运行 CodeAgent.generate_api_client 的完整流程:
+
+    python benchmarks/fake_llm.py --port 5300 --first-token-ms 500 --token-latency-ms 20
+    API_BASE=http://127.0.0.1:5300/v1 OPENAI_API_KEY=fake \\
+        python -m src.main --platform snapchat --docs http://127.0.0.1:5300/docs/snapchat --mock-auth
+
+接口:
+    POST /v1/chat/completions   支持 "stream": true 和 stream_options.include_usage
+    GET  /v1/models
+    GET  /docs/<name>           benchmarks/corpus 中保存的平台文档 (Stage 0 也不需要网络)
+    GET  /stats                 每条脚本规则的请求数和token数
+
+脚本 (--script script.json) 按顺序匹配，第一个在消息内容中找到 match 的规则生效:
+
+    {"responses": [{"name": "stage1", "match": "API客户端生成专家", "content": "..."},
+                   {"name": "big", "match": "PRODUCTION", "content_file": "big_module.py"}],
+     "default": "..."}
+
+默认脚本按 LLMRemote 三个阶段的系统提示返回一个可以运行的MOCK客户端。
+token数按空白切分近似计算。
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+STAGE1_CODE = '''import random
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _mock_id(resource: str) -> str:
+    return f"{resource}_mock_{random.randint(10000, 99999)}"
+
+
+def create_campaign(account_id: str, **kwargs) -> Dict:
+    """Create a campaign in the ad account"""
+    return {'id': _mock_id('campaign'), 'account_id': account_id, **kwargs}
+
+
+def create_ad_squad(campaign_id: str, account_id: str, **kwargs) -> Dict:
+    """Create an ad squad in the campaign"""
+    return {'id': _mock_id('ad_squad'), 'campaign_id': campaign_id, **kwargs}
+
+
+def create_media(account_id: str, **kwargs) -> Dict:
+    """Create a media object to upload the image into"""
+    return {'id': _mock_id('media'), 'account_id': account_id, **kwargs}
+
+
+def upload_media(media_id: str, **kwargs) -> Dict:
+    """Upload the image of a media object"""
+    return {'id': media_id, 'status': 'READY'}
+
+
+def create_creative(account_id: str, **kwargs) -> Dict:
+    """Create a creative using an uploaded media object"""
+    return {'id': _mock_id('creative'), 'account_id': account_id, **kwargs}
+
+
+def create_ad(ad_squad_id: str, account_id: str, **kwargs) -> Dict:
+    """Create an ad in the ad squad"""
+    return {'id': _mock_id('ad'), 'ad_squad_id': ad_squad_id, **kwargs}
+'''
+
+STAGE2_CODE = '''def launch_campaign(
+    account_id: str,
+    campaign_data: Dict[str, Any],
+    ad_squads_data: List[Dict[str, Any]],
+    ads_data: List[Dict[str, Any]],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """Create the campaign, its ad squads and ads in order"""
+    result = {
+        'status': 'success',
+        'campaign_id': None,
+        'ad_squad_ids': [],
+        'media_ids': [],
+        'creative_ids': [],
+        'ad_ids': [],
+        'errors': []
+    }
+
+    def emit(event: str, **data):
+        if progress_callback is not None:
+            progress_callback({'event': event, **data})
+
+    try:
+        result['campaign_id'] = create_campaign(account_id, **campaign_data)['id']
+        print(f"Campaign created: {result['campaign_id']}")
+        emit('campaign_created', campaign_id=result['campaign_id'])
+        for index, squad in enumerate(ad_squads_data):
+            squad_id = create_ad_squad(result['campaign_id'], account_id, **squad)['id']
+            result['ad_squad_ids'].append(squad_id)
+            emit('ad_squad_created', index=index, ad_squad_id=squad_id)
+        for index, ad in enumerate(ads_data):
+            squad_id = result['ad_squad_ids'][ad.get('ad_squad_index', 0)]
+            media_type = str(ad.get('media_type', 'IMAGE')).upper()
+            media_id = create_media(account_id, name=ad.get('name', f'Media {index + 1}'), type=media_type)['id']
+            result['media_ids'].append(media_id)
+            emit('media_created', index=index, media_id=media_id)
+            if ad.get('image_url'):
+                upload_media(media_id, image_url=ad['image_url'])
+                emit('media_uploaded', index=index, media_id=media_id)
+            fields = {k: v for k, v in ad.items() if k not in ('image_url', 'media_type', 'ad_squad_index')}
+            ad_fields = {k: v for k, v in fields.items() if k in ('name', 'status', 'start_time', 'end_time')}
+            creative_fields = {k: v for k, v in fields.items() if k == 'name' or k not in ad_fields}
+            creative_id = create_creative(account_id, media_id=media_id, **creative_fields)['id']
+            result['creative_ids'].append(creative_id)
+            emit('creative_created', index=index, creative_id=creative_id)
+            ad_id = create_ad(squad_id, account_id, creative_id=creative_id, **ad_fields)['id']
+            result['ad_ids'].append(ad_id)
+            emit('ad_created', index=index, ad_id=ad_id)
+    except Exception as e:
+        print(f"Launch failed: {e}")
+        result['errors'].append(str(e))
+        result['status'] = 'partial'
+        emit('step_failed', error=str(e))
+    emit('completed', result=result)
+    return result
+'''
+
+STAGE3_MODULE = '''"""
+Mock advertising API client generated against the fake LLM server
+"""
+''' + STAGE1_CODE + '''
+
+HIERARCHY = ['campaign', 'ad_squad', 'ad']
+BASE_URL = 'https://adsapi.snapchat.com/v1'
+
+
+''' + STAGE2_CODE
+
+
+def _fenced(code: str) -> str:
+    """LLM回复通常带markdown代码块，LLMRemote._extract_code 会去掉它"""
+    return f'```python\n{code}```'
+
+
+DEFAULT_SCRIPT = {
+    'responses': [
+        {'name': 'stage1', 'match': 'API客户端生成专家', 'content': _fenced(STAGE1_CODE)},
+        {'name': 'stage2', 'match': '工作流编排专家', 'content': _fenced(STAGE2_CODE)},
+        {'name': 'stage3', 'match': '代码整合和质量检查专家', 'content': _fenced(STAGE3_MODULE)},
+    ],
+    'default': _fenced(STAGE3_MODULE),
+}
+
+TOKEN_PATTERN = re.compile(r'\s*\S+|\s+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Approximate tokens: words with their leading whitespace (joined they give back text)"""
+    return TOKEN_PATTERN.findall(text)
+
+
+def load_script(path: str) -> Dict:
+    """Read a script file; content_file paths are relative to the script"""
+    with open(path, 'r', encoding='utf-8') as f:
+        script = json.load(f)
+    for rule in script.get('responses', []):
+        if 'content_file' in rule:
+            with open(os.path.join(os.path.dirname(os.path.abspath(path)), rule['content_file']),
+                      'r', encoding='utf-8') as f:
+                rule['content'] = f.read()
+    script.setdefault('default', '')
+    return script
+
+
+class FakeLLMSettings:
+    """Latency model and script of the fake server"""
+
+    def __init__(self, script: Optional[Dict] = None, first_token_ms: float = 200,
+                 token_latency_ms: float = 5, doc_latency_ms: float = 0, corpus_dir: str = CORPUS_DIR):
+        self.script = script or DEFAULT_SCRIPT
+        self.first_token_ms = first_token_ms
+        self.token_latency_ms = token_latency_ms
+        self.doc_latency_ms = doc_latency_ms
+        self.corpus_dir = corpus_dir
+
+
+class FakeLLM:
+    """State shared by all request handler threads"""
+
+    def __init__(self, settings: FakeLLMSettings):
+        self.settings = settings
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def respond(self, messages: List[Dict]) -> Tuple[str, str]:
+        """(rule name, content) of the first matching script rule"""
+        text = '\n'.join(str(m.get('content', '')) for m in messages if isinstance(m, dict))
+        for index, rule in enumerate(self.settings.script.get('responses', [])):
+            if rule.get('match', '') in text:
+                return rule.get('name', f'rule{index}'), rule.get('content', '')
+        return 'default', self.settings.script.get('default', '')
+
+    def count(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+    def document(self, name: str) -> Optional[str]:
+        manifest_path = os.path.join(self.settings.corpus_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f).get(name)
+        if entry is None:
+            return None
+        with open(os.path.join(self.settings.corpus_dir, entry['file']), 'r', encoding='utf-8') as f:
+            return f.read()
+
+
+def make_handler(llm: FakeLLM):
+    """HTTP request handler bound to a fake LLM"""
+
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive: openai客户端复用连接池，流式响应使用chunked编码
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status: int, body, content_type: str = 'application/json'):
+            data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+
+        def do_GET(self):
+            path = self.path.partition('?')[0]
+            if path.endswith('/models'):
+                return self._send(200, {'object': 'list', 'data': [{'id': 'fake', 'object': 'model'}]})
+            if path.startswith('/docs/'):
+                html = llm.document(path[len('/docs/'):])
+                if html is None:
+                    return self._send(404, {'error': 'Document not found'})
+                time.sleep(llm.settings.doc_latency_ms / 1000)
+                llm.count(documents=1)
+                return self._send(200, html.encode('utf-8'), content_type='text/html; charset=utf-8')
+            if path == '/stats':
+                return self._send(200, dict(llm.stats))
+            if path == '/health':
+                return self._send(200, {'status': 'healthy'})
+            self._send(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            if not self.path.partition('?')[0].endswith('/chat/completions'):
+                return self._send(404, {'error': {'message': 'Not found'}})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            except ValueError:
+                return self._send(400, {'error': {'message': 'Request body must be JSON'}})
+
+            start = time.perf_counter()
+            messages = body.get('messages') or []
+            name, content = llm.respond(messages)
+            tokens = tokenize(content)
+            usage = {
+                'prompt_tokens': sum(len(tokenize(str(m.get('content', '')))) for m in messages if isinstance(m, dict)),
+                'completion_tokens': len(tokens),
+            }
+            usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+            llm.count(**{f'requests.{name}': 1, 'prompt_tokens': usage['prompt_tokens'],
+                         'completion_tokens': usage['completion_tokens'],
+                         'streamed': 1 if body.get('stream') else 0})
+
+            completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+            model = body.get('model', 'fake')
+            first = llm.settings.first_token_ms / 1000
+            per_token = llm.settings.token_latency_ms / 1000
+
+            if not body.get('stream'):
+                time.sleep(first + per_token * len(tokens))
+                return self._send(200, {
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                 'finish_reason': 'stop'}],
+                    'usage': usage,
+                })
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            def event(choices: List[Dict], **extra):
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                         'model': model, 'choices': choices, **extra}
+                self._write_chunk(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+
+            event([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+            for index, token in enumerate(tokens):
+                # 按绝对时间调度，sleep的误差不会累积
+                delay = start + first + per_token * index - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                event([{'index': 0, 'delta': {'content': token}, 'finish_reason': None}])
+            event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+            if (body.get('stream_options') or {}).get('include_usage'):
+                event([], usage=usage)
+            self._write_chunk(b'data: [DONE]\n\n')
+            self._write_chunk(b'')
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def create_server(host: str, port: int, settings: FakeLLMSettings) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(FakeLLM(settings)))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible chat completions server with scripted replies')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5300)
+    parser.add_argument('--script', help='JSON script of responses (default: a working MOCK client)')
+    parser.add_argument('--first-token-ms', type=float, default=200, help='Time to first token (default: 200)')
+    parser.add_argument('--token-latency-ms', type=float, default=5, help='Time per generated token (default: 5)')
+    parser.add_argument('--doc-latency-ms', type=float, default=0, help='Latency of /docs/<name> (default: 0)')
+    args = parser.parse_args()
+
+    settings = FakeLLMSettings(
+        script=load_script(args.script) if args.script else None,
+        first_token_ms=args.first_token_ms,
+        token_latency_ms=args.token_latency_ms,
+        doc_latency_ms=args.doc_latency_ms
+    )
+    server = create_server(args.host, args.port, settings)
+    print(f"✓ Fake LLM listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
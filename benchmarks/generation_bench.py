@@ -0,0 +1,177 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Generation Benchmark - CodeAgent.generate_api_client 端到端耗时
+默认在进程内启动 fake_llm.py (OpenAI兼容的脚本化LLM) 并从它获取语料库中的文档，
+不需要网络和API key，结果可重复，适合在CI中比较缓存、并发和提示修改的影响。
+
+使用方法:
+    python benchmarks/generation_bench.py --runs 10                         # 写入 benchmarks/results/generation.json
+    python benchmarks/generation_bench.py --runs 10 --concurrency 4 --doc-cache-ttl 3600 --doc-latency-ms 300
+    python benchmarks/generation_bench.py --stream --first-token-ms 800 --token-latency-ms 20
+    python benchmarks/generation_bench.py --script my_script.json --production   # 自定义回复
+    python benchmarks/generation_bench.py --llm-url http://127.0.0.1:5300/v1     # 已经运行的 fake_llm.py
+    python benchmarks/generation_bench.py --runs 10 --function-library /tmp/library.json
+
+所有运行共享一个CodeAgent (和生成守护进程一样)，--doc-cache-ttl 大于0时只有第一次运行下载文档。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import fake_llm
+from doc_parser_bench import environment
+from src.runtime import tracing
+from src.service.profiling import StageProfiler
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'generation.json')
+
+
+class FirstTokenExporter:
+    """Collects llm.time_to_first_token_ms of the LLM stage spans (--stream)"""
+
+    def __init__(self, forward):
+        self.forward = forward
+        self.values: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def export(self, span: tracing.Span):
+        value = span.attributes.get('llm.time_to_first_token_ms')
+        if value is not None:
+            with self._lock:
+                self.values.setdefault(span.name, []).append(value)
+        self.forward.export(span)
+
+
+def run(docs_url: str, platform: str, runs: int, concurrency: int, mock_auth: bool,
+        doc_cache_ttl: float, function_library: Optional[str] = None) -> Dict:
+    """
+    Generate `runs` clients with one shared CodeAgent
+
+    API_BASE / OPENAI_API_KEY must already point at the LLM server.
+    """
+    from src.service.code_agent import CodeAgent
+
+    agent = CodeAgent(doc_cache_ttl=doc_cache_ttl, function_library_path=function_library)
+    stages = StageProfiler(forward=tracing.get_exporter())
+    first_tokens = FirstTokenExporter(stages)
+    previous = tracing.get_exporter()
+    tracing.configure(first_tokens)
+
+    durations: List[float] = []
+    errors: List[str] = []
+
+    def one(index: int, output_dir: str):
+        start = time.perf_counter()
+        try:
+            agent.generate_api_client(platform=platform, docs_url=docs_url, mock_auth=mock_auth,
+                                      output_dir=os.path.join(output_dir, f'run{index}'))
+            durations.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+
+    started = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            with open(os.devnull, 'w') as devnull:
+                # 生成过程的日志很长，只保留报告
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                        for index in range(runs):
+                            executor.submit(one, index, output_dir)
+                finally:
+                    sys.stdout = stdout
+    finally:
+        tracing.configure(previous)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'runs': runs,
+        'concurrency': concurrency,
+        'doc_cache_ttl': doc_cache_ttl,
+        'function_library': function_library,
+        'mock_auth': mock_auth,
+        'streaming': agent.llm.streaming,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'generations_per_min': round(len(durations) / elapsed * 60, 1) if elapsed else 0,
+        'run_s': {
+            'min': round(min(durations), 3) if durations else 0,
+            'median': round(statistics.median(durations), 3) if durations else 0,
+            'max': round(max(durations), 3) if durations else 0,
+        },
+        'stages': stages.report(),
+        'time_to_first_token_ms': {
+            name: round(statistics.median(values), 1) for name, values in sorted(first_tokens.values.items())
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CodeAgent.generate_api_client against a fake LLM')
+    parser.add_argument('--runs', type=int, default=5, help='Clients to generate (default: 5)')
+    parser.add_argument('--concurrency', type=int, default=1, help='Generations running at once (default: 1)')
+    parser.add_argument('--platform', default='snapchat', help='Corpus document / platform name (default: snapchat)')
+    parser.add_argument('--production', action='store_true', help='Generate PRODUCTION clients (default: MOCK)')
+    parser.add_argument('--doc-cache-ttl', type=float, default=0, help='Documentation cache TTL in seconds')
+    parser.add_argument('--function-library', help='Reuse Stage 1 functions through this library file')
+    parser.add_argument('--stream', action='store_true', help='Stream LLM responses (LLM_STREAMING=true)')
+    parser.add_argument('--llm-url', help='Use this OpenAI-compatible API_BASE instead of an in-process fake')
+    parser.add_argument('--docs-url', help='Documentation URL (default: /docs/<platform> of the fake)')
+    parser.add_argument('--script', help='fake_llm.py response script')
+    parser.add_argument('--first-token-ms', type=float, default=200, help='Fake time to first token (default: 200)')
+    parser.add_argument('--token-latency-ms', type=float, default=5, help='Fake time per token (default: 5)')
+    parser.add_argument('--doc-latency-ms', type=float, default=0, help='Fake documentation latency (default: 0)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Results JSON file')
+    args = parser.parse_args()
+
+    server = None
+    api_base = args.llm_url
+    if api_base is None:
+        settings = fake_llm.FakeLLMSettings(
+            script=fake_llm.load_script(args.script) if args.script else None,
+            first_token_ms=args.first_token_ms,
+            token_latency_ms=args.token_latency_ms,
+            doc_latency_ms=args.doc_latency_ms
+        )
+        server = fake_llm.create_server('127.0.0.1', 0, settings)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        api_base = f'http://127.0.0.1:{server.server_address[1]}/v1'
+        os.environ['OPENAI_API_KEY'] = 'fake'
+    root = api_base.rstrip('/').rsplit('/v1', 1)[0]
+    os.environ['API_BASE'] = api_base
+    os.environ['LLM_STREAMING'] = 'true' if args.stream else 'false'
+
+    try:
+        report = run(args.docs_url or f'{root}/docs/{args.platform}', args.platform, args.runs,
+                     args.concurrency, not args.production, args.doc_cache_ttl, args.function_library)
+        report['meta'] = environment()
+        report['llm'] = json.loads(urllib.request.urlopen(f'{root}/stats', timeout=10).read()) if server else api_base
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n✓ Results: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
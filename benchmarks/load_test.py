@@ -0,0 +1,382 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Load Test - 投放接口吞吐量测试
+使用模拟平台延迟的MOCK客户端，比较开发服务器与生产服务器的吞吐量。
+
+两种模式:
+- 闭环 (默认): --concurrency 个客户端连续发送 --requests 个请求到 /api/<platform>/launch-campaign
+- 开环 (--rps): 按固定速率向 /api/launch-campaign 发送请求，持续 --duration 秒；
+  延迟从计划发送时间开始计算，服务器变慢时排队时间也计入延迟 (避免coordinated omission)
+
+--stub 启动本地模拟平台 (stub_platform.py)，服务器使用通过 src.runtime.http 调用平台API的
+PRODUCTION客户端 (限流、熔断、429重试、流式上传都会生效)，请求经 PLATFORM_BASE_URL_OVERRIDES 发往模拟平台。
+
+使用方法:
+    # 启动服务器并压测 (MOCK客户端写入临时目录)
+    python benchmarks/load_test.py --spawn "serve --workers 4 --threads 8"
+    python benchmarks/load_test.py --spawn dev
+
+    # 模拟平台 + 固定速率: 50 RPS 持续30秒，平台延迟中位数80ms，每个账户每秒20个请求
+    python benchmarks/load_test.py --spawn "serve --workers 4 --threads 16" --stub --rps 50 --duration 30 \\
+        --stub-args "--latency-ms 80 --rate-limit 20"
+
+    # 压测已经运行的服务器
+    python benchmarks/load_test.py --url http://localhost:5000 --platform snapchat
+"""
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# MOCK客户端: 每次"平台调用"sleep一段时间，模拟网络延迟
+MOCK_CLIENT = '''
+import random
+import time
+from typing import Dict
+
+__mode__ = 'MOCK'
+HIERARCHY = ['campaign', 'ad_squad', 'ad']
+BASE_URL = 'https://adsapi.loadtest.local/v1'
+LATENCY = {latency}
+
+
+def _mock(resource: str, **kwargs) -> Dict:
+    time.sleep(LATENCY)
+    return {{'id': f"{{resource}}_mock_{{random.randint(10000, 99999)}}", **kwargs}}
+
+
+def create_campaign(account_id: str, **kwargs) -> Dict:
+    return _mock('campaign', account_id=account_id, **kwargs)
+
+
+def create_ad_squad(campaign_id: str, account_id: str, **kwargs) -> Dict:
+    return _mock('ad_squad', campaign_id=campaign_id, **kwargs)
+
+
+def create_media(account_id: str, **kwargs) -> Dict:
+    return _mock('media', **kwargs)
+
+
+def upload_media(media_id: str, **kwargs) -> Dict:
+    return _mock('upload', media_id=media_id)
+
+
+def create_creative(account_id: str, **kwargs) -> Dict:
+    return _mock('creative', **kwargs)
+
+
+def create_ad(ad_squad_id: str, account_id: str, **kwargs) -> Dict:
+    return _mock('ad', ad_squad_id=ad_squad_id, **kwargs)
+'''
+
+# PRODUCTION客户端: 与Stage 1生成的代码结构相同，通过共享运行时调用 (模拟) 平台
+STUB_CLIENT = '''
+from typing import Dict
+
+from src.runtime.http import request
+from src.runtime.media_upload import upload_media_from_url
+
+__mode__ = 'PRODUCTION'
+HIERARCHY = ['campaign', 'ad_squad', 'ad']
+BASE_URL = 'https://adsapi.snapchat.com/v1'
+HEADERS = {{'Authorization': 'Bearer loadtest', 'Content-Type': 'application/json'}}
+PLATFORM = '{platform}'
+
+
+def _post(url: str, account_id, payload: Dict) -> Dict:
+    response = request('POST', url, platform=PLATFORM, account_id=account_id, headers=HEADERS, json=payload)
+    if response.status_code >= 400:
+        raise Exception(f"{{response.status_code}} {{response.text[:200]}}")
+    return response.json()
+
+
+def create_campaign(account_id: str, **kwargs) -> Dict:
+    return _post(f"{{BASE_URL}}/adaccounts/{{account_id}}/campaigns", account_id, {{'campaigns': [kwargs]}})
+
+
+def create_ad_squad(campaign_id: str, account_id: str, **kwargs) -> Dict:
+    return _post(f"{{BASE_URL}}/campaigns/{{campaign_id}}/adsquads", account_id, {{'adsquads': [kwargs]}})
+
+
+def create_media(account_id: str, **kwargs) -> Dict:
+    return _post(f"{{BASE_URL}}/adaccounts/{{account_id}}/media", account_id, {{'media': [kwargs]}})
+
+
+def upload_media(media_id: str, **kwargs) -> Dict:
+    return upload_media_from_url(BASE_URL, media_id, kwargs['image_url'], headers={{'Authorization': 'Bearer loadtest'}},
+                                 platform=PLATFORM)
+
+
+def create_creative(account_id: str, **kwargs) -> Dict:
+    return _post(f"{{BASE_URL}}/adaccounts/{{account_id}}/creatives", account_id, {{'creatives': [kwargs]}})
+
+
+def create_ad(ad_squad_id: str, account_id: str, **kwargs) -> Dict:
+    return _post(f"{{BASE_URL}}/adsquads/{{ad_squad_id}}/ads", account_id, {{'ads': [kwargs]}})
+'''
+
+PAYLOAD = {
+    'account_id': 'loadtest_account',
+    'campaign': {'name': 'Load Test Campaign', 'daily_budget_micro': 100000000},
+    'ad_squads': [{'name': 'Ad Squad 1', 'bid_micro': 5000000}],
+    'ads': [{'name': 'Ad 1', 'headline': 'Load Test', 'image_url': 'https://example.com/image.jpg'}],
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def spawn_stub(stub_args: str, port: int) -> subprocess.Popen:
+    """Start the stub ad platform"""
+    return subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, 'benchmarks', 'stub_platform.py'), '--port', str(port)]
+        + shlex.split(stub_args),
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+
+
+def spawn_server(serve_args: str, port: int, latency: float, workdir: str,
+                 stub_url: Optional[str] = None, platform: str = 'loadtest',
+                 client_rate_limit: str = '1000:1000') -> subprocess.Popen:
+    """Start the API server against a temporary MOCK client (or a PRODUCTION client talking to the stub)"""
+    clients_dir = os.path.join(workdir, 'generated_clients')
+    os.makedirs(clients_dir, exist_ok=True)
+    with open(os.path.join(clients_dir, f'{platform}_api.py'), 'w', encoding='utf-8') as f:
+        if stub_url:
+            f.write(STUB_CLIENT.format(platform=platform))
+        else:
+            f.write(MOCK_CLIENT.format(latency=latency))
+
+    env = dict(
+        os.environ,
+        GENERATED_CLIENTS_DIR=clients_dir,
+        DATA_DIR=os.path.join(workdir, 'data'),
+        JOBS_DB_PATH=os.path.join(workdir, 'data', 'jobs.db'),
+        IDEMPOTENCY_DB_PATH=os.path.join(workdir, 'data', 'idempotency.db'),
+        LAUNCH_JOURNAL_PATH=os.path.join(workdir, 'data', 'launches.db'),
+        FLASK_PORT=str(port),
+        FLASK_DEBUG='False',
+    )
+    if stub_url:
+        env['PLATFORM_BASE_URL_OVERRIDES'] = f'https://adsapi.snapchat.com={stub_url}'
+        # 客户端限流默认每个账户10 RPS；压测时由模拟平台决定是否限流
+        env['PLATFORM_RATE_LIMITS'] = f'{platform}={client_rate_limit}'
+    args = shlex.split(serve_args)
+    if args and args[0] == 'serve' and '--port' not in args:
+        args += ['--port', str(port)]
+
+    return subprocess.Popen(
+        [sys.executable, '-m', 'src.flask_api'] + args,
+        cwd=PROJECT_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+
+
+def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{url}/health', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f'Server at {url} did not become ready')
+
+
+def run_load(url: str, platform: str, total: int, concurrency: int) -> Dict:
+    """Send total launch requests with the given concurrency"""
+    endpoint = f'{url}/api/{platform}/launch-campaign'
+    latencies: List[float] = []
+    errors = 0
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            response = session.post(endpoint, json=PAYLOAD, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, ok in executor.map(one, range(total)):
+            latencies.append(latency)
+            errors += 0 if ok else 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 1),
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+        }
+    }
+
+
+def run_rate(url: str, payload_for, rps: float, duration: float, max_in_flight: int) -> Dict:
+    """
+    Open-loop load: send rps requests per second to /api/launch-campaign for duration seconds
+
+    Args:
+        url: Server base URL
+        payload_for: Builds the JSON body of request i
+        rps: Target requests per second
+        duration: Seconds to send requests
+        max_in_flight: Concurrent connections; requests beyond it queue and
+                       the queueing time counts towards their latency
+    """
+    endpoint = f'{url}/api/launch-campaign'
+    total = int(rps * duration)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_in_flight, pool_maxsize=max_in_flight)
+    session.mount('http://', adapter)
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def one(index: int):
+        scheduled = started + index / rps
+        try:
+            response = session.post(endpoint, json=payload_for(index), timeout=120)
+            status = response.status_code
+            if status == 200 and response.json().get('status') not in ('success', None):
+                status = f"200 {response.json().get('status')}"
+        except requests.RequestException:
+            status = 'error'
+        with lock:
+            latencies.append(time.perf_counter() - scheduled)
+            statuses[str(status)] += 1
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for index in range(total):
+            delay = started + index / rps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(one, index)
+        send_elapsed = time.perf_counter() - started
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.get('200', 0)
+    return {
+        'target_rps': rps,
+        'duration_s': duration,
+        'requests': total,
+        'max_in_flight': max_in_flight,
+        'statuses': dict(statuses),
+        'offered_rps': round(total / send_elapsed, 1) if send_elapsed else 0,
+        'throughput_rps': round(ok / elapsed, 1),
+        'elapsed_s': round(elapsed, 3),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 1) if latencies else 0,
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round(max(latencies) * 1000, 1) if latencies else 0,
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test /api/<platform>/launch-campaign')
+    parser.add_argument('--url', help='Base URL of a running server')
+    parser.add_argument('--spawn', help='Start a server with these src.flask_api arguments, e.g. "serve --workers 4"')
+    parser.add_argument('--port', type=int, default=5099, help='Port for --spawn (default: 5099)')
+    parser.add_argument('--platform', default='loadtest', help='Platform to launch on (default: spawned MOCK client)')
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated seconds per platform call (default: 0.02)')
+    parser.add_argument('--requests', type=int, default=500, help='Total requests (default: 500)')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients (default: 32)')
+    parser.add_argument('--rps', type=float, help='Open-loop mode: target requests per second')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load in --rps mode (default: 30)')
+    parser.add_argument('--accounts', type=int, default=10, help='Ad accounts the requests rotate over (default: 10)')
+    parser.add_argument('--stub', action='store_true', help='Launch against the local stub ad platform (needs --spawn)')
+    parser.add_argument('--stub-port', type=int, default=5200, help='Port of the stub platform (default: 5200)')
+    parser.add_argument('--stub-args', default='', help='Extra stub_platform.py arguments, e.g. "--rate-limit 20"')
+    parser.add_argument('--client-rate-limit', default='1000:1000',
+                        help='Client-side rate limit per account with --stub (default: 1000:1000)')
+    args = parser.parse_args()
+
+    if not args.url and not args.spawn:
+        parser.error('either --url or --spawn is required')
+    if args.stub and not args.spawn:
+        parser.error('--stub configures the spawned server; start stub_platform.py yourself with --url')
+
+    processes = []
+    workdir = tempfile.TemporaryDirectory()
+    url = args.url
+    stub_url = f'http://127.0.0.1:{args.stub_port}' if args.stub else None
+    image_url = f'{stub_url}/images/ad.jpg' if stub_url else PAYLOAD['ads'][0]['image_url']
+
+    def payload_for(index: int) -> Dict:
+        ads = [{**ad, 'image_url': image_url} for ad in PAYLOAD['ads']]
+        return {**PAYLOAD, 'platform': args.platform, 'ads': ads,
+                'account_id': f"loadtest_account_{index % max(args.accounts, 1)}"}
+
+    try:
+        if stub_url:
+            processes.append(spawn_stub(args.stub_args, args.stub_port))
+            wait_until_ready(stub_url)
+        if args.spawn:
+            processes.append(spawn_server(args.spawn, args.port, args.latency, workdir.name,
+                                          stub_url=stub_url, platform=args.platform,
+                                          client_rate_limit=args.client_rate_limit))
+            url = f'http://127.0.0.1:{args.port}'
+        wait_until_ready(url)
+
+        if args.rps:
+            # 预热: 触发客户端导入和连接建立
+            run_rate(url, payload_for, min(args.rps, 10), 1, args.concurrency)
+            report = run_rate(url, payload_for, args.rps, args.duration, args.concurrency)
+        else:
+            run_load(url, args.platform, min(args.concurrency, args.requests), args.concurrency)
+            report = run_load(url, args.platform, args.requests, args.concurrency)
+        report['server'] = args.spawn or url
+        if stub_url:
+            report['stub'] = requests.get(f'{stub_url}/stats', timeout=5).json()
+        print(json.dumps(report, indent=2))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=30)
+        workdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
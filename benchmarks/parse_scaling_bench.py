@@ -0,0 +1,122 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Parse Scaling Benchmark - PlatformDocParser 进程池模式在 1/2/4/8 个工作进程下的扩展性
+把语料库中的文档放大N倍并复制成多个页面 (模拟爬取的多页文档)，分别测量
+parse_api_structure (单页: 并行提取器) 和 parse_pages (多页: 并行解析页面 + 并行提取器)。
+每个工作进程数的结果都和顺序解析比较，不同时退出码为1。
+
+使用方法:
+    python benchmarks/parse_scaling_bench.py                            # 写入 benchmarks/results/parse_scaling.json
+    python benchmarks/parse_scaling_bench.py --workers 1 2 4 8 --scale 50 --pages 16 --repeat 3
+
+工作进程数1表示顺序解析 (基线)；加速比 = 基线时间 / 时间，效率 = 加速比 / 工作进程数。
+进程池在计时前预热，计时不包括启动工作进程。机器的CPU核数记录在 meta.cpu_count 中，
+工作进程数超过核数时不会再变快。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from doc_parser_bench import environment, load_corpus, scale_document
+from src.service.platform_doc_parser import PlatformDocParser
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'parse_scaling.json')
+
+
+def build_pages(corpus: Dict[str, str], scale: int, pages: int) -> List[str]:
+    """`pages` pages cycling through the corpus documents, each scaled `scale` times"""
+    documents = [scale_document(html, scale) for html in corpus.values()]
+    return [documents[index % len(documents)] for index in range(pages)]
+
+
+def time_runs(fn, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(pages: List[str], platform: str, worker_counts: List[int], repeat: int) -> Dict:
+    cases = {
+        'parse_api_structure': lambda parser: parser.parse_api_structure(pages[0], platform),
+        'parse_pages': lambda parser: parser.parse_pages(pages, platform),
+    }
+    baseline_parser = PlatformDocParser(workers=0)
+    expected = {case: fn(baseline_parser).to_json() for case, fn in cases.items()}
+
+    results = []
+    mismatches = []
+    for workers in worker_counts:
+        parser = PlatformDocParser(workers=workers, parallel_min_chars=0)
+        try:
+            for case, fn in cases.items():
+                # 预热: 启动工作进程并导入解析器
+                if fn(parser).to_json() != expected[case]:
+                    mismatches.append(f'{case} with {workers} workers')
+                timings = time_runs(lambda: fn(parser), repeat)
+                results.append({
+                    'case': case,
+                    'workers': workers,
+                    'min_ms': round(min(timings) * 1000, 1),
+                    'median_ms': round(statistics.median(timings) * 1000, 1),
+                })
+        finally:
+            parser.close()
+
+    for row in results:
+        base = next(r for r in results if r['case'] == row['case'] and r['workers'] == worker_counts[0])
+        row['speedup'] = round(base['min_ms'] / row['min_ms'], 2) if row['min_ms'] else 0
+        row['efficiency'] = round(row['speedup'] / max(row['workers'], 1), 2)
+
+    return {
+        'pages': len(pages),
+        'bytes': sum(len(page) for page in pages),
+        'results': results,
+        'mismatches': mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how PlatformDocParser scales with parse workers')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Worker counts; the first is the baseline (default: 1 2 4 8)')
+    parser.add_argument('--scale', type=int, default=20, help='Synthetic size factor of each page (default: 20)')
+    parser.add_argument('--pages', type=int, default=8, help='Pages of the multi-page document (default: 8)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per worker count (default: 3)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Results JSON file')
+    args = parser.parse_args()
+
+    pages = build_pages(load_corpus(), args.scale, args.pages)
+    report = run(pages, 'snapchat', args.workers, args.repeat)
+    report['meta'] = {**environment(), 'cpu_count': os.cpu_count(), 'scale': args.scale}
+
+    print(f"{report['pages']} pages, {report['bytes']} bytes, {os.cpu_count()} CPUs")
+    print(f"{'case':<22}{'workers':>8}{'min ms':>10}{'median ms':>11}{'speedup':>9}{'efficiency':>12}")
+    for row in report['results']:
+        print(f"{row['case']:<22}{row['workers']:>8}{row['min_ms']:>10.1f}{row['median_ms']:>11.1f}"
+              f"{row['speedup']:>9.2f}{row['efficiency']:>12.2f}")
+
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results: {args.output}")
+
+    if report['mismatches']:
+        print(f"\n❌ Results differ from sequential parsing: {', '.join(report['mismatches'])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Stub Ad Platform - 本地模拟的广告平台API (Snapchat风格)
+提供Stage 1生成的PRODUCTION客户端调用的端点，用于压测生成的客户端和 launch_campaign，
+不访问真实平台:
+
+    POST /v1/adaccounts/{id}/campaigns
+    POST /v1/campaigns/{id}/adsquads
+    POST /v1/adaccounts/{id}/media
+    POST /v1/media/{id}/upload
+    POST /us/v1/media/{id}/multipart-upload-v2?action=INIT|ADD|FINALIZE
+    POST /v1/adaccounts/{id}/creatives
+    POST /v1/adsquads/{id}/ads
+    GET  /images/<name>          投放payload中image_url使用的测试图片
+    GET  /stats                  每个端点的请求数和状态码
+
+可配置的平台行为:
+- 延迟: 对数正态分布 (--latency-ms 中位数, --latency-sigma)，上传单独配置
+- 限流: 按路径中的广告账户 (或父实体) 的令牌桶 (--rate-limit)，超出返回429和Retry-After；--throttle-rate 随机429
+- 错误: --error-rate 随机500
+- 批量上限: 一个请求中创建的实体超过 --batch-limit 时返回400
+
+使用方法:
+    python benchmarks/stub_platform.py --port 5200 --latency-ms 80 --rate-limit 20
+    PLATFORM_BASE_URL_OVERRIDES=https://adsapi.snapchat.com=http://127.0.0.1:5200 python -m src.flask_api serve
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# (正则, 实体类型, 响应中的列表键, 列表项中的实体键)
+CREATE_ROUTES = [
+    (re.compile(r'^/v1/adaccounts/([^/]+)/campaigns$'), 'campaign', 'campaigns', 'campaign'),
+    (re.compile(r'^/v1/campaigns/([^/]+)/(?:adsquads|ad_squads)$'), 'adsquad', 'adsquads', 'adsquad'),
+    (re.compile(r'^/v1/adaccounts/([^/]+)/media$'), 'media', 'media', 'media'),
+    (re.compile(r'^/v1/adaccounts/([^/]+)/creatives$'), 'creative', 'creatives', 'creative'),
+    (re.compile(r'^/v1/adsquads/([^/]+)/ads$'), 'ad', 'ads', 'ad'),
+]
+UPLOAD_ROUTE = re.compile(r'^/v1/media/([^/]+)/upload$')
+MULTIPART_ROUTE = re.compile(r'^(?:/us)?/v1/media/([^/]+)/multipart-upload-v2$')
+IMAGE_ROUTE = re.compile(r'^/images/[\w.\-]+$')
+
+
+class StubSettings:
+    """Behaviour of the stub platform"""
+
+    def __init__(self, latency_ms: float = 50, latency_sigma: float = 0.5, upload_latency_ms: float = 200,
+                 rate_limit: float = 0, burst: Optional[float] = None, throttle_rate: float = 0,
+                 error_rate: float = 0, batch_limit: int = 50, image_bytes: int = 100 * 1024,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.upload_latency_ms = upload_latency_ms
+        self.rate_limit = rate_limit
+        self.burst = burst or max(rate_limit, 1)
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.batch_limit = batch_limit
+        self.image_bytes = image_bytes
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+
+class StubPlatform:
+    """State shared by all request handler threads"""
+
+    def __init__(self, settings: StubSettings):
+        self.settings = settings
+        self.stats: Counter = Counter()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.image = b'\xff\xd8\xff\xe0' + b'\0' * max(0, settings.image_bytes - 4)
+
+    def sample_latency(self, upload: bool = False) -> float:
+        median = self.settings.upload_latency_ms if upload else self.settings.latency_ms
+        if median <= 0:
+            return 0.0
+        with self.settings.random_lock:
+            return self.settings.random.lognormvariate(0, self.settings.latency_sigma) * median / 1000
+
+    def chance(self, probability: float) -> bool:
+        if probability <= 0:
+            return False
+        with self.settings.random_lock:
+            return self.settings.random.random() < probability
+
+    def take_token(self, account: str) -> Optional[float]:
+        """None if the account may send a request, else seconds until it may"""
+        rate = self.settings.rate_limit
+        if rate <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(account, (self.settings.burst, now))
+            tokens = min(self.settings.burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self._buckets[account] = (tokens, now)
+                return (1 - tokens) / rate
+            self._buckets[account] = (tokens - 1, now)
+            return None
+
+    def count(self, route: str, status: int):
+        with self._lock:
+            self.stats[f'{route} {status}'] += 1
+
+
+def make_handler(platform: StubPlatform):
+    """HTTP request handler bound to a stub platform"""
+
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive，和真实平台一样复用连接
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status: int, body, route: str, headers: Optional[Dict] = None,
+                  content_type: str = 'application/json'):
+            data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+            platform.count(route, status)
+
+        def _read_body(self) -> bytes:
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length) if length else b''
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if IMAGE_ROUTE.match(path):
+                return self._send(200, platform.image, 'GET /images', content_type='image/jpeg')
+            if path == '/stats':
+                return self._send(200, dict(platform.stats), 'GET /stats')
+            if path == '/health':
+                return self._send(200, {'status': 'healthy'}, 'GET /health')
+            self._send(404, {'request_status': 'ERROR', 'display_message': 'Not found'}, 'GET unknown')
+
+        def do_POST(self):
+            parts = urlsplit(self.path)
+            path = parts.path
+            body = self._read_body()
+
+            # 先确定路由，再模拟平台的限流/错误/延迟
+            route, account, handler = self._route(path, parts.query, body)
+            if handler is None:
+                return self._send(404, {'request_status': 'ERROR', 'display_message': 'Not found'}, 'POST unknown')
+
+            wait = platform.take_token(account)
+            if wait is None and platform.chance(platform.settings.throttle_rate):
+                wait = 1.0
+            if wait is not None:
+                return self._send(429, {'request_status': 'ERROR', 'display_message': 'Too many requests'}, route,
+                                  headers={'Retry-After': f'{max(wait, 0.01):.2f}', 'X-RateLimit-Remaining': '0'})
+
+            time.sleep(platform.sample_latency(upload='upload' in route))
+            if platform.chance(platform.settings.error_rate):
+                return self._send(500, {'request_status': 'ERROR', 'display_message': 'Internal error'}, route)
+            status, response = handler()
+            self._send(status, response, route)
+
+        def _route(self, path: str, query: str, body: bytes):
+            """(route label, account for rate limiting, handler) of a POST"""
+            for pattern, entity, list_key, item_key in CREATE_ROUTES:
+                match = pattern.match(path)
+                if match:
+                    return f'POST {entity}', match.group(1), lambda: self._create(entity, list_key, item_key, body)
+
+            match = UPLOAD_ROUTE.match(path)
+            if match:
+                return 'POST upload', match.group(1), lambda: (200, {
+                    'request_status': 'SUCCESS',
+                    'result': {'id': match.group(1), 'bytes': len(body)},
+                })
+
+            match = MULTIPART_ROUTE.match(path)
+            if match:
+                action = (parse_qs(query).get('action') or [''])[0].upper()
+                return f'POST multipart_upload {action}', match.group(1), lambda: self._multipart(match.group(1), action)
+            return None, None, None
+
+        def _create(self, entity: str, list_key: str, item_key: str, body: bytes):
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {'request_status': 'ERROR', 'display_message': 'Invalid JSON'}
+            # Snapchat风格的批量请求 {"campaigns": [...]}，也接受单个对象
+            items = payload.get(list_key) if isinstance(payload, dict) else None
+            if not isinstance(items, list):
+                items = [payload]
+            if len(items) > platform.settings.batch_limit:
+                return 400, {
+                    'request_status': 'ERROR',
+                    'display_message': f'At most {platform.settings.batch_limit} {list_key} per request'
+                }
+            return 200, {
+                'request_status': 'SUCCESS',
+                'request_id': uuid.uuid4().hex,
+                list_key: [
+                    {'sub_request_status': 'SUCCESS', item_key: {**item, 'id': str(uuid.uuid4())}}
+                    for item in items if isinstance(item, dict)
+                ],
+            }
+
+        def _multipart(self, media_id: str, action: str):
+            if action == 'INIT':
+                return 200, {
+                    'request_status': 'SUCCESS',
+                    'upload_id': uuid.uuid4().hex,
+                    'add_path': f'/us/v1/media/{media_id}/multipart-upload-v2?action=ADD',
+                    'finalize_path': f'/us/v1/media/{media_id}/multipart-upload-v2?action=FINALIZE',
+                }
+            if action in ('ADD', 'FINALIZE'):
+                return 200, {'request_status': 'SUCCESS', 'result': {'id': media_id}}
+            return 400, {'request_status': 'ERROR', 'display_message': f'Unknown action {action}'}
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def create_server(host: str, port: int, settings: StubSettings) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(StubPlatform(settings)))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub of an ad platform API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5200)
+    parser.add_argument('--latency-ms', type=float, default=50, help='Median latency of API calls (default: 50)')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Log-normal sigma of latency (default: 0.5)')
+    parser.add_argument('--upload-latency-ms', type=float, default=200, help='Median latency of uploads (default: 200)')
+    parser.add_argument('--rate-limit', type=float, default=0, help='Requests per second per ad account, 0 = off')
+    parser.add_argument('--burst', type=float, default=None, help='Token bucket size (default: rate limit)')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='Fraction of random 429 responses')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of random 500 responses')
+    parser.add_argument('--batch-limit', type=int, default=50, help='Max entities per create request (default: 50)')
+    parser.add_argument('--image-bytes', type=int, default=100 * 1024, help='Size of /images/* (default: 100KiB)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    args = parser.parse_args()
+
+    settings = StubSettings(
+        latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, upload_latency_ms=args.upload_latency_ms,
+        rate_limit=args.rate_limit, burst=args.burst, throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate, batch_limit=args.batch_limit, image_bytes=args.image_bytes, seed=args.seed
+    )
+    server = create_server(args.host, args.port, settings)
+    print(f"✓ Stub ad platform listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
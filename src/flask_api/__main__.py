@@ -0,0 +1,9 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+python -m src.flask_api serve --workers N --threads M
+"""
+from src.flask_api.serve import main
+
+main()
@@ -2,26 +2,176 @@
 # @Author  : Leon
 # @Email   : 88978827@qq.com
 """
-Flask API Server - 简化版
-只作为入口，手动配置生成的API客户端路由
+Flask API Server
+生成的API客户端自动注册为路由: /api/<platform>/launch-campaign
 
 使用方法:
 1. 生成平台客户端: python src/main.py --platform snapchat --docs <url>
-2. 在下方手动添加路由配置
-3. 启动服务器: python src/flask_api/api.py
+2. 启动服务器: python src/flask_api/api.py
 """
+import json
 import os
 import sys
-from flask import Flask, request, jsonify
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from flask import Flask, Response, g, request, jsonify, url_for, stream_with_context
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from src.flask_api.config import Config
+from src.flask_api.jobs import JobStore, JobRunner
+from src.flask_api.batch import BatchLauncher
+from src.flask_api.idempotency import IdempotencyManager, IdempotencyStore, fingerprint
+from src.flask_api.registry import PlatformRegistry
+from src.runtime import orchestrator, tracing
+from src.runtime.breaker import get_breakers
+from src.runtime.metrics import HTTP_REQUEST_DURATION, REGISTRY
+from src.runtime.journal import LaunchConflict, LaunchJournal
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# 启动时扫描一次生成的客户端，模块在第一次使用时导入，文件变化后热重载
+# 请求体中带 launch_id 的投放记录在投放日志中，可以从失败的步骤恢复
+registry = PlatformRegistry(
+    app.config['GENERATED_CLIENTS_DIR'],
+    reload_interval=app.config['CLIENT_RELOAD_INTERVAL'],
+    journal=lambda: get_launch_journal()
+)
+
+# 手动注册的launch函数: platform -> launcher(payload, progress_callback=None) -> result
+LAUNCHERS = {}
+
+REQUIRED_LAUNCH_FIELDS = ['account_id', 'campaign', 'ad_squads', 'ads']
+
+_job_runner: Optional[JobRunner] = None
+_job_runner_lock = threading.Lock()
+_batch_launcher: Optional[BatchLauncher] = None
+_idempotency: Optional[IdempotencyManager] = None
+_launch_journal: Optional[LaunchJournal] = None
+
+
+def validate_launch_payload(data) -> Optional[str]:
+    """Return an error message if the launch payload is invalid"""
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+    for field in REQUIRED_LAUNCH_FIELDS:
+        if field not in data:
+            return f'Missing required field: {field}'
+    if 'platform' in data and not (isinstance(data['platform'], str) and data['platform']):
+        return 'platform must be a non-empty string'
+    return None
+
+
+def get_job_runner() -> JobRunner:
+    """Create the job runner on first use and recover jobs of a previous run"""
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            store = JobStore(app.config['JOBS_DB_PATH'], lease_timeout=app.config['JOB_LEASE_TIMEOUT'])
+            _job_runner = JobRunner(store, max_workers=app.config['JOB_WORKERS'])
+            _job_runner.recover(
+                resolve_launcher,
+                fail_interrupted=app.config['JOBS_RECOVER_INTERRUPTED']
+            )
+    return _job_runner
+
+
+def get_batch_launcher() -> BatchLauncher:
+    """Create the shared batch pool on first use"""
+    global _batch_launcher
+    with _job_runner_lock:
+        if _batch_launcher is None:
+            _batch_launcher = BatchLauncher(
+                max_workers=app.config['BATCH_WORKERS'],
+                platform_limits=app.config['PLATFORM_CONCURRENCY'],
+                default_limit=app.config['DEFAULT_PLATFORM_CONCURRENCY']
+            )
+    return _batch_launcher
+
+
+def get_idempotency() -> IdempotencyManager:
+    """Create the Idempotency-Key store on first use"""
+    global _idempotency
+    with _job_runner_lock:
+        if _idempotency is None:
+            store = IdempotencyStore(app.config['IDEMPOTENCY_DB_PATH'], ttl=app.config['IDEMPOTENCY_TTL'])
+            _idempotency = IdempotencyManager(store)
+    return _idempotency
+
+
+def get_launch_journal() -> LaunchJournal:
+    """Open the launch journal on first use"""
+    global _launch_journal
+    with _job_runner_lock:
+        if _launch_journal is None:
+            _launch_journal = LaunchJournal(app.config['LAUNCH_JOURNAL_PATH'])
+    return _launch_journal
+
+
+def _respond_once(platform: str, data: Dict, execute: Callable[[], Tuple[int, Dict]]):
+    """
+    Run execute() once per Idempotency-Key header (or every time without one)
+
+    Duplicates of a completed request replay the stored response with
+    Idempotent-Replayed: true.
+    """
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        status, body = execute()
+        return jsonify(body), status
+
+    status, body, replayed = get_idempotency().run(key, fingerprint(platform, data), execute)
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Idempotency-Key'] = key
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+# ============================================================================
+# 请求耗时
+# ============================================================================
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+    # 请求span是launch步骤和出站调用的父span；支持上游的W3C traceparent
+    g.trace_span, g.trace_token = tracing.start_span(
+        f'{request.method} {request.path}', tracing.SERVER,
+        parent=tracing.parse_traceparent(request.headers.get('traceparent')),
+        **{'http.method': request.method}
+    )
+
+
+@app.after_request
+def _record_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # 按路由模板统计，避免 /api/jobs/<job_id> 产生无限多的标签
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(request.method, route, response.status_code).observe(
+            time.perf_counter() - start
+        )
+    span = g.get('trace_span')
+    if span is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        if request.url_rule is not None:
+            span.name = f'{request.method} {request.url_rule.rule}'
+        response.headers['traceparent'] = tracing.traceparent(span)
+    return response
+
+
+@app.teardown_request
+def _end_trace(error=None):
+    span = g.pop('trace_span', None)
+    if span is not None and error is not None:
+        span.set_error(f'{type(error).__name__}: {error}')
+    tracing.end_span(span, g.pop('trace_token', None))
+
 
 # ============================================================================
 # 核心端点
@@ -29,125 +179,288 @@ app.config.from_object(Config)
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """健康检查"""
+    """
+    健康检查
+
+    平台接口的熔断器不是closed时 status 为 degraded (仍返回200，服务器本身可用)
+    """
+    breakers = get_breakers()
     return jsonify({
-        'status': 'healthy',
-        'service': 'AI Ads Generator API'
+        'status': 'degraded' if breakers.any_open() else 'healthy',
+        'service': 'AI Ads Generator API',
+        'circuit_breakers': breakers.snapshot()
     })
 
 
-@app.route('/api/platforms', methods=['GET'])
-def list_platforms():
-    """列出已配置的平台"""
-    # 手动维护的平台列表
-    configured_platforms = []
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus指标 (文本格式)"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
-    # 自动检测generated_clients目录
-    clients_dir = app.config['GENERATED_CLIENTS_DIR']
-    if os.path.exists(clients_dir):
-        for file in os.listdir(clients_dir):
-            if file.endswith('_api.py') and not file.startswith('__'):
-                platform = file.replace('_api.py', '')
-                configured_platforms.append({
-                    'name': platform,
-                    'file': file,
-                    'status': 'generated'
-                })
 
-    return jsonify({'platforms': configured_platforms})
+@app.route('/api/platforms', methods=['GET'])
+def list_platforms():
+    """列出已生成的平台 (来自客户端索引，内存缓存，支持ETag)"""
+    body, etag = registry.listing()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 # ============================================================================
-# 平台特定路由 - 手动配置区域
+# 平台路由 - 自动发现
 # ============================================================================
 
-# ------------------------------
-# Snapchat 配置
-# ------------------------------
-try:
-    from src.generated_clients.snapchat_api import launch_campaign as snapchat_launch
+def resolve_launcher(platform: str) -> Optional[Callable[..., Dict]]:
+    """LAUNCHERS中手动注册的launcher优先，其次是自动发现的生成客户端"""
+    return LAUNCHERS.get(platform) or registry.launcher(platform)
 
 
-    @app.route('/api/launch-campaign', methods=['POST'])
-    def snapchat_launch_campaign():
-        """
-        Snapchat 广告投放
+def _launch(platform: str):
+    """同步执行一次投放 (带 Idempotency-Key 时重复请求只执行一次)"""
+    data = request.get_json(silent=True)
 
-        POST /api/snapchat/launch-campaign
-        {
-          "account_id": "...",
-          "campaign": {...},
-          "ad_squads": [{...}],
-          "ads": [{...}]
-        }
-        """
-        try:
-            data = request.get_json()
-
-            # 验证必需字段
-            required_fields = ['account_id', 'campaign', 'ad_squads', 'ads']
-            for field in required_fields:
-                if field not in data:
-                    return jsonify({'error': f'Missing required field: {field}'}), 400
-
-            # 调用生成的API
-            result = snapchat_launch(
-                account_id=data['account_id'],
-                campaign_data=data['campaign'],
-                ad_squads_data=data['ad_squads'],
-                ads_data=data['ads']
-            )
+    # 验证必需字段
+    error = validate_launch_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
 
-            return jsonify(result)
+    launcher = resolve_launcher(platform)
+    if launcher is None:
+        return jsonify({
+            'error': f'Platform not configured: {platform}',
+            'hint': f'python -m src.main --platform {platform} --docs <url>'
+        }), 404
 
+    def execute() -> Tuple[int, Dict]:
+        try:
+            # 调用生成的API；使用已有的launch_id时只执行上次失败的步骤
+            return 200, launcher(data)
+        except LaunchConflict as e:
+            return 409, {'error': str(e)}
         except Exception as e:
-            return jsonify({
+            return 500, {
                 'error': str(e),
                 'type': type(e).__name__
-            }), 500
+            }
+
+    return _respond_once(platform, data, execute)
+
+
+@app.route('/api/<platform>/launch-campaign', methods=['POST'])
+def platform_launch_campaign(platform: str):
+    """
+    指定平台广告投放
+
+    POST /api/<platform>/launch-campaign
+    {
+      "account_id": "...",
+      "campaign": {...},
+      "ad_squads": [{...}],
+      "ads": [{...}]
+    }
+    """
+    return _launch(platform)
+
+
+@app.route('/api/launch-campaign', methods=['POST'])
+def launch_campaign():
+    """
+    广告投放，由 platform 字段选择平台 (默认snapchat)
+
+    POST /api/launch-campaign
+    {
+      "platform": "snapchat",
+      "account_id": "...",
+      "campaign": {...},
+      "ad_squads": [{...}],
+      "ads": [{...}]
+    }
+    """
+    data = request.get_json(silent=True)
+    platform = data.get('platform', 'snapchat') if isinstance(data, dict) else 'snapchat'
+    return _launch(platform)
 
 
-    print("✓ Snapchat routes configured")
+# ============================================================================
+# 流式投放进度
+# ============================================================================
+
+@app.route('/api/launch-campaign/stream', methods=['POST'])
+def stream_launch_campaign():
+    """
+    投放广告并流式返回每一步的进度事件
+
+    默认返回NDJSON (每行一个事件)；请求头 Accept: text/event-stream 时返回SSE。
+    最后一个事件为 {"event": "completed", "result": {...}}
+    """
+    data = request.get_json(silent=True)
+    error = validate_launch_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    platform = data.get('platform', 'snapchat')
+    launcher = resolve_launcher(platform)
+    if launcher is None:
+        return jsonify({'error': f'Platform not configured: {platform}'}), 404
+
+    use_sse = request.accept_mimetypes.best == 'text/event-stream'
+
+    def generate():
+        for event in orchestrator.iter_launch_events(launcher, data):
+            line = json.dumps(event, ensure_ascii=False)
+            if use_sse:
+                yield f"event: {event['event']}\ndata: {line}\n\n"
+            else:
+                yield line + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# ============================================================================
+# 批量投放
+# ============================================================================
 
-except ImportError as e:
-    print(f"⚠ Snapchat client not available: {e}")
-    print("  Generate it first: python src/main.py --platform snapchat --docs <url>")
+@app.route('/api/launch-campaigns:batch', methods=['POST'])
+def batch_launch_campaigns():
+    """
+    批量投放，可跨平台
 
+    POST /api/launch-campaigns:batch
+    {
+      "launches": [
+        {"platform": "snapchat", "account_id": "...", "campaign": {...}, "ad_squads": [...], "ads": [...]},
+        ...
+      ]
+    }
 
-# ------------------------------
-# Pinterest 配置 (示例)
-# ------------------------------
-# try:
-#     from src.generated_clients.pinterest_api import launch_campaign as pinterest_launch
-#
-#     @app.route('/api/pinterest/launch-campaign', methods=['POST'])
-#     def pinterest_launch_campaign():
-#         """Pinterest 广告投放"""
-#         try:
-#             data = request.get_json()
-#             result = pinterest_launch(
-#                 account_id=data['account_id'],
-#                 campaign_data=data['campaign'],
-#                 ad_squads_data=data.get('ad_groups', []),  # Pinterest uses ad_groups
-#                 ads_data=data['ads']
-#             )
-#             return jsonify(result)
-#         except Exception as e:
-#             return jsonify({'error': str(e)}), 500
-#
-#     print("✓ Pinterest routes configured")
-# except ImportError:
-#     print("⚠ Pinterest client not available")
+    按请求顺序返回每项结果；单项失败不影响其它项
+    """
+    data = request.get_json(silent=True)
+    launches = data.get('launches') if isinstance(data, dict) else data
+    if not isinstance(launches, list) or not launches:
+        return jsonify({'error': 'Request body must contain a non-empty launches array'}), 400
+    if len(launches) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify({'error': f"Too many launches (max {app.config['BATCH_MAX_ITEMS']})"}), 400
+
+    items = []
+    for payload in launches:
+        platform = payload.get('platform', 'snapchat') if isinstance(payload, dict) else None
+        # 无效的platform由 validate_launch_payload 报告为该项的错误
+        valid = isinstance(platform, str) and platform
+        items.append((platform, payload, resolve_launcher(platform) if valid else None))
+
+    results = get_batch_launcher().run(items, validate=validate_launch_payload)
+
+    summary = {'total': len(results), 'success': 0, 'partial': 0, 'failed': 0}
+    for item in results:
+        summary[item['status'] if item['status'] in summary else 'failed'] += 1
+
+    return jsonify({'results': results, 'summary': summary})
 
 
 # ============================================================================
-# 添加更多平台配置的位置
+# 异步投放任务
 # ============================================================================
 
-# 提示:
-# 1. 生成客户端后，在上方添加 import 语句
-# 2. 复制路由模板，修改平台名称
-# 3. 重启Flask服务器
+@app.route('/api/jobs', methods=['POST'])
+def submit_launch_job():
+    """
+    提交异步投放任务，立即返回202和job_id
+
+    POST /api/jobs
+    {
+      "platform": "snapchat",
+      "account_id": "...",
+      "campaign": {...},
+      "ad_squads": [{...}],
+      "ads": [{...}]
+    }
+    """
+    data = request.get_json(silent=True)
+    error = validate_launch_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    platform = data.get('platform', 'snapchat')
+    launcher = resolve_launcher(platform)
+    if launcher is None:
+        return jsonify({'error': f'Platform not configured: {platform}'}), 404
+
+    def execute() -> Tuple[int, Dict]:
+        job_id = get_job_runner().submit(platform, data, launcher)
+        return 202, {
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('get_launch_job', job_id=job_id)
+        }
+
+    # 带 Idempotency-Key 的重复提交返回同一个job_id
+    return _respond_once(platform, data, execute)
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_launch_job(job_id: str):
+    """查询投放任务的状态、进度和结果"""
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job not found: {job_id}'}), 404
+
+    job.pop('payload', None)
+    return jsonify(job)
+
+
+# ============================================================================
+# 可恢复投放
+# ============================================================================
+
+@app.route('/api/launches/<launch_id>', methods=['GET'])
+def get_launch(launch_id: str):
+    """查询投放的状态、已创建的实体和最近一次结果"""
+    launch = get_launch_journal().get(launch_id)
+    if launch is None:
+        return jsonify({'error': f'Launch not found: {launch_id}'}), 404
+
+    launch.pop('payload', None)
+    launch.pop('input_hash', None)
+    return jsonify(launch)
+
+
+@app.route('/api/launches/<launch_id>/resume', methods=['POST'])
+def resume_launch(launch_id: str):
+    """
+    从失败的步骤继续一次投放 (status='partial' 或 'failed')
+
+    使用保存的payload重新执行，已创建的实体直接复用，不再调用平台API
+    """
+    journal = get_launch_journal()
+    launch = journal.get(launch_id)
+    if launch is None:
+        return jsonify({'error': f'Launch not found: {launch_id}'}), 404
+    if launch['status'] == 'success':
+        return jsonify(launch['result'])
+
+    launcher = resolve_launcher(launch['platform'])
+    if launcher is None:
+        return jsonify({'error': f"Platform not configured: {launch['platform']}"}), 404
+
+    try:
+        return jsonify(launcher(launch['payload']))
+    except LaunchConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'type': type(e).__name__
+        }), 500
 
 
 # ============================================================================
@@ -178,23 +491,19 @@ def main():
     print(f"{'=' * 70}")
     print(f"Server: http://localhost:{port}")
     print(f"Health: http://localhost:{port}/health")
+    print(f"Metrics: http://localhost:{port}/metrics")
     print(f"Platforms: http://localhost:{port}/api/platforms")
-    print(f"\nConfigured endpoints:")
-
-    # 列出所有配置的路由
-    for rule in app.url_map.iter_rules():
-        if rule.endpoint not in ['static', 'health_check', 'list_platforms']:
-            methods = ','.join(rule.methods - {'HEAD', 'OPTIONS'})
-            print(f"  {methods:6} {rule.rule}")
-
-    print(f"{'=' * 70}")
-    print(f"\n手动配置说明:")
-    print(f"1. 生成平台客户端")
-    print(f"2. 编辑 src/flask_api/api.py")
-    print(f"3. 添加import和路由配置")
-    print(f"4. 重启服务器")
+    print(f"Jobs: http://localhost:{port}/api/jobs/<job_id>")
+    print(f"\nDiscovered platforms:")
+    for platform in registry.platforms():
+        print(f"  POST   /api/{platform}/launch-campaign")
+    if not registry.platforms():
+        print(f"  (none) 生成客户端: python src/main.py --platform <name> --docs <url>")
     print(f"{'=' * 70}\n")
 
+    # 恢复上次运行遗留的任务
+    get_job_runner()
+
     app.run(host='0.0.0.0', port=port, debug=debug)
 
 
@@ -0,0 +1,103 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Batch Launch - 批量投放
+一个请求包含多个投放payload (可跨平台)，在共享的有界线程池上执行，
+每个平台的并发数单独限制；结果按请求顺序返回，单个失败不影响其它项。
+"""
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.runtime import tracing
+
+# (platform, payload, launcher) - launcher 为 None 表示无法执行
+BatchItem = Tuple[str, Dict, Optional[Callable[..., Dict]]]
+
+
+class BatchLauncher:
+    """Run launch payloads on a shared pool with per-platform concurrency limits"""
+
+    def __init__(
+            self,
+            max_workers: int = 8,
+            platform_limits: Optional[Dict[str, int]] = None,
+            default_limit: int = 4
+    ):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='launch-batch')
+        self.platform_limits = platform_limits or {}
+        self.default_limit = default_limit
+        self._active = defaultdict(int)
+        self._cond = threading.Condition()
+
+    def limit_for(self, platform: str) -> int:
+        return max(1, self.platform_limits.get(platform, self.default_limit))
+
+    def run(
+            self,
+            items: List[BatchItem],
+            validate: Optional[Callable[[Dict], Optional[str]]] = None
+    ) -> List[Dict]:
+        """
+        Execute a batch and wait for all items
+
+        Args:
+            items: (platform, payload, launcher) tuples in request order
+            validate: Returns an error message for an invalid payload
+
+        Returns:
+            One result dict per item, in request order
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+        pending = deque()
+        for index, (platform, payload, launcher) in enumerate(items):
+            error = validate(payload) if validate else None
+            if error is None and launcher is None:
+                error = f'Platform not configured: {platform}'
+            if error:
+                results[index] = self._item_error(index, platform, error)
+            else:
+                pending.append(index)
+
+        # 按顺序派发，平台达到并发上限时跳过，等有任务完成再继续
+        futures = []
+        with self._cond:
+            while pending:
+                dispatched = False
+                for _ in range(len(pending)):
+                    index = pending.popleft()
+                    platform = items[index][0]
+                    if self._active[platform] < self.limit_for(platform):
+                        self._active[platform] += 1
+                        futures.append(self.executor.submit(tracing.wrap(self._run_item), index, items[index], results))
+                        dispatched = True
+                    else:
+                        pending.append(index)
+                if pending and not dispatched:
+                    self._cond.wait()
+
+        wait(futures)
+        return results
+
+    def _run_item(self, index: int, item: BatchItem, results: List[Optional[Dict]]):
+        platform, payload, launcher = item
+        try:
+            result = launcher(payload)
+            results[index] = {
+                'index': index,
+                'platform': platform,
+                'status': result.get('status', 'success') if isinstance(result, dict) else 'success',
+                'result': result
+            }
+        except Exception as e:
+            results[index] = self._item_error(index, platform, f'{type(e).__name__}: {e}')
+        finally:
+            with self._cond:
+                self._active[platform] -= 1
+                self._cond.notify_all()
+
+    @staticmethod
+    def _item_error(index: int, platform: str, error: str) -> Dict:
+        return {'index': index, 'platform': platform, 'status': 'failed', 'error': error}
@@ -7,6 +7,8 @@ Flask API Configuration
 import os
 from dotenv import load_dotenv
 
+from src.runtime.rate_limit import parse_counts
+
 load_dotenv()
 
 
@@ -15,14 +17,49 @@ class Config:
 
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     PORT = int(os.getenv('FLASK_PORT', 5000))
 
     # Generated clients directory
-    GENERATED_CLIENTS_DIR = os.path.join(
+    GENERATED_CLIENTS_DIR = os.getenv('GENERATED_CLIENTS_DIR', os.path.join(
         os.path.dirname(os.path.dirname(__file__)),
         'generated_clients'
-    )
+    ))
+    # 热重载: 每个平台客户端文件最多每N秒检查一次 (负数关闭)
+    CLIENT_RELOAD_INTERVAL = float(os.getenv('CLIENT_RELOAD_INTERVAL', 2.0))
+
+    # Local state (job store etc.)
+    DATA_DIR = os.getenv('DATA_DIR', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        'data'
+    ))
+
+    # Async launch jobs
+    JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', os.path.join(DATA_DIR, 'jobs.db'))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+    # 执行中的任务超过该秒数没有心跳 (worker崩溃) 时由其他worker接手
+    JOB_LEASE_TIMEOUT = float(os.getenv('JOB_LEASE_TIMEOUT', 300))
+    # 多进程部署时由master在fork前统一处理中断的任务
+    JOBS_RECOVER_INTERRUPTED = True
+
+    # 可恢复投放: 每个launch_id已创建的实体
+    LAUNCH_JOURNAL_PATH = os.getenv('LAUNCH_JOURNAL_PATH', os.path.join(DATA_DIR, 'launches.db'))
+
+    # Idempotency-Key: 保存的结果在TTL内重放
+    IDEMPOTENCY_DB_PATH = os.getenv('IDEMPOTENCY_DB_PATH', os.path.join(DATA_DIR, 'idempotency.db'))
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))
+
+    # Production server (python -m src.flask_api serve)
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 2))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 8))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 120))
+    WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+
+    # Batch launches
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 8))
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+    PLATFORM_CONCURRENCY = parse_counts(os.getenv('PLATFORM_CONCURRENCY', ''))
+    DEFAULT_PLATFORM_CONCURRENCY = int(os.getenv('DEFAULT_PLATFORM_CONCURRENCY', 4))
 
     # Platform credentials (for production mode)
     PLATFORM_TOKENS = {
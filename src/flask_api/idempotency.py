@@ -0,0 +1,199 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Idempotency - Idempotency-Key 请求去重
+客户端超时后重试同一个投放请求时不会重复创建campaign:
+1. 同一进程内并发的重复请求合并到一次执行 (single-flight)，所有请求得到同一个结果
+2. 完成的结果保存在本地SQLite中 (TTL默认24小时)，之后的重复请求直接重放，不调用平台API
+3. 其他worker进程正在执行同一个key时返回409，客户端稍后重试即可拿到保存的结果
+4. 同一个key用于不同的请求内容时返回422
+
+只保存最终结果 (2xx和409以外的4xx)；5xx和409 (如同一个launch_id正在执行) 不保存，
+客户端可以用同一个key重试。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Callable, Dict, Optional, Tuple
+
+from src.runtime.metrics import CACHE_REQUESTS
+
+# (HTTP status, JSON body, replayed)
+IdempotentResult = Tuple[int, Dict, bool]
+
+_REPLAY_HIT = CACHE_REQUESTS.labels('idempotency', 'hit')
+_REPLAY_MISS = CACHE_REQUESTS.labels('idempotency', 'miss')
+
+
+def is_final(status: int) -> bool:
+    """Whether a response is final and can be replayed (2xx, or 4xx except 409 conflicts)"""
+    return 200 <= status < 300 or (400 <= status < 500 and status != 409)
+
+
+def fingerprint(platform: str, payload: Dict) -> str:
+    """Stable hash of a request, used to detect key reuse with a different body"""
+    canonical = json.dumps({'platform': platform, 'payload': payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class IdempotencyStore:
+    """SQLite-backed store of idempotent responses"""
+
+    def __init__(self, db_path: str, ttl: float = 24 * 3600, lock_timeout: float = 300):
+        """
+        Args:
+            db_path: SQLite database file
+            ttl: Seconds a completed response is replayed
+            lock_timeout: Seconds after which an unfinished claim (crashed
+                          worker) can be taken over
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    status_code INTEGER,
+                    body TEXT,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys (created_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the stored entry of a key, or None if unknown or expired"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT * FROM idempotency_keys WHERE key = ?', (key,)).fetchone()
+        if row is None or row['created_at'] < time.time() - self.ttl:
+            return None
+        return {
+            'fingerprint': row['fingerprint'],
+            'status_code': row['status_code'],
+            'body': json.loads(row['body']) if row['body'] is not None else None,
+            'created_at': row['created_at'],
+        }
+
+    def claim(self, key: str, request_hash: str) -> bool:
+        """Atomically reserve a key for execution; False if it is taken"""
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            # 过期的结果和崩溃进程遗留的claim可以被覆盖
+            conn.execute(
+                'DELETE FROM idempotency_keys WHERE key = ? AND '
+                '(created_at < ? OR (status_code IS NULL AND created_at < ?))',
+                (key, now - self.ttl, now - self.lock_timeout)
+            )
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, created_at) VALUES (?, ?, ?)',
+                (key, request_hash, now)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, key: str, status_code: int, body: Dict):
+        """Store the response of a claimed key and purge expired keys"""
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                'UPDATE idempotency_keys SET status_code = ?, body = ?, created_at = ? WHERE key = ?',
+                (status_code, json.dumps(body, ensure_ascii=False), now, key)
+            )
+            conn.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (now - self.ttl,))
+
+    def release(self, key: str):
+        """Drop an unfinished claim so the request can be retried"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM idempotency_keys WHERE key = ? AND status_code IS NULL', (key,))
+
+
+class _Flight:
+    """One in-process execution that concurrent duplicates wait on"""
+
+    def __init__(self, request_hash: str):
+        self.request_hash = request_hash
+        self.done = threading.Event()
+        self.result: Tuple[int, Dict] = (500, {'error': 'Request did not complete'})
+
+
+class IdempotencyManager:
+    """Single-flight execution of requests carrying an Idempotency-Key"""
+
+    def __init__(self, store: IdempotencyStore):
+        self.store = store
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, request_hash: str, execute: Callable[[], Tuple[int, Dict]]) -> IdempotentResult:
+        """
+        Execute a request at most once per key
+
+        Args:
+            key: Idempotency-Key header value
+            request_hash: fingerprint() of the request
+            execute: Performs the request, returns (HTTP status, JSON body)
+
+        Returns:
+            (HTTP status, JSON body, whether the response was replayed)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                stored = self.store.get(key)
+                if stored is not None and stored['status_code'] is not None:
+                    if stored['fingerprint'] != request_hash:
+                        return self._mismatch(key)
+                    _REPLAY_HIT.inc()
+                    return stored['status_code'], stored['body'], True
+                if not self.store.claim(key, request_hash):
+                    return 409, {
+                        'error': f'A request with Idempotency-Key {key} is already in progress',
+                        'hint': 'Retry later to receive its result'
+                    }, False
+                flight = self._flights[key] = _Flight(request_hash)
+
+        if not leader:
+            if flight.request_hash != request_hash:
+                return self._mismatch(key)
+            flight.done.wait()
+            _REPLAY_HIT.inc()
+            status, body = flight.result
+            return status, body, True
+
+        _REPLAY_MISS.inc()
+        try:
+            flight.result = execute()
+        except Exception as e:
+            flight.result = (500, {'error': str(e), 'type': type(e).__name__})
+        finally:
+            status, body = flight.result
+            try:
+                if is_final(status):
+                    self.store.complete(key, status, body)
+                else:
+                    self.store.release(key)
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+        return status, body, False
+
+    @staticmethod
+    def _mismatch(key: str) -> IdempotentResult:
+        return 422, {'error': f'Idempotency-Key {key} was already used with a different request'}, False
@@ -0,0 +1,258 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Launch Jobs - 异步投放任务
+提交后立即返回job_id，由线程池执行launch_campaign，任务状态保存在本地SQLite中，
+服务器重启后仍可查询；重启时仍在排队的任务会重新提交，执行中断的任务标记为failed。
+多个worker进程共享同一个数据库，任务通过原子claim保证只执行一次。
+执行中的任务定期刷新updated_at (心跳)；worker进程崩溃后，租约 (lease_timeout) 过期的任务
+由其他worker重新claim并执行 (带launch_id的投放从日志恢复，不会重复创建实体)。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Dict, List, Optional
+
+from src.runtime import tracing
+
+# Job status values
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+_JSON_FIELDS = ('payload', 'progress', 'result')
+
+
+class JobStore:
+    """SQLite-backed store of launch job state"""
+
+    def __init__(self, db_path: str, lease_timeout: float = 300):
+        """
+        Args:
+            db_path: SQLite database file
+            lease_timeout: Seconds without a heartbeat after which a running
+                           job (crashed worker) can be claimed again
+        """
+        self.db_path = db_path
+        self.lease_timeout = lease_timeout
+        self._lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    platform TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, platform: str, payload: Dict) -> str:
+        """Insert a queued job and return its ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT INTO jobs (id, platform, status, payload, progress, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, platform, QUEUED, json.dumps(payload), json.dumps([]), now, now)
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        """Update columns of a job (JSON columns are serialized)"""
+        for key in _JSON_FIELDS:
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        fields['updated_at'] = time.time()
+
+        columns = ', '.join(f'{key} = ?' for key in fields)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def claim(self, job_id: str) -> bool:
+        """
+        Atomically move a queued job, or a running job whose lease expired,
+        to running; False if another worker got it
+        """
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND '
+                '(status = ? OR (status = ? AND updated_at < ?))',
+                (RUNNING, now, job_id, QUEUED, RUNNING, now - self.lease_timeout)
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_ids: List[str]):
+        """Renew the lease of running jobs"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                'UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?',
+                [(time.time(), job_id, RUNNING) for job_id in job_ids]
+            )
+
+    def list_expired(self) -> List[Dict]:
+        """Return running jobs whose lease expired, oldest first"""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                'SELECT * FROM jobs WHERE status = ? AND updated_at < ? ORDER BY created_at',
+                (RUNNING, time.time() - self.lease_timeout)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def fail_interrupted(self) -> int:
+        """Mark jobs left running by a dead server process as failed"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ?',
+                (FAILED, 'Interrupted by server restart', time.time(), RUNNING)
+            )
+        return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job as a dict, or None if unknown"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_by_status(self, status: str) -> List[Dict]:
+        """Return all jobs with the given status, oldest first"""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                'SELECT * FROM jobs WHERE status = ? ORDER BY created_at', (status,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        for key in _JSON_FIELDS:
+            if job.get(key) is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+
+class JobRunner:
+    """Execute launch jobs on a bounded thread pool"""
+
+    def __init__(self, store: JobStore, max_workers: int = 4):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='launch-job')
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._resolve_launcher: Optional[Callable[[str], Optional[Callable[..., Dict]]]] = None
+        self._stopped = threading.Event()
+        self._maintainer = threading.Thread(target=self._maintain, name='launch-job-lease', daemon=True)
+        self._maintainer.start()
+
+    def close(self, wait: bool = True):
+        """Stop the lease thread and the pool (unfinished jobs become reclaimable)"""
+        self._stopped.set()
+        self._maintainer.join()
+        self.executor.shutdown(wait=wait)
+
+    def submit(self, platform: str, payload: Dict, launcher: Callable[..., Dict]) -> str:
+        """
+        Queue a launch job
+
+        Args:
+            platform: Platform name
+            payload: Launch request body
+            launcher: launcher(payload, progress_callback=...) executing the launch
+
+        Returns:
+            Job ID
+        """
+        job_id = self.store.create(platform, payload)
+        self.executor.submit(tracing.wrap(self._run), job_id, payload, launcher)
+        return job_id
+
+    def recover(
+            self,
+            resolve_launcher: Callable[[str], Optional[Callable[..., Dict]]],
+            fail_interrupted: bool = True
+    ):
+        """
+        Recover jobs left over from a previous server process
+
+        Args:
+            resolve_launcher: Maps a platform name to its launcher (or None)
+            fail_interrupted: Mark running jobs as failed. Multi-worker servers
+                              do this once before forking instead, so a worker
+                              does not fail jobs another worker is running.
+        """
+        if fail_interrupted:
+            self.store.fail_interrupted()
+
+        self._resolve_launcher = resolve_launcher
+        for job in self.store.list_by_status(QUEUED):
+            self._resubmit(job)
+        self.reclaim_expired()
+
+    def reclaim_expired(self):
+        """Run jobs whose worker stopped renewing their lease"""
+        if self._resolve_launcher is None:
+            return
+        for job in self.store.list_expired():
+            self._resubmit(job)
+
+    def _resubmit(self, job: Dict):
+        launcher = self._resolve_launcher(job['platform'])
+        if launcher is None:
+            self.store.update(job['id'], status=FAILED, error=f"Platform not available: {job['platform']}")
+            return
+        self.executor.submit(tracing.wrap(self._run), job['id'], job['payload'], launcher)
+
+    def _maintain(self):
+        # 每1/3租约续期一次自己的任务，并接手崩溃worker遗留的任务
+        while not self._stopped.wait(self.store.lease_timeout / 3):
+            try:
+                with self._running_lock:
+                    running = list(self._running)
+                if running:
+                    self.store.heartbeat(running)
+                self.reclaim_expired()
+            except Exception as e:
+                print(f"⚠ Job lease maintenance failed: {e}")
+
+    def _run(self, job_id: str, payload: Dict, launcher: Callable[..., Dict]):
+        if not self.store.claim(job_id):
+            return
+        with self._running_lock:
+            self._running.add(job_id)
+        events = []
+
+        def on_progress(event: Dict):
+            # 最终结果单独保存在result列
+            if event.get('event') != 'completed':
+                events.append(event)
+                self.store.update(job_id, progress=events)
+
+        try:
+            result = launcher(payload, progress_callback=on_progress)
+            self.store.update(job_id, status=SUCCEEDED, result=result)
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}")
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
@@ -0,0 +1,302 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Platform Registry - 自动发现生成的平台客户端
+启动时扫描一次 GENERATED_CLIENTS_DIR 中的 <platform>_api.py，
+第一次使用某个平台时才导入对应模块，导入后缓存。
+
+热重载: CodeAgent重新生成客户端后不需要重启服务器。
+每个平台最多每 reload_interval 秒 stat 一次文件，发现变化时导入新版本、
+验证通过后原子替换；已经在旧版本上运行的请求继续使用旧模块直到结束。
+"""
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.runtime import orchestrator, routes
+from src.runtime.journal import LaunchJournal
+from src.runtime.metrics import CACHE_REQUESTS
+from src.service.client_manifest import MANIFEST_FILENAME, load_manifest
+
+# 生成客户端必须提供的函数
+REQUIRED_FUNCTIONS = ['create_campaign']
+
+_LISTING_HIT = CACHE_REQUESTS.labels('platform_listing', 'hit')
+_LISTING_MISS = CACHE_REQUESTS.labels('platform_listing', 'miss')
+_MODULE_HIT = CACHE_REQUESTS.labels('client_module', 'hit')
+_MODULE_MISS = CACHE_REQUESTS.labels('client_module', 'miss')
+
+
+class PlatformRegistry:
+    """Lazily loaded registry of generated platform clients"""
+
+    def __init__(
+            self,
+            clients_dir: str,
+            reload_interval: float = 2.0,
+            journal: Optional[Callable[[], LaunchJournal]] = None
+    ):
+        """
+        Args:
+            clients_dir: Directory containing <platform>_api.py files
+            reload_interval: Minimum seconds between file checks per platform
+                             (negative disables hot reload)
+            journal: Returns the launch journal used for payloads with a launch_id
+        """
+        self.clients_dir = clients_dir
+        self.reload_interval = reload_interval
+        self.journal = journal
+        self._files: Dict[str, str] = {}
+        self._modules: Dict[str, ModuleType] = {}
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._versions: Dict[str, int] = {}
+        self._launchers: Dict[str, Callable[..., Dict]] = {}
+        self._lock = threading.Lock()
+        self._scanned_at = 0.0
+        # (manifest signature, body, etag) of the /api/platforms listing
+        self._listing: Optional[Tuple[Optional[Tuple[int, int]], bytes, str]] = None
+        self._listing_checked_at = 0.0
+        self.scan()
+
+    def scan(self):
+        """Discover <platform>_api.py files (does not import them)"""
+        files = {}
+        if os.path.isdir(self.clients_dir):
+            for file in sorted(os.listdir(self.clients_dir)):
+                if file.endswith('_api.py') and not file.startswith('__'):
+                    files[file[:-len('_api.py')]] = os.path.join(self.clients_dir, file)
+        self._files = files
+        self._scanned_at = time.monotonic()
+
+    def _due(self, checked_at: float) -> bool:
+        return 0 <= self.reload_interval <= time.monotonic() - checked_at
+
+    def platforms(self) -> List[str]:
+        """Names of all discovered platforms"""
+        return list(self._files)
+
+    def has_platform(self, platform: str) -> bool:
+        """Whether a platform is discovered (rescans for new clients, throttled)"""
+        if platform not in self._files and self._due(self._scanned_at):
+            with self._lock:
+                if platform not in self._files and self._due(self._scanned_at):
+                    self.scan()
+        return platform in self._files
+
+    def listing(self) -> Tuple[bytes, str]:
+        """
+        Serialized platform listing and its ETag
+
+        Built from manifest.json and kept in memory; the manifest is stat-ed
+        at most once per reload_interval and the listing is rebuilt only when
+        it changed.
+
+        Returns:
+            (JSON body, ETag value)
+        """
+        cached = self._listing
+        if cached is not None and not self._due(self._listing_checked_at):
+            _LISTING_HIT.inc()
+            return cached[1], cached[2]
+
+        with self._lock:
+            self._listing_checked_at = time.monotonic()
+            try:
+                stat = os.stat(os.path.join(self.clients_dir, MANIFEST_FILENAME))
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature = None
+
+            cached = self._listing
+            if cached is None or cached[0] != signature:
+                _LISTING_MISS.inc()
+                if cached is not None:
+                    # 新生成的客户端同时更新了manifest
+                    self.scan()
+                body = self._build_listing()
+                self._listing = cached = (signature, body, hashlib.sha1(body).hexdigest())
+            else:
+                _LISTING_HIT.inc()
+        return cached[1], cached[2]
+
+    def _build_listing(self) -> bytes:
+        entries = load_manifest(self.clients_dir)['platforms']
+        platforms = []
+        for name in self._files:
+            # routes 只供运行时命名出站请求，不出现在列表中
+            entry = {k: v for k, v in entries.get(name, {}).items() if k not in ('platform', 'routes')}
+            platforms.append({
+                'name': name,
+                'file': f'{name}_api.py',
+                'status': 'generated',
+                **entry
+            })
+        return json.dumps({'platforms': platforms}, ensure_ascii=False).encode('utf-8')
+
+    def get_module(self, platform: str) -> ModuleType:
+        """
+        Import a platform client on first use, reloading it if the file changed
+
+        Args:
+            platform: Platform name
+
+        Returns:
+            The current version of the client module
+        """
+        module = self._modules.get(platform)
+        if module is not None and not self._due(self._checked_at.get(platform, 0.0)):
+            _MODULE_HIT.inc()
+            return module
+
+        with self._lock:
+            module = self._modules.get(platform)
+            if module is not None and not self._due(self._checked_at.get(platform, 0.0)):
+                return module
+            if platform not in self._files:
+                raise KeyError(f'Platform not configured: {platform}')
+
+            path = self._files[platform]
+            self._checked_at[platform] = time.monotonic()
+            try:
+                stat = os.stat(path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                if module is not None:
+                    return module
+                raise KeyError(f'Platform client missing: {path}')
+
+            if module is not None and signature == self._signatures.get(platform):
+                _MODULE_HIT.inc()
+                return module
+
+            _MODULE_MISS.inc()
+            try:
+                new_module = self._load(platform, path)
+                self._validate(new_module)
+            except Exception as e:
+                if module is None:
+                    raise
+                # 新版本无效时继续使用旧版本，文件再次变化前不重试
+                self._signatures[platform] = signature
+                print(f"⚠ {platform} client reload failed, keeping previous version: {e}")
+                return module
+
+            # 原子替换: 之后的请求使用新版本，正在运行的请求持有旧模块引用
+            self._modules[platform] = new_module
+            self._signatures[platform] = signature
+            self._register_routes(platform)
+            return new_module
+
+    def _load(self, platform: str, path: str) -> ModuleType:
+        # 每个版本使用独立的模块名，新旧版本可以同时存在
+        version = self._versions.get(platform, 0) + 1
+        self._versions[platform] = version
+        name = f'generated_clients.{platform}_api' + (f'_v{version}' if version > 1 else '')
+
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        print(f"✓ {platform} client loaded (version {version})")
+        return module
+
+    def _register_routes(self, platform: str):
+        """Let the runtime name outbound requests by the documented endpoint templates"""
+        entry = load_manifest(self.clients_dir)['platforms'].get(platform, {})
+        routes.register(platform, entry.get('routes') or [])
+
+    @staticmethod
+    def _validate(module: ModuleType):
+        """Raise if a freshly loaded client is not usable"""
+        for name in REQUIRED_FUNCTIONS:
+            if not callable(getattr(module, name, None)):
+                raise AttributeError(f'{module.__name__} has no function {name}')
+        launch = getattr(module, 'launch_campaign', None)
+        if launch is not None and not callable(launch):
+            raise AttributeError(f'{module.__name__}.launch_campaign is not callable')
+        hierarchy = getattr(module, 'HIERARCHY', None)
+        if hierarchy is not None and (not isinstance(hierarchy, (list, tuple)) or len(hierarchy) < 3):
+            raise ValueError(f'{module.__name__}.HIERARCHY must list at least 3 levels')
+
+    def launcher(self, platform: str) -> Optional[Callable[..., Dict]]:
+        """
+        Return the launcher of a platform, or None if it is not discovered
+
+        launcher(payload, progress_callback=None) calls the generated
+        launch_campaign. The runtime orchestrator runs instead when the
+        client chose a launch_id (journaled, resumable launch), progress
+        events are requested from a launch_campaign without a
+        progress_callback parameter, or the client has no launch_campaign.
+        Orchestrated launches are always journaled: without a client
+        launch_id a server-side one is assigned and returned in the result.
+        """
+        if not self.has_platform(platform):
+            return None
+
+        launcher = self._launchers.get(platform)
+        if launcher is None:
+            def launcher(data: Dict, progress_callback=None) -> Dict:
+                module = self.get_module(platform)
+                # 客户端指定的launch_id总是由编排器执行并记录到投放日志 (用于恢复)
+                generated = getattr(module, 'launch_campaign', None)
+                if not data.get('launch_id') and generated is not None and (
+                        progress_callback is None or accepts_progress(generated)):
+                    return _call_generated(generated, data, progress_callback)
+                resumable = self.journal is not None
+                if resumable and not data.get('launch_id'):
+                    # 服务端分配launch_id，结果中返回，可以用 /api/launches/<launch_id>/resume 恢复
+                    data = {**data, 'launch_id': uuid.uuid4().hex}
+                return orchestrator.launch_campaign(
+                    module,
+                    account_id=data['account_id'],
+                    campaign_data=data['campaign'],
+                    ad_squads_data=data['ad_squads'],
+                    ads_data=data['ads'],
+                    progress_callback=progress_callback,
+                    checkpoint=self.journal().begin(data['launch_id'], platform, data) if resumable else None,
+                    platform=platform
+                )
+
+            self._launchers[platform] = launcher
+        return launcher
+
+
+def accepts_progress(launch: Callable) -> bool:
+    """Whether a generated launch_campaign takes a progress_callback argument"""
+    try:
+        parameters = inspect.signature(launch).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == 'progress_callback' or p.kind == p.VAR_KEYWORD for p in parameters)
+
+
+def _call_generated(launch: Callable, data: Dict, progress_callback=None) -> Dict:
+    """Call a generated launch_campaign; make sure a progress stream ends with 'completed'"""
+    kwargs = {
+        'account_id': data['account_id'],
+        'campaign_data': data['campaign'],
+        'ad_squads_data': data['ad_squads'],
+        'ads_data': data['ads'],
+    }
+    if progress_callback is None:
+        return launch(**kwargs)
+
+    completed = []
+
+    def on_progress(event: Dict):
+        if event.get('event') == 'completed':
+            completed.append(event)
+        progress_callback(event)
+
+    result = launch(progress_callback=on_progress, **kwargs)
+    if not completed:
+        progress_callback({'event': 'completed', 'result': result})
+    return result
@@ -0,0 +1,212 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Production Server - 生产环境启动器
+python -m src.flask_api serve --workers 4 --threads 8
+
+后端:
+- gunicorn (Linux/macOS): 多进程 + 每进程多线程，preload_app 在fork前导入所有平台客户端，
+  worker之间通过copy-on-write共享内存
+- waitress (所有平台，包括Windows): 单进程多线程
+
+两者都在 SIGTERM/SIGINT 时优雅退出：停止接收新连接，等待正在处理的请求完成。
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from typing import List, Optional
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.flask_api.config import Config
+
+BACKENDS = ['auto', 'gunicorn', 'waitress']
+
+
+def preload_clients(registry) -> List[str]:
+    """Import every discovered platform client before workers are forked"""
+    loaded = []
+    for platform in registry.platforms():
+        try:
+            registry.get_module(platform)
+            loaded.append(platform)
+        except Exception as e:
+            print(f"⚠ Failed to preload {platform} client: {e}")
+    return loaded
+
+
+def choose_backend(backend: str) -> str:
+    """Resolve 'auto' to an installed backend"""
+    if backend != 'auto':
+        return backend
+
+    if os.name != 'nt':
+        try:
+            import gunicorn  # noqa: F401
+            return 'gunicorn'
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+        return 'waitress'
+    except ImportError:
+        raise SystemExit(
+            "No production server installed. Install one of:\n"
+            "  pip install gunicorn   (Linux/macOS)\n"
+            "  pip install waitress   (any platform)"
+        )
+
+
+def serve_gunicorn(app, host: str, port: int, workers: int, threads: int, timeout: int, graceful_timeout: int):
+    """Run the app under gunicorn with preloading and gthread workers"""
+    from gunicorn.app.base import BaseApplication
+    from src.flask_api import api
+
+    def post_fork(server, worker):
+        # 线程池不能跨fork，每个worker启动后创建自己的任务执行器
+        api.get_job_runner()
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'{host}:{port}',
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'preload_app': True,
+                'timeout': timeout,
+                'graceful_timeout': graceful_timeout,
+                'post_fork': post_fork,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    _Application().run()
+
+
+class _Stop(Exception):
+    """Raised by the signal handler to leave waitress's event loop"""
+
+
+def _run_until_signal(server, timeout: Optional[float] = None):
+    """server.run() until SIGTERM/SIGINT, or until timeout seconds have passed"""
+    timer = None
+    try:
+        if timeout is not None:
+            timer = threading.Timer(timeout, signal.raise_signal, (signal.SIGTERM,))
+            timer.daemon = True
+            timer.start()
+        server.run()
+    except _Stop:
+        pass
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+
+def serve_waitress(app, host: str, port: int, threads: int, graceful_timeout: int):
+    """Run the app under waitress (single process, multi-threaded)"""
+    import waitress
+    from src.flask_api import api
+
+    server = waitress.create_server(app, host=host, port=port, threads=threads)
+    stopping = []
+
+    def shutdown(signum, frame):
+        if not stopping:
+            print(f"\nReceived signal {signum}, shutting down...")
+        stopping.append(signum)
+        raise _Stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    api.get_job_runner()
+    _run_until_signal(server)
+
+    # 不再接收新连接，等待正在处理的请求完成 (排队中的请求取消)；再次收到信号时不再等待
+    deadline = time.monotonic() + graceful_timeout
+    try:
+        server.task_dispatcher.shutdown(timeout=graceful_timeout)
+    except _Stop:
+        pass
+    # 关闭监听socket，把已完成请求的响应写完；空闲的keep-alive连接最多保留到宽限期结束
+    server.close()
+    _run_until_signal(server, timeout=max(0.0, deadline - time.monotonic()))
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m src.flask_api',
+        description='AI Ads Generator API server'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help='Run the production server')
+    serve.add_argument('--host', default='0.0.0.0', help='Bind address (default: 0.0.0.0)')
+    serve.add_argument('--port', type=int, default=Config.PORT, help=f'Port (default: {Config.PORT})')
+    serve.add_argument('--workers', type=int, default=Config.WEB_WORKERS,
+                       help=f'Worker processes, gunicorn only (default: {Config.WEB_WORKERS})')
+    serve.add_argument('--threads', type=int, default=Config.WEB_THREADS,
+                       help=f'Threads per worker (default: {Config.WEB_THREADS})')
+    serve.add_argument('--backend', choices=BACKENDS, default='auto',
+                       help='Server backend (default: gunicorn if installed, else waitress)')
+    serve.add_argument('--timeout', type=int, default=Config.WEB_TIMEOUT,
+                       help=f'Worker timeout in seconds (default: {Config.WEB_TIMEOUT})')
+    serve.add_argument('--graceful-timeout', type=int, default=Config.WEB_GRACEFUL_TIMEOUT,
+                       help=f'Seconds to finish in-flight requests on shutdown (default: {Config.WEB_GRACEFUL_TIMEOUT})')
+
+    subparsers.add_parser('dev', help='Run the Flask development server')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+
+    from src.flask_api import api
+
+    if args.command == 'dev':
+        api.main()
+        return
+
+    backend = choose_backend(args.backend)
+    app = api.app
+    app.config['DEBUG'] = False
+
+    # 中断的任务在fork前统一处理一次
+    api.JobStore(app.config['JOBS_DB_PATH']).fail_interrupted()
+    app.config['JOBS_RECOVER_INTERRUPTED'] = False
+
+    loaded = preload_clients(api.registry)
+
+    print(f"\n{'=' * 70}")
+    print(f"🚀 AI Ads Generator API Server ({backend})")
+    print(f"{'=' * 70}")
+    print(f"Bind: {args.host}:{args.port}")
+    if backend == 'gunicorn':
+        print(f"Workers: {args.workers} x {args.threads} threads")
+    else:
+        print(f"Threads: {args.threads}")
+        if args.workers > 1:
+            print(f"⚠ waitress runs a single process, --workers {args.workers} ignored")
+    print(f"Preloaded platforms: {', '.join(loaded) or '(none)'}")
+    print(f"{'=' * 70}\n")
+
+    if backend == 'gunicorn':
+        serve_gunicorn(app, args.host, args.port, args.workers, args.threads, args.timeout, args.graceful_timeout)
+    else:
+        serve_waitress(app, args.host, args.port, args.threads, args.graceful_timeout)
+
+
+if __name__ == '__main__':
+    main()
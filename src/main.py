@@ -10,8 +10,6 @@ from dotenv import load_dotenv
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from src.service.code_agent import CodeAgent
-
 # Load environment variables
 load_dotenv()
 
@@ -40,9 +38,34 @@ def main():
         default=None,
         help='Output directory for generated code (default: src/generated_clients)'
     )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print wall/CPU time of each stage (fetch, parse, LLM stages, save)'
+    )
+    parser.add_argument(
+        '--profile-dir',
+        default=None,
+        help='With --profile: also write stages.json, a cProfile file and collapsed stacks here'
+    )
+    parser.add_argument(
+        '--daemon',
+        default=None,
+        help='Submit the job to a running generation daemon, e.g. http://127.0.0.1:5100 '
+             '(default: $GENERATOR_DAEMON_URL unless --profile; start one with python -m src.service.daemon)'
+    )
 
     args = parser.parse_args()
 
+    if args.daemon and args.profile:
+        parser.error('--profile runs the generation in this process and cannot be used with --daemon')
+    # --profile 总是在本进程中生成，忽略 GENERATOR_DAEMON_URL
+    if not args.profile:
+        args.daemon = args.daemon or os.getenv('GENERATOR_DAEMON_URL')
+    if args.daemon:
+        run_on_daemon(args)
+        return
+
     # Verify API key
     if not os.getenv('OPENAI_API_KEY'):
         print("Error: OPENAI_API_KEY not found in environment")
@@ -58,6 +81,10 @@ def main():
     # Create output directory if it doesn't exist
     os.makedirs(args.output_dir, exist_ok=True)
 
+    # 参数检查通过后才导入代码生成依赖 (langchain, bs4, requests)
+    from src.service.code_agent import CodeAgent
+    from src.service.profiling import GenerationProfile
+
     # Initialize agent
     agent = CodeAgent()
 
@@ -70,28 +97,23 @@ def main():
 
     try:
         # Generate the API client
-        output_file = agent.generate_api_client(
-            platform=args.platform,
-            docs_url=args.docs,
-            mock_auth=args.mock_auth,
-            output_dir=args.output_dir
-        )
-
-        print(f"\n{'=' * 60}")
-        print(f"✅ Success! Generated: {output_file}")
-        print(f"{'=' * 60}\n")
-        print("Next steps:")
-        print("1. Test the client directly:")
-        print(f"   python {output_file}")
-        print("\n2. Start Flask server:")
-        print("   python src/flask_api/api.py")
-        print(f"\n3. Test the API with platform='{args.platform}':")
-        print('   curl -X POST http://localhost:5000/api/launch-campaign \\')
-        print('     -H "Content-Type: application/json" \\')
-        print(f'     -d \'{{"platform": "{args.platform}", "account_id": "test", ...}}\'')
-
-        if not args.mock_auth:
-            print(f"\n4. Set {args.platform.upper()}_ACCESS_TOKEN in .env for production")
+        if args.profile:
+            with GenerationProfile(args.profile_dir):
+                output_file = agent.generate_api_client(
+                    platform=args.platform,
+                    docs_url=args.docs,
+                    mock_auth=args.mock_auth,
+                    output_dir=args.output_dir
+                )
+        else:
+            output_file = agent.generate_api_client(
+                platform=args.platform,
+                docs_url=args.docs,
+                mock_auth=args.mock_auth,
+                output_dir=args.output_dir
+            )
+
+        print_next_steps(args, output_file)
 
     except Exception as e:
         print(f"\n❌ Error generating API client: {str(e)}")
@@ -100,5 +122,48 @@ def main():
         sys.exit(1)
 
 
+def run_on_daemon(args):
+    """Thin client: let the warm generation daemon do the work and stream its log"""
+    from src.service.daemon import run_remote
+
+    payload = {
+        'platform': args.platform,
+        'docs_url': args.docs,
+        'mock_auth': args.mock_auth,
+        # 守护进程的工作目录可能不同，传绝对路径
+        'output_dir': os.path.abspath(args.output_dir) if args.output_dir else None,
+    }
+    print(f"Submitting to generation daemon: {args.daemon}")
+    try:
+        job = run_remote(args.daemon, payload)
+    except Exception as e:
+        print(f"\n❌ Generation daemon not reachable at {args.daemon}: {e}")
+        sys.exit(1)
+
+    if job['status'] != 'succeeded':
+        print(f"\n❌ Error generating API client: {job['error']}")
+        sys.exit(1)
+    print(f"\n✓ Generated by daemon in {job['duration']:.1f}s")
+    print_next_steps(args, job['output_file'])
+
+
+def print_next_steps(args, output_file: str):
+    print(f"\n{'=' * 60}")
+    print(f"✅ Success! Generated: {output_file}")
+    print(f"{'=' * 60}\n")
+    print("Next steps:")
+    print("1. Test the client directly:")
+    print(f"   python {output_file}")
+    print("\n2. Start Flask server:")
+    print("   python src/flask_api/api.py")
+    print(f"\n3. Test the API:")
+    print(f'   curl -X POST http://localhost:5000/api/{args.platform}/launch-campaign \\')
+    print('     -H "Content-Type: application/json" \\')
+    print('     -d \'{"account_id": "test", ...}\'')
+
+    if not args.mock_auth:
+        print(f"\n4. Set {args.platform.upper()}_ACCESS_TOKEN in .env for production")
+
+
 if __name__ == '__main__':
     main()
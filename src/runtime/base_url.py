@@ -0,0 +1,71 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Base URL Override - 把生成客户端的平台API地址重定向到其它服务器
+生成的客户端把 BASE_URL 写死在代码里 (如 https://adsapi.snapchat.com/v1)，
+压测和集成测试时通过环境变量把请求发往本地的模拟平台 (benchmarks/stub_platform.py)，
+不需要重新生成客户端:
+
+    PLATFORM_BASE_URL_OVERRIDES=https://adsapi.snapchat.com=http://127.0.0.1:5200
+
+只替换 scheme://host[:port]，路径和查询参数保持不变。
+src.runtime.http.request() 和 src.runtime.media_upload 的上传函数都会应用该映射。
+"""
+import os
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url.strip())
+    return f'{parts.scheme}://{parts.netloc}'.lower()
+
+
+def parse_overrides(value: str) -> Dict[str, str]:
+    """Parse 'https://a.com=http://127.0.0.1:5200,...' into {origin: origin}"""
+    overrides = {}
+    for item in value.split(','):
+        # 按 '=http' 切分，URL中的 '=' 不会被误当作分隔符
+        source, sep, target = item.partition('=http')
+        if not sep:
+            continue
+        overrides[_origin(source)] = _origin('http' + target)
+    return overrides
+
+
+_overrides: Optional[Dict[str, str]] = None
+_overrides_lock = threading.Lock()
+
+
+def get_overrides() -> Dict[str, str]:
+    """Overrides from PLATFORM_BASE_URL_OVERRIDES, read on first use"""
+    global _overrides
+    if _overrides is None:
+        with _overrides_lock:
+            if _overrides is None:
+                _overrides = parse_overrides(os.getenv('PLATFORM_BASE_URL_OVERRIDES', ''))
+    return _overrides
+
+
+def rewrite(url: str) -> str:
+    """Return url with its origin replaced if an override is configured"""
+    overrides = get_overrides()
+    if not overrides:
+        return url
+    parts = urlsplit(url)
+    target = overrides.get(f'{parts.scheme}://{parts.netloc}'.lower())
+    if target is None:
+        return url
+    return target + url[len(parts.scheme) + 3 + len(parts.netloc):]
+
+
+def original(url: str) -> str:
+    """Return url with an override target origin mapped back to the platform origin"""
+    parts = urlsplit(url)
+    origin = f'{parts.scheme}://{parts.netloc}'.lower()
+    for source, target in get_overrides().items():
+        if target == origin:
+            return source + url[len(parts.scheme) + 3 + len(parts.netloc):]
+    return url
@@ -0,0 +1,220 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Circuit Breaker - 平台接口熔断
+平台API降级时，每次投放的每一步都要等到请求超时，Flask worker会被占满。
+每个 (platform, endpoint) 一个熔断器，统计最近 window 秒内的错误率和慢请求:
+- closed: 正常放行；错误率 (5xx、连接错误、超时、超过 slow_call 秒的请求) 达到阈值时打开
+- open: 直接抛出异常，不发送请求 (微秒级失败)；reset_timeout 秒后进入half-open
+- half_open: 放行 half_open_calls 个探测请求，成功则关闭，失败则重新打开
+
+配置 (环境变量):
+    BREAKER_FAILURE_RATE=0.5     # 打开熔断的错误率
+    BREAKER_MIN_CALLS=10         # 窗口内至少这么多请求才计算错误率
+    BREAKER_WINDOW=30            # 统计窗口 (秒)
+    BREAKER_RESET_TIMEOUT=15     # 打开后多久开始探测 (秒)
+    BREAKER_SLOW_CALL=10         # 超过该耗时的请求算作失败 (秒)
+    BREAKER_HALF_OPEN_CALLS=1    # half-open时同时放行的探测请求数
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from . import routes
+
+# Breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# 纯数字、UUID/十六进制、act_123 形式、或较长的字母数字混合的路径段视为实体ID
+_ID_SEGMENT = re.compile(r'^\d+$|^[0-9a-fA-F-]{8,}$|^[A-Za-z]+_\d{4,}$|^(?=.*\d)(?=.*[A-Za-z])\w{16,}$')
+
+
+def endpoint_key(method: str, url: str, platform: Optional[str] = None) -> str:
+    """
+    Normalize a request to its endpoint template
+
+    'POST https://adsapi.snapchat.com/v1/adaccounts/8f2c91d4-.../campaigns'
+    -> 'POST /v1/adaccounts/{id}/campaigns'
+
+    If the platform's documented routes are registered (src.runtime.routes),
+    the matching template is used: 'POST /v1/adaccounts/{ad_account_id}/campaigns'.
+    """
+    route = routes.match_route(platform, method, url)
+    if route is not None:
+        return route
+    segments = ['{id}' if _ID_SEGMENT.match(s) else s for s in urlparse(url).path.split('/')]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker over a sliding time window"""
+
+    def __init__(
+            self,
+            name: str,
+            failure_rate: float = 0.5,
+            min_calls: int = 10,
+            window: float = 30.0,
+            reset_timeout: float = 15.0,
+            slow_call: float = 10.0,
+            half_open_calls: int = 1
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self.reason = ''
+        self._opened_at = 0.0
+        self._probes = 0
+        # (timestamp, failed, elapsed) of recent calls
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Reserve permission for one call
+
+        Raises:
+            Exception: The circuit is open (or half-open with a probe in flight)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                retry_in = self._opened_at + self.reset_timeout - now
+                if retry_in > 0:
+                    raise Exception(
+                        f'Circuit open for {self.name} ({self.reason}), retry in {retry_in:.0f}s'
+                    )
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    raise Exception(f'Circuit half-open for {self.name}, waiting for probe request')
+                self._probes += 1
+
+    def record(self, ok: bool, elapsed: float):
+        """
+        Record the outcome of an allowed call
+
+        Args:
+            ok: False for 5xx responses, connection errors and timeouts
+            elapsed: Call duration in seconds
+        """
+        failed = not ok or elapsed >= self.slow_call
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failed:
+                    self._open(now, 'probe failed')
+                else:
+                    self.state = CLOSED
+                    self.reason = ''
+                    self._calls.clear()
+                return
+
+            self._calls.append((now, failed, elapsed))
+            self._trim(now)
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for _, f, _ in self._calls if f)
+                if failures / len(self._calls) >= self.failure_rate:
+                    self._open(now, f'{failures}/{len(self._calls)} calls failed or slow in {self.window:.0f}s')
+
+    def _trim(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _open(self, now: float, reason: str):
+        self.state = OPEN
+        self.reason = reason
+        self._opened_at = now
+        self._calls.clear()
+        print(f"⚠ Circuit opened for {self.name}: {reason}")
+
+    def snapshot(self) -> Dict:
+        """Current state for /health"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            calls = len(self._calls)
+            failures = sum(1 for _, f, _ in self._calls if f)
+            latency = sum(e for _, _, e in self._calls) / calls if calls else 0.0
+            snapshot = {
+                'name': self.name,
+                'state': self.state,
+                'calls': calls,
+                'failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'avg_latency_ms': round(latency * 1000, 1),
+            }
+            if self.state == OPEN:
+                snapshot['reason'] = self.reason
+                snapshot['retry_in_s'] = round(max(0.0, self._opened_at + self.reset_timeout - now), 1)
+            return snapshot
+
+
+class BreakerRegistry:
+    """Circuit breakers keyed by (platform, endpoint)"""
+
+    def __init__(self, **settings):
+        """
+        Args:
+            **settings: CircuitBreaker keyword arguments shared by all breakers
+        """
+        self.settings = settings
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, platform: str, endpoint: str) -> CircuitBreaker:
+        key = (platform, endpoint)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(f'{platform} {endpoint}', **self.settings)
+        return breaker
+
+    def snapshot(self) -> List[Dict]:
+        """State of every breaker that has seen traffic"""
+        return [breaker.snapshot() for breaker in list(self._breakers.values())]
+
+    def any_open(self) -> bool:
+        return any(breaker.state != CLOSED for breaker in list(self._breakers.values()))
+
+
+def from_env() -> BreakerRegistry:
+    """Build the breaker registry from the environment variables listed above"""
+    return BreakerRegistry(
+        failure_rate=float(os.getenv('BREAKER_FAILURE_RATE', 0.5)),
+        min_calls=int(os.getenv('BREAKER_MIN_CALLS', 10)),
+        window=float(os.getenv('BREAKER_WINDOW', 30)),
+        reset_timeout=float(os.getenv('BREAKER_RESET_TIMEOUT', 15)),
+        slow_call=float(os.getenv('BREAKER_SLOW_CALL', 10)),
+        half_open_calls=int(os.getenv('BREAKER_HALF_OPEN_CALLS', 1))
+    )
+
+
+_breakers: Optional[BreakerRegistry] = None
+_breakers_lock = threading.Lock()
+
+
+def get_breakers() -> BreakerRegistry:
+    """Process-wide circuit breakers shared by all generated clients"""
+    global _breakers
+    if _breakers is None:
+        with _breakers_lock:
+            if _breakers is None:
+                _breakers = from_env()
+    return _breakers
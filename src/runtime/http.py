@@ -0,0 +1,111 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+HTTP - 生成客户端的出站请求入口
+生成的PRODUCTION客户端通过 request() 调用平台API，而不是直接使用 requests:
+每个请求先从 (platform, account_id) 的令牌桶取令牌并占用一个平台并发槽位，
+遇到429时按 Retry-After 等待后重试，限流信息由所有线程共享。
+(platform, endpoint) 的熔断器打开时直接失败，不发送请求。
+每次发送记录一个CLIENT span (名称为endpoint)。
+PLATFORM_BASE_URL_OVERRIDES 可以把请求重定向到模拟平台 (见 base_url.py)。
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+
+from .breaker import BreakerRegistry, endpoint_key, get_breakers
+from .metrics import OUTBOUND_REQUEST_DURATION, OUTBOUND_REQUESTS
+from .rate_limit import RateLimiter, get_limiter
+from . import base_url, tracing
+
+# 429重试次数
+MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', 3))
+DEFAULT_TIMEOUT = 30
+
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """One keep-alive session per thread (requests.Session is not thread-safe)"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def request(
+        method: str,
+        url: str,
+        platform: str,
+        account_id: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        limiter: Optional[RateLimiter] = None,
+        breakers: Optional[BreakerRegistry] = None,
+        max_retries: int = MAX_RETRIES,
+        timeout: int = DEFAULT_TIMEOUT,
+        **kwargs
+) -> requests.Response:
+    """
+    Send a rate-limited request to an ad platform
+
+    Args:
+        method: HTTP method
+        url: Request URL
+        platform: Platform name (selects the rate limit)
+        account_id: Ad account the request counts against
+        session: Optional requests session (default: one per thread)
+        limiter: Optional rate limiter (default: process-wide limiter)
+        breakers: Optional circuit breakers (default: process-wide breakers)
+        max_retries: Retries after a 429 response
+        timeout: Request timeout in seconds
+        **kwargs: Passed to requests (headers, json, params, ...)
+
+    Returns:
+        The last response; still 429 if all retries were throttled
+
+    Raises:
+        Exception: The circuit breaker of the endpoint is open
+        requests.RequestException: Connection errors and timeouts
+    """
+    url = base_url.rewrite(url)
+    session = session or get_session()
+    limiter = limiter or get_limiter()
+    endpoint = endpoint_key(method, url, platform)
+    breaker = (breakers or get_breakers()).get(platform, endpoint)
+
+    duration = OUTBOUND_REQUEST_DURATION.labels(platform)
+
+    attempt = 0
+    while True:
+        # 熔断器打开时立即失败，不占用令牌
+        try:
+            breaker.allow()
+        except Exception:
+            OUTBOUND_REQUESTS.labels(platform, 'circuit_open').inc()
+            raise
+        status = 'error'
+        start = time.monotonic()
+        with tracing.span(endpoint, tracing.CLIENT, platform=platform, **{
+                'http.method': method, 'http.url': url, 'retry': attempt}) as span:
+            try:
+                limiter.acquire(platform, account_id)
+                with limiter.slot(platform):
+                    start = time.monotonic()
+                    response = session.request(method, url, timeout=timeout, **kwargs)
+                status = response.status_code
+                span.set_attribute('http.status_code', status)
+            finally:
+                elapsed = time.monotonic() - start
+                breaker.record(status != 'error' and status < 500, elapsed)
+                duration.observe(elapsed)
+                OUTBOUND_REQUESTS.labels(platform, status).inc()
+
+        delay = limiter.observe(platform, account_id, response.status_code, response.headers)
+        if response.status_code != 429 or attempt >= max_retries:
+            return response
+        attempt += 1
+        print(f"⚠ {platform} rate limited, retry {attempt}/{max_retries} in {delay:.1f}s")
@@ -0,0 +1,190 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Launch Journal - 可恢复的投放
+每次投放按 launch_id 在本地SQLite中记录已经创建的实体ID
+(campaign, 每个ad squad, 每个ad的media/upload/creative/ad)。
+launch_campaign 返回 status='partial' 后用同一个 launch_id 重新执行时，
+已创建的实体直接复用，只重试失败的步骤:
+大型campaign的重试从 O(全部实体) 变为 O(失败实体) 次API调用。
+
+同一个 launch_id 只能用于相同的输入 (按输入hash校验)；begin 在同一个事务中检查并进入running，
+输入不同或正在执行时抛出 LaunchConflict。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Optional
+
+# Launch status values
+RUNNING = 'running'
+SUCCESS = 'success'
+
+# 参与输入hash的payload字段
+_INPUT_FIELDS = ('account_id', 'campaign', 'ad_squads', 'ads')
+
+
+class LaunchConflict(Exception):
+    """The launch ID is running elsewhere or was started with a different payload"""
+
+
+def input_hash(platform: str, payload: Dict) -> str:
+    """Hash of the launch input; platform and entity fields only"""
+    data = {'platform': platform, **{k: payload.get(k) for k in _INPUT_FIELDS}}
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class LaunchCheckpoint:
+    """Created entities of one launch; handed to the orchestrator"""
+
+    def __init__(self, journal: 'LaunchJournal', launch_id: str, entities: Dict[str, str]):
+        self.journal = journal
+        self.launch_id = launch_id
+        self.entities = entities
+        # finish() 已经保存了这次执行的结果
+        self.finished = False
+
+    def get(self, step: str) -> Optional[str]:
+        """Entity ID created by a step in an earlier attempt"""
+        return self.entities.get(step)
+
+    def record(self, step: str, entity_id: str):
+        """Persist the entity created by a step before moving on"""
+        self.entities[step] = entity_id
+        self.journal.record(self.launch_id, step, entity_id)
+
+    def finish(self, result: Dict):
+        self.journal.finish(self.launch_id, result)
+        self.finished = True
+
+
+class LaunchJournal:
+    """SQLite-backed journal of created entities per launch"""
+
+    def __init__(self, db_path: str, lock_timeout: float = 300):
+        """
+        Args:
+            db_path: SQLite database file
+            lock_timeout: Seconds after which a launch left running (crashed
+                          process) can be resumed
+        """
+        self.db_path = db_path
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS launches (
+                    launch_id TEXT PRIMARY KEY,
+                    platform TEXT NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS launch_entities (
+                    launch_id TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    entity_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (launch_id, step)
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, launch_id: str) -> Optional[Dict]:
+        """Return a launch with its payload, entities and last result, or None"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT * FROM launches WHERE launch_id = ?', (launch_id,)).fetchone()
+            if row is None:
+                return None
+            entities = conn.execute(
+                'SELECT step, entity_id FROM launch_entities WHERE launch_id = ?', (launch_id,)
+            ).fetchall()
+
+        launch = dict(row)
+        launch['payload'] = json.loads(launch['payload'])
+        launch['result'] = json.loads(launch['result']) if launch['result'] else None
+        launch['entities'] = {r['step']: r['entity_id'] for r in entities}
+        return launch
+
+    def begin(self, launch_id: str, platform: str, payload: Dict) -> LaunchCheckpoint:
+        """
+        Start or resume a launch
+
+        Args:
+            launch_id: Client or server assigned launch ID
+            platform: Platform name
+            payload: Launch payload
+
+        Returns:
+            Checkpoint holding the entities created by earlier attempts
+
+        Raises:
+            LaunchConflict: Different payload, or still running
+        """
+        request_hash = input_hash(platform, payload)
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO launches '
+                '(launch_id, platform, input_hash, payload, status, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (launch_id, platform, request_hash, json.dumps(payload), 'new', now, now)
+            )
+            # 原子地进入running，防止同一个launch被并发执行两次
+            cursor = conn.execute(
+                'UPDATE launches SET status = ?, attempts = attempts + 1, updated_at = ? '
+                'WHERE launch_id = ? AND input_hash = ? AND (status != ? OR updated_at < ?)',
+                (RUNNING, now, launch_id, request_hash, RUNNING, now - self.lock_timeout)
+            )
+            if cursor.rowcount != 1:
+                row = conn.execute(
+                    'SELECT input_hash FROM launches WHERE launch_id = ?', (launch_id,)
+                ).fetchone()
+                conn.rollback()
+                if row['input_hash'] != request_hash:
+                    raise LaunchConflict(f'Launch {launch_id} was started with a different payload')
+                raise LaunchConflict(f'Launch {launch_id} is still running')
+            entities = conn.execute(
+                'SELECT step, entity_id FROM launch_entities WHERE launch_id = ?', (launch_id,)
+            ).fetchall()
+
+        return LaunchCheckpoint(self, launch_id, {r['step']: r['entity_id'] for r in entities})
+
+    def record(self, launch_id: str, step: str, entity_id: str):
+        """Record an entity created by a step"""
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO launch_entities (launch_id, step, entity_id, created_at) '
+                'VALUES (?, ?, ?, ?)',
+                (launch_id, step, entity_id, now)
+            )
+            conn.execute('UPDATE launches SET updated_at = ? WHERE launch_id = ?', (now, launch_id))
+
+    def finish(self, launch_id: str, result: Dict):
+        """Store the result and final status of an attempt"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                'UPDATE launches SET status = ?, result = ?, updated_at = ? WHERE launch_id = ?',
+                (result.get('status', 'failed'), json.dumps(result, ensure_ascii=False), time.time(), launch_id)
+            )
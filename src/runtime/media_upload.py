@@ -0,0 +1,324 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Media Upload - 流式媒体上传
+生成的客户端通过这里上传图片/视频，不把整个文件读进内存:
+1. 小文件: 下载流直接管道到一个 multipart/form-data 请求体
+2. 大文件: 使用Snapchat的分片上传协议 (multipart-upload-v2: INIT -> ADD -> FINALIZE)
+
+每次上传的内存占用只取决于 chunk_size / part_size，与文件大小无关。
+上传请求和其他平台调用一样经过 http.request: 限流、熔断、出站指标和CLIENT span，
+并应用 PLATFORM_BASE_URL_OVERRIDES (见 base_url.py)。
+流式请求体只能发送一次，所以单请求上传遇到429不重试；分片上传的每个请求可以重试。
+"""
+import ipaddress
+import os
+import uuid
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from . import http
+from .base_url import original as original_url
+from .http import get_session
+
+# 下载流的读取块大小
+CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', 64 * 1024))
+# 超过该大小使用分片上传协议 (Snapchat 单次上传上限 32MB)
+MULTIPART_THRESHOLD = int(os.getenv('MEDIA_MULTIPART_THRESHOLD', 32 * 1024 * 1024))
+# 分片上传每片大小
+PART_SIZE = int(os.getenv('MEDIA_PART_SIZE', 5 * 1024 * 1024))
+
+class _MultipartStream:
+    """
+    Iterable multipart/form-data body
+
+    Wraps a download stream with the multipart preamble and epilogue.
+    When the file size is known, ``__len__`` lets requests send a
+    Content-Length header instead of chunked transfer encoding.
+    """
+
+    def __init__(
+            self,
+            chunks: Iterator[bytes],
+            field_name: str,
+            filename: str,
+            content_type: str,
+            file_size: Optional[int] = None
+    ):
+        self.boundary = uuid.uuid4().hex
+        self._chunks = chunks
+        self._preamble = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode('utf-8')
+        self._epilogue = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self._file_size = file_size
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._preamble
+        for chunk in self._chunks:
+            if chunk:
+                yield chunk
+        yield self._epilogue
+
+
+class _SizedMultipartStream(_MultipartStream):
+    """Multipart body with a known total length"""
+
+    def __len__(self) -> int:
+        return len(self._preamble) + self._file_size + len(self._epilogue)
+
+
+def _open_source(source_url: str, session: requests.Session, timeout: int) -> requests.Response:
+    """Open a streaming download of the source media"""
+    try:
+        response = session.get(source_url, stream=True, timeout=timeout)
+        response.raise_for_status()
+        return response
+    except Exception as e:
+        raise Exception(f"Failed to download media from {source_url}: {str(e)}")
+
+
+def _source_info(response: requests.Response, source_url: str):
+    """Return (file_size, filename, content_type) of a download response"""
+    length = response.headers.get('Content-Length')
+    file_size = int(length) if length and length.isdigit() else None
+    if response.headers.get('Content-Encoding'):
+        # iter_content 会解压，实际字节数与 Content-Length 不一致
+        file_size = None
+
+    filename = os.path.basename(urlparse(source_url).path) or 'media'
+    content_type = response.headers.get('Content-Type', 'application/octet-stream').split(';')[0]
+    return file_size, filename, content_type
+
+
+def _iter_parts(response: requests.Response, part_size: int) -> Iterator[bytes]:
+    """Group a download stream into parts of at most part_size bytes"""
+    buffer = bytearray()
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if not chunk:
+            continue
+        buffer.extend(chunk)
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def platform_of(url: str) -> str:
+    """
+    Platform name from an API URL: 'https://adsapi.snapchat.com/v1' -> 'snapchat'
+
+    Fallback for callers that do not pass platform. An override target
+    (http://127.0.0.1:5200 in PLATFORM_BASE_URL_OVERRIDES) resolves to the
+    platform URL it replaces; other IP addresses and single-label hosts
+    are 'unknown'.
+    """
+    hostname = urlparse(original_url(url)).hostname or ''
+    try:
+        ipaddress.ip_address(hostname)
+        return 'unknown'
+    except ValueError:
+        pass
+    labels = hostname.split('.')
+    return labels[-2] if len(labels) >= 2 else 'unknown'
+
+
+def _parse_response(response: requests.Response) -> Dict:
+    """Raise on error status and return the parsed JSON body"""
+    if response.status_code >= 400:
+        raise Exception(f"Media upload failed ({response.status_code}): {response.text[:500]}")
+    try:
+        return response.json()
+    except ValueError:
+        return {'request_status': 'SUCCESS', 'status_code': response.status_code}
+
+
+def stream_upload(
+        upload_url: str,
+        source_url: str,
+        headers: Optional[Dict] = None,
+        field_name: str = 'file',
+        session: Optional[requests.Session] = None,
+        timeout: int = 300,
+        platform: Optional[str] = None,
+        account_id: Optional[str] = None,
+        _source: Optional[requests.Response] = None
+) -> Dict:
+    """
+    Pipe a download straight into a single multipart upload request
+
+    Args:
+        upload_url: Platform upload endpoint
+        source_url: URL of the image/video to upload
+        headers: Extra headers (e.g. Authorization)
+        field_name: Multipart field name of the file
+        session: Optional requests session (default: one per thread)
+        timeout: Request timeout in seconds
+        platform: Platform of the rate limit and circuit breaker (default: platform_of the URL)
+        account_id: Ad account the upload counts against
+
+    Returns:
+        Parsed JSON response of the upload endpoint
+    """
+    platform = platform or platform_of(upload_url)
+    session = session or get_session()
+    source = _source or _open_source(source_url, session, timeout)
+    try:
+        file_size, filename, content_type = _source_info(source, source_url)
+        body_class = _MultipartStream if file_size is None else _SizedMultipartStream
+        body = body_class(
+            source.iter_content(chunk_size=CHUNK_SIZE),
+            field_name,
+            filename,
+            content_type,
+            file_size
+        )
+        request_headers = dict(headers or {})
+        request_headers['Content-Type'] = body.content_type
+
+        response = http.request(
+            'POST', upload_url, platform, account_id, session=session, max_retries=0,
+            timeout=timeout, headers=request_headers, data=body
+        )
+        return _parse_response(response)
+    finally:
+        source.close()
+
+
+def chunked_upload(
+        base_url: str,
+        media_id: str,
+        source_url: str,
+        headers: Optional[Dict] = None,
+        part_size: int = PART_SIZE,
+        session: Optional[requests.Session] = None,
+        timeout: int = 300,
+        platform: Optional[str] = None,
+        account_id: Optional[str] = None,
+        _source: Optional[requests.Response] = None
+) -> Dict:
+    """
+    Upload large media with Snapchat's multipart-upload-v2 protocol
+
+    INIT 声明文件大小和分片数量，ADD 逐片上传，FINALIZE 完成上传。
+    内存中最多只保留一个分片。
+
+    Args:
+        base_url: API base URL (e.g. https://adsapi.snapchat.com/v1)
+        media_id: Media object ID returned by create_media
+        source_url: URL of the image/video to upload
+        headers: Extra headers (e.g. Authorization)
+        part_size: Size of each uploaded part in bytes
+        session: Optional requests session (default: one per thread)
+        timeout: Request timeout in seconds
+        platform: Platform of the rate limit and circuit breaker (default: platform_of the URL)
+        account_id: Ad account the upload counts against
+
+    Returns:
+        Parsed JSON response of the FINALIZE call
+    """
+    platform = platform or platform_of(base_url)
+    session = session or get_session()
+    source = _source or _open_source(source_url, session, timeout)
+    try:
+        file_size, filename, _ = _source_info(source, source_url)
+        if file_size is None:
+            raise Exception("Chunked upload requires a Content-Length on the media source")
+
+        request_headers = dict(headers or {})
+        request_headers.pop('Content-Type', None)
+
+        def post(url: str, files: Dict) -> Dict:
+            return _parse_response(http.request(
+                'POST', url, platform, account_id, session=session, timeout=timeout,
+                headers=request_headers, files=files
+            ))
+
+        number_of_parts = max(1, -(-file_size // part_size))
+
+        # 分片路径是相对于API host的 (例如 /us/v1/media/{id}/multipart-upload-v2?action=ADD)
+        parsed = urlparse(base_url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+
+        init = post(f"{base_url.rstrip('/')}/media/{media_id}/multipart-upload-v2?action=INIT", {
+            'file_name': (None, filename),
+            'file_size': (None, str(file_size)),
+            'number_of_parts': (None, str(number_of_parts)),
+        })
+        upload_id = init['upload_id']
+        add_url = host + init['add_path']
+        finalize_url = host + init['finalize_path']
+
+        for part_number, part in enumerate(_iter_parts(source, part_size), start=1):
+            post(add_url, {
+                'file': (filename, part),
+                'part_number': (None, str(part_number)),
+                'upload_id': (None, upload_id),
+            })
+
+        return post(finalize_url, {'upload_id': (None, upload_id)})
+    finally:
+        source.close()
+
+
+def upload_media_from_url(
+        base_url: str,
+        media_id: str,
+        source_url: str,
+        headers: Optional[Dict] = None,
+        session: Optional[requests.Session] = None,
+        timeout: int = 300,
+        platform: Optional[str] = None,
+        account_id: Optional[str] = None
+) -> Dict:
+    """
+    Upload media from a URL, choosing the upload protocol by file size
+
+    Files up to MULTIPART_THRESHOLD are streamed to {base_url}/media/{media_id}/upload,
+    larger files go through the chunked multipart-upload-v2 protocol.
+
+    Args:
+        base_url: API base URL (e.g. https://adsapi.snapchat.com/v1)
+        media_id: Media object ID returned by create_media
+        source_url: URL of the image/video to upload
+        headers: Extra headers (e.g. Authorization)
+        session: Optional requests session (default: one per thread)
+        timeout: Request timeout in seconds
+        platform: Platform of the rate limit and circuit breaker (default: platform_of the URL)
+        account_id: Ad account the upload counts against
+
+    Returns:
+        Parsed JSON response of the platform
+    """
+    session = session or get_session()
+    source = _open_source(source_url, session, timeout)
+    file_size, _, _ = _source_info(source, source_url)
+
+    if file_size is not None and file_size > MULTIPART_THRESHOLD:
+        return chunked_upload(
+            base_url, media_id, source_url,
+            headers=headers, session=session, timeout=timeout,
+            platform=platform, account_id=account_id, _source=source
+        )
+
+    # 小文件: 复用已打开的下载流，不重复下载
+    return stream_upload(
+        f"{base_url.rstrip('/')}/media/{media_id}/upload",
+        source_url,
+        headers=headers,
+        session=session,
+        timeout=timeout,
+        platform=platform,
+        account_id=account_id,
+        _source=source
+    )
@@ -0,0 +1,239 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Metrics - Prometheus文本格式的计数器和直方图
+Flask 的 /metrics 端点输出 REGISTRY.render()。
+
+热路径开销:
+- labels() 的结果按标签值缓存，命中时只是一次dict查找，不加锁
+- 直方图的bucket在创建时预分配，observe() 只做一次二分查找，
+  每个标签组合一把锁 (不同路由/平台之间没有竞争)
+- 热路径上可以在模块级保存 labels() 返回的子对象，完全跳过查找
+
+gunicorn多进程部署时每个worker有自己的计数，由Prometheus按实例分别抓取。
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# 默认直方图bucket (秒)：覆盖从毫秒级的mock调用到分钟级的LLM调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # 最后一个元素是 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    """Base class: children keyed by label values"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Return the child for a label combination (created once, then cached)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}, got {values}')
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def _render_samples(self, lines: List[str]):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        self._render_samples(lines)
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        """Increment a counter without labels"""
+        self.labels().inc(amount)
+
+    def _render_samples(self, lines: List[str]):
+        for values, child in sorted(self._children.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}')
+
+
+class Histogram(_Metric):
+    """Histogram with fixed, preallocated buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Observe a value on a histogram without labels"""
+        self.labels().observe(value)
+
+    def _render_samples(self, lines: List[str]):
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric already registered: {metric.name}')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+
+# ============================================================================
+# 指标定义
+# ============================================================================
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'ads_http_request_duration_seconds',
+    'Flask request latency per route',
+    ('method', 'route', 'status')
+)
+
+LAUNCH_STEP_DURATION = REGISTRY.histogram(
+    'ads_launch_step_duration_seconds',
+    'Launch step latency per platform and entity type',
+    ('platform', 'entity')
+)
+LAUNCH_STEP_FAILURES = REGISTRY.counter(
+    'ads_launch_step_failures_total',
+    'Failed launch steps per platform and entity type',
+    ('platform', 'entity')
+)
+
+OUTBOUND_REQUESTS = REGISTRY.counter(
+    'ads_outbound_requests_total',
+    'Outbound ad platform API calls by status code (error = no response, circuit_open = not sent)',
+    ('platform', 'status')
+)
+OUTBOUND_REQUEST_DURATION = REGISTRY.histogram(
+    'ads_outbound_request_duration_seconds',
+    'Outbound ad platform API call latency',
+    ('platform',)
+)
+
+LLM_CALL_DURATION = REGISTRY.histogram(
+    'ads_llm_call_duration_seconds',
+    'LLM call latency per generation stage',
+    ('stage',)
+)
+LLM_TOKENS = REGISTRY.counter(
+    'ads_llm_tokens_total',
+    'LLM tokens per generation stage',
+    ('stage', 'kind')
+)
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'ads_cache_requests_total',
+    'Cache lookups by cache and result (hit/miss)',
+    ('cache', 'result')
+)
@@ -0,0 +1,310 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Launch Orchestrator - 带进度回调的投放工作流
+按 snapchat_step2.md 的6步工作流调用生成客户端的Stage 1函数，
+每完成一步通过 progress_callback 报告一个事件:
+campaign_created, ad_squad_created, media_created, media_uploaded,
+creative_created, ad_created, step_failed, completed
+
+传入 checkpoint (src.runtime.journal) 时每个创建的实体都会记录下来，
+恢复执行时复用已创建的实体 (事件带 resumed=True)，只重试失败的步骤。
+"""
+import queue
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .journal import LaunchCheckpoint
+from . import tracing
+from .metrics import LAUNCH_STEP_DURATION, LAUNCH_STEP_FAILURES
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+_DONE = object()
+
+# 所有平台相同的Stage 1实体 (第二层级的名称因平台而异: ad_squad / ad_group / ad_set)
+_FIXED_TYPES = ('campaign', 'media', 'creative', 'ad')
+
+# ads_data中属于ad本身的字段；其余字段 (headline, brand_name, call_to_action ...) 属于creative，
+# name 两者都使用。image_url / media_type / <squad>_index 只用于编排
+AD_FIELDS = ('name', 'status', 'start_time', 'end_time')
+
+
+def split_ad_fields(ad_data: Dict[str, Any], squad_type: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """ads_data item -> (creative fields, ad fields)"""
+    workflow_keys = ('image_url', 'media_type', f'{squad_type}_index')
+    fields = {k: v for k, v in ad_data.items() if k not in workflow_keys}
+    creative_fields = {k: v for k, v in fields.items() if k == 'name' or k not in AD_FIELDS}
+    ad_fields = {k: v for k, v in fields.items() if k in AD_FIELDS}
+    return creative_fields, ad_fields
+
+
+def extract_id(response: Any, resource: str) -> Optional[str]:
+    """
+    Extract the created entity ID from a platform response
+
+    Supports mock responses ({'id': ...}) and Snapchat style envelopes
+    ({'campaigns': [{'campaign': {'id': ...}}]}).
+    """
+    if isinstance(response, str):
+        return response
+    if not isinstance(response, dict):
+        return None
+    if response.get('id'):
+        return response['id']
+    if response.get(f'{resource}_id'):
+        return response[f'{resource}_id']
+
+    # Snapchat的media不用复数: {'media': [{'media': {...}}]}
+    for key in (f'{resource}s', resource.replace('_', '') + 's', resource):
+        items = response.get(key)
+        if isinstance(items, list) and items:
+            item = items[0]
+            entity = item.get(resource) or item.get(resource.replace('_', '')) or item
+            if isinstance(entity, dict) and entity.get('id'):
+                return entity['id']
+    return None
+
+
+def _platform_of(client: ModuleType) -> str:
+    """'generated_clients.snapchat_api_v2' -> 'snapchat'"""
+    name = getattr(client, '__name__', 'unknown').rsplit('.', 1)[-1]
+    return name.split('_api')[0]
+
+
+def squad_type_of(client: ModuleType) -> str:
+    """Second hierarchy level: HIERARCHY[1], else the create_<type> function that is not a fixed step"""
+    hierarchy = getattr(client, 'HIERARCHY', None)
+    if hierarchy:
+        return hierarchy[1]
+    for name in dir(client):
+        if name.startswith('create_') and name[len('create_'):] not in _FIXED_TYPES and callable(getattr(client, name)):
+            return name[len('create_'):]
+    return 'ad_squad'
+
+
+@tracing.traced('launch_campaign')
+def launch_campaign(
+        client: ModuleType,
+        account_id: str,
+        campaign_data: Dict[str, Any],
+        ad_squads_data: List[Dict[str, Any]],
+        ads_data: List[Dict[str, Any]],
+        progress_callback: Optional[ProgressCallback] = None,
+        checkpoint: Optional[LaunchCheckpoint] = None,
+        platform: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Run the complete launch workflow against a generated client module
+
+    Args:
+        client: Generated client module (create_campaign, create_<squad>, ...)
+        account_id: Ad account ID
+        campaign_data: Campaign fields
+        ad_squads_data: Second level entity fields
+        ads_data: Ad fields (image_url, media_type, headline, ...)
+        progress_callback: Called with one event dict per completed step
+        checkpoint: Journal of entities created by earlier attempts of this launch
+        platform: Platform name for metrics (default: derived from the module name)
+
+    Returns:
+        Launch result with the same shape as the generated launch_campaign
+    """
+    try:
+        return _launch_campaign(client, account_id, campaign_data, ad_squads_data, ads_data,
+                                progress_callback, checkpoint, platform)
+    except Exception as e:
+        # 步骤之外的异常 (客户端缺少函数、回调或日志写入失败) 也要结束这次执行，
+        # 否则日志一直是running，lock_timeout 内无法恢复
+        if checkpoint is not None and not checkpoint.finished:
+            try:
+                checkpoint.finish({
+                    'status': 'failed',
+                    'launch_id': checkpoint.launch_id,
+                    'errors': [f'{type(e).__name__}: {e}']
+                })
+            except Exception as finish_error:
+                print(f"⚠ Launch {checkpoint.launch_id} could not be marked failed: {finish_error}")
+        raise
+
+
+def _launch_campaign(
+        client: ModuleType,
+        account_id: str,
+        campaign_data: Dict[str, Any],
+        ad_squads_data: List[Dict[str, Any]],
+        ads_data: List[Dict[str, Any]],
+        progress_callback: Optional[ProgressCallback],
+        checkpoint: Optional[LaunchCheckpoint],
+        platform: Optional[str]
+) -> Dict[str, Any]:
+    platform = platform or _platform_of(client)
+    squad_type = squad_type_of(client)
+    create_squad = getattr(client, f'create_{squad_type}')
+
+    result = {
+        'status': 'success',
+        'campaign_id': None,
+        f'{squad_type}_ids': [],
+        'media_ids': [],
+        'creative_ids': [],
+        'ad_ids': [],
+        'errors': []
+    }
+
+    if checkpoint is not None:
+        result['launch_id'] = checkpoint.launch_id
+
+    def emit(event: str, **data):
+        if progress_callback is not None:
+            progress_callback({'event': event, **data})
+
+    def emit_created(event: str, resumed: bool, **data):
+        if resumed:
+            data['resumed'] = True
+        emit(event, **data)
+
+    def fail(step: str, error: Exception, **data):
+        message = f"{step} failed: {error}"
+        result['errors'].append(message)
+        emit('step_failed', step=step, error=message, **data)
+
+    def run_step(key: str, create: Callable[[], Any], resource: str):
+        """Return (entity ID, resumed), reusing the ID recorded in the checkpoint"""
+        if checkpoint is not None:
+            entity_id = checkpoint.get(key)
+            if entity_id:
+                return entity_id, True
+        entity = 'upload' if key.startswith('upload:') else resource
+        start = time.perf_counter()
+        try:
+            with tracing.span(f'launch.{entity}', platform=platform, step=key):
+                entity_id = extract_id(create(), resource)
+                if not entity_id:
+                    raise Exception(f'No {resource} ID in response')
+        except Exception:
+            LAUNCH_STEP_FAILURES.labels(platform, entity).inc()
+            raise
+        finally:
+            LAUNCH_STEP_DURATION.labels(platform, entity).observe(time.perf_counter() - start)
+        if checkpoint is not None:
+            checkpoint.record(key, entity_id)
+        return entity_id, False
+
+    def complete():
+        if checkpoint is not None:
+            checkpoint.finish(result)
+        emit('completed', result=result)
+        return result
+
+    # 步骤1: 创建Campaign
+    try:
+        campaign_id, resumed = run_step(
+            'campaign', lambda: client.create_campaign(account_id, **campaign_data), 'campaign'
+        )
+        result['campaign_id'] = campaign_id
+        emit_created('campaign_created', resumed, campaign_id=campaign_id)
+    except Exception as e:
+        fail('create_campaign', e)
+        result['status'] = 'failed'
+        return complete()
+
+    # 步骤2: 创建Ad Squad(s)
+    for index, squad_data in enumerate(ad_squads_data):
+        try:
+            squad_id, resumed = run_step(
+                f'{squad_type}:{index}',
+                lambda: create_squad(campaign_id, account_id, **squad_data),
+                squad_type
+            )
+            result[f'{squad_type}_ids'].append(squad_id)
+            emit_created(f'{squad_type}_created', resumed, index=index, **{f'{squad_type}_id': squad_id})
+        except Exception as e:
+            fail(f'create_{squad_type}', e, index=index)
+
+    squad_ids = result[f'{squad_type}_ids']
+    if not squad_ids:
+        result['status'] = 'partial'
+        return complete()
+
+    # 步骤3-6: 每个ad
+    for index, ad_data in enumerate(ads_data):
+        step = 'create_media'
+        try:
+            media_id, resumed = run_step(
+                f'media:{index}',
+                lambda: client.create_media(account_id, name=ad_data.get('name', f'Media {index + 1}'),
+                                            type=str(ad_data.get('media_type', 'IMAGE')).upper()),
+                'media'
+            )
+            result['media_ids'].append(media_id)
+            emit_created('media_created', resumed, index=index, media_id=media_id)
+
+            if ad_data.get('image_url'):
+                step = 'upload_media'
+
+                def upload():
+                    client.upload_media(media_id, image_url=ad_data['image_url'])
+                    return media_id
+
+                _, resumed = run_step(f'upload:{index}', upload, 'media')
+                emit_created('media_uploaded', resumed, index=index, media_id=media_id)
+
+            step = 'create_creative'
+            creative_fields, ad_fields = split_ad_fields(ad_data, squad_type)
+            creative_id, resumed = run_step(
+                f'creative:{index}',
+                lambda: client.create_creative(account_id, media_id=media_id, **creative_fields),
+                'creative'
+            )
+            result['creative_ids'].append(creative_id)
+            emit_created('creative_created', resumed, index=index, creative_id=creative_id)
+
+            step = 'create_ad'
+            squad_id = squad_ids[ad_data.get(f'{squad_type}_index', 0) % len(squad_ids)]
+            ad_id, resumed = run_step(
+                f'ad:{index}',
+                lambda: client.create_ad(squad_id, account_id, creative_id=creative_id, **ad_fields),
+                'ad'
+            )
+            result['ad_ids'].append(ad_id)
+            emit_created('ad_created', resumed, index=index, ad_id=ad_id)
+        except Exception as e:
+            fail(step, e, index=index)
+
+    if result['errors']:
+        result['status'] = 'partial'
+    return complete()
+
+
+def iter_launch_events(
+        launcher: Callable[..., Dict[str, Any]],
+        payload: Dict[str, Any]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run a launcher in a background thread and yield its progress events
+
+    The launcher is called as launcher(payload, progress_callback=...).
+    Events are yielded as soon as they are reported; an exception raised
+    by the launcher is yielded as an 'error' event.
+    """
+    events: queue.Queue = queue.Queue()
+
+    def run():
+        try:
+            launcher(payload, progress_callback=events.put)
+        except Exception as e:
+            events.put({'event': 'error', 'error': str(e), 'type': type(e).__name__})
+        finally:
+            events.put(_DONE)
+
+    threading.Thread(target=tracing.wrap(run), name='launch-stream', daemon=True).start()
+
+    while True:
+        event = events.get()
+        if event is _DONE:
+            return
+        yield event
@@ -0,0 +1,335 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Rate Limiter - 出站广告API调用的限流与并发控制
+广告平台按token/广告账户限制请求速率，并发投放时很容易触发429。
+每个 (platform, account_id) 使用一个令牌桶，所有线程共享:
+1. 发送请求前 acquire() 取一个令牌，没有令牌时阻塞等待
+2. 收到响应后 observe() 读取 Retry-After 和平台的限流头，
+   429 或剩余配额为0时整个桶暂停到重置时间，同一账户的其他线程也一起等待
+3. 每个平台最多 max_in_flight 个请求同时进行
+
+多进程部署 (gunicorn多个worker) 时设置 RATE_LIMIT_DB_PATH，
+令牌桶保存在本地SQLite中，同一台机器上的所有进程共享配额。
+
+配置 (环境变量):
+    PLATFORM_RATE_LIMITS="snapchat=10:20,pinterest=5"   # 每秒请求数[:突发容量]
+    DEFAULT_RATE_LIMIT=10
+    PLATFORM_MAX_IN_FLIGHT="snapchat=8"
+    DEFAULT_MAX_IN_FLIGHT=16
+    RATE_LIMIT_DB_PATH=data/rate_limits.db             # 可选，启用多进程共享
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+# (每秒令牌数, 桶容量)
+Limit = Tuple[float, float]
+
+# 没有 Retry-After 的429暂停秒数
+DEFAULT_BACKOFF = 1.0
+# 超过该值的重置时间按epoch时间戳处理，否则按秒数处理
+_EPOCH_THRESHOLD = 10 ** 9
+
+
+def parse_rate_limits(value: str) -> Dict[str, Limit]:
+    """Parse 'snapchat=10:20,pinterest=5' into {'snapchat': (10.0, 20.0), 'pinterest': (5.0, 5.0)}"""
+    limits = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        name, spec = item.split('=', 1)
+        rate, _, burst = spec.partition(':')
+        limits[name.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+def _parse_reset(value: Optional[str], now: float) -> Optional[float]:
+    """Convert a Retry-After / rate-limit reset header to seconds from now"""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        # Retry-After 也可以是HTTP日期
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError):
+            return None
+    if number > _EPOCH_THRESHOLD:
+        return max(0.0, number - now)
+    return max(0.0, number)
+
+
+def retry_delay(status_code: int, headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Seconds the platform asks us to wait before the next request
+
+    Args:
+        status_code: HTTP status of the response
+        headers: Response headers (case-insensitive mapping)
+
+    Returns:
+        Delay in seconds, or None if the response does not throttle us
+    """
+    now = time.time()
+    retry_after = _parse_reset(headers.get('Retry-After'), now)
+    if status_code == 429:
+        return retry_after if retry_after is not None else DEFAULT_BACKOFF
+    if retry_after is not None and status_code == 503:
+        return retry_after
+
+    for prefix in ('X-RateLimit-', 'RateLimit-'):
+        remaining = headers.get(f'{prefix}Remaining')
+        if remaining is not None and remaining.strip() in ('0', '0.0'):
+            reset = _parse_reset(headers.get(f'{prefix}Reset'), now)
+            return reset if reset is not None else DEFAULT_BACKOFF
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token if possible, otherwise return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a token is available
+
+        Args:
+            timeout: Maximum seconds to wait (None waits forever)
+
+        Returns:
+            True if a token was taken, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class SqliteTokenBucket(TokenBucket):
+    """
+    Token bucket stored in a local SQLite database
+
+    All processes on a machine that use the same database file share the
+    bucket. BEGIN IMMEDIATE serializes the read-modify-write of each acquire.
+    """
+
+    def __init__(self, db_path: str, key: str, rate: float, burst: float):
+        super().__init__(rate, burst)
+        self.db_path = db_path
+        self.key = key
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    def _load(self, conn: sqlite3.Connection, now: float) -> Tuple[float, float]:
+        row = conn.execute(
+            'SELECT tokens, updated_at, blocked_until FROM buckets WHERE key = ?', (self.key,)
+        ).fetchone()
+        if row is None:
+            return self.burst, 0.0
+        tokens, updated_at, blocked_until = row
+        return min(self.burst, tokens + max(0.0, now - updated_at) * self.rate), blocked_until
+
+    def _store(self, conn: sqlite3.Connection, tokens: float, now: float, blocked_until: float):
+        conn.execute(
+            'INSERT OR REPLACE INTO buckets (key, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)',
+            (self.key, tokens, now, blocked_until)
+        )
+
+    def _reserve(self) -> float:
+        conn = self._connect()
+        try:
+            # 多进程共享，使用墙上时间
+            now = time.time()
+            tokens, blocked_until = self._load(conn, now)
+            if now < blocked_until:
+                wait = blocked_until - now
+            elif tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._store(conn, tokens, now, blocked_until)
+            conn.execute('COMMIT')
+            return wait
+        finally:
+            conn.close()
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds"""
+        conn = self._connect()
+        try:
+            now = time.time()
+            _, blocked_until = self._load(conn, now)
+            self._store(conn, 0.0, now, max(blocked_until, now + seconds))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by (platform, account_id) plus a per-platform
+    limit on in-flight requests
+    """
+
+    def __init__(
+            self,
+            limits: Optional[Dict[str, Limit]] = None,
+            default_limit: Limit = (10.0, 10.0),
+            max_in_flight: Optional[Dict[str, int]] = None,
+            default_max_in_flight: int = 16,
+            db_path: Optional[str] = None
+    ):
+        """
+        Args:
+            limits: Per-platform (requests per second, burst)
+            default_limit: Limit for platforms not listed in limits
+            max_in_flight: Per-platform maximum concurrent requests
+            default_max_in_flight: Concurrency for platforms not listed
+            db_path: Share buckets between processes through this SQLite file
+        """
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.max_in_flight = max_in_flight or {}
+        self.default_max_in_flight = default_max_in_flight
+        self.db_path = db_path
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+        if db_path:
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            with closing(sqlite3.connect(db_path, timeout=30)) as conn, conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS buckets (
+                        key TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        updated_at REAL NOT NULL,
+                        blocked_until REAL NOT NULL
+                    )
+                ''')
+
+    def bucket(self, platform: str, account_id: Optional[str] = None):
+        """Return the bucket of a (platform, account_id) pair, creating it on first use"""
+        key = (platform, account_id or '')
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate, burst = self.limits.get(platform, self.default_limit)
+                    if self.db_path:
+                        bucket = SqliteTokenBucket(self.db_path, f'{platform}:{key[1]}', rate, burst)
+                    else:
+                        bucket = TokenBucket(rate, burst)
+                    self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, platform: str, account_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Wait for a token of (platform, account_id)"""
+        return self.bucket(platform, account_id).acquire(timeout)
+
+    def observe(self, platform: str, account_id: Optional[str], status_code: int,
+                headers: Mapping[str, str]) -> Optional[float]:
+        """
+        Apply the rate-limit information of a platform response
+
+        Returns:
+            Seconds the bucket was paused for, or None
+        """
+        delay = retry_delay(status_code, headers)
+        if delay is not None:
+            self.bucket(platform, account_id).pause(delay)
+        return delay
+
+    @contextmanager
+    def slot(self, platform: str) -> Iterator[None]:
+        """Hold one of the platform's in-flight request slots (per process)"""
+        semaphore = self._slots.get(platform)
+        if semaphore is None:
+            with self._lock:
+                semaphore = self._slots.get(platform)
+                if semaphore is None:
+                    limit = self.max_in_flight.get(platform, self.default_max_in_flight)
+                    semaphore = self._slots[platform] = threading.BoundedSemaphore(limit)
+        with semaphore:
+            yield
+
+
+def parse_counts(value: str) -> Dict[str, int]:
+    """Parse 'snapchat=8,pinterest=4' into {'snapchat': 8, 'pinterest': 4}"""
+    counts = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, count = item.split('=', 1)
+            counts[name.strip()] = int(count)
+    return counts
+
+
+def from_env() -> RateLimiter:
+    """Build a rate limiter from the environment variables listed above"""
+    default_rate = float(os.getenv('DEFAULT_RATE_LIMIT', 10))
+    return RateLimiter(
+        limits=parse_rate_limits(os.getenv('PLATFORM_RATE_LIMITS', '')),
+        default_limit=(default_rate, default_rate),
+        max_in_flight=parse_counts(os.getenv('PLATFORM_MAX_IN_FLIGHT', '')),
+        default_max_in_flight=int(os.getenv('DEFAULT_MAX_IN_FLIGHT', 16)),
+        db_path=os.getenv('RATE_LIMIT_DB_PATH') or None
+    )
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    """Process-wide rate limiter shared by all generated clients"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = from_env()
+    return _limiter
@@ -0,0 +1,145 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Route Trie - 路径模板前缀树
+按路径段建树，{param} 段匹配任意值。匹配一个URL只需要沿路径走一遍 (与路径长度成正比)，
+和注册了多少模板无关；字面量段优先于参数段，走不通时回退。
+
+    trie = RouteTrie()
+    trie.add('POST', '/v1/adaccounts/{ad_account_id}/campaigns')
+    trie.match('POST', 'https://adsapi.snapchat.com/v1/adaccounts/8f2c/campaigns')
+    -> ('/v1/adaccounts/{ad_account_id}/campaigns', None)
+
+运行时按平台注册文档中的端点模板 (register)，
+breaker.endpoint_key 用它给熔断器、span和指标命名，未注册时按ID形状猜测。
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+def split_path(path: str) -> List[str]:
+    """'/v1/campaigns/{id}?x=1' or a full URL -> ['v1', 'campaigns', '{id}']"""
+    if '://' in path:
+        path = urlsplit(path).path
+    else:
+        path = path.split('?', 1)[0].split('#', 1)[0]
+    return [segment for segment in path.split('/') if segment]
+
+
+def is_param(segment: str) -> bool:
+    return segment.startswith('{') and segment.endswith('}')
+
+
+def extract_params(template: str, path: str) -> Dict[str, str]:
+    """Values of the {param} segments of a template in a matching path"""
+    return {
+        name[1:-1]: value
+        for name, value in zip(split_path(template), split_path(path))
+        if is_param(name)
+    }
+
+
+class _Node:
+    __slots__ = ('children', 'param', 'routes')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.param: Optional['_Node'] = None
+        # method -> (template, value)
+        self.routes: Dict[str, Tuple[str, Any]] = {}
+
+
+class RouteTrie:
+    """Path templates indexed by segment"""
+
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, method: str, template: str, value: Any = None) -> bool:
+        """
+        Register a template; the first registration of a method and shape wins
+
+        Returns:
+            False if the same method and shape was already registered
+        """
+        node = self._root
+        for segment in split_path(template):
+            if is_param(segment):
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            else:
+                node = node.children.setdefault(segment, _Node())
+        method = method.upper()
+        if method in node.routes:
+            return False
+        node.routes[method] = (template, value)
+        self._size += 1
+        return True
+
+    def match(self, method: str, path: str) -> Optional[Tuple[str, Any]]:
+        """
+        Find the template matching a concrete path (or URL)
+
+        Templates match themselves, so a template can also be looked up.
+
+        Returns:
+            (template, value) or None
+        """
+        segments = split_path(path)
+        method = method.upper()
+        # 深度优先；字面量子节点后入栈，所以先尝试
+        stack = [(self._root, 0)]
+        while stack:
+            node, index = stack.pop()
+            if index == len(segments):
+                route = node.routes.get(method)
+                if route is not None:
+                    return route
+                continue
+            if node.param is not None:
+                stack.append((node.param, index + 1))
+            child = node.children.get(segments[index])
+            if child is not None:
+                stack.append((child, index + 1))
+        return None
+
+
+# platform -> 该平台文档中的端点模板
+_platform_routes: Dict[str, RouteTrie] = {}
+_platform_routes_lock = threading.Lock()
+
+
+def register(platform: str, routes: Iterable[str]):
+    """
+    Register the endpoint templates of a platform, replacing earlier ones
+
+    Args:
+        platform: Platform name passed to src.runtime.http.request()
+        routes: 'METHOD /path/{param}' strings, e.g. from the client manifest
+    """
+    trie = RouteTrie()
+    for route in routes:
+        method, _, template = route.partition(' ')
+        if template:
+            trie.add(method, template)
+    with _platform_routes_lock:
+        if len(trie):
+            _platform_routes[platform] = trie
+        else:
+            _platform_routes.pop(platform, None)
+
+
+def match_route(platform: Optional[str], method: str, url: str) -> Optional[str]:
+    """'METHOD template' of a request to a registered platform, or None"""
+    trie = _platform_routes.get(platform) if platform else None
+    if trie is None:
+        return None
+    route = trie.match(method, url)
+    return f'{method.upper()} {route[0]}' if route is not None else None
@@ -0,0 +1,321 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Tracing - 结构化调用链
+与OpenTelemetry兼容的span (trace_id/span_id/parent，字段名与OTLP JSON一致)，
+覆盖文档解析的每个提取器、LLM的每个生成阶段、投放的每一步和每个出站API调用，
+用于查看哪一步/哪个提取器占用了最多时间。
+
+导出:
+- TRACE_FILE=data/traces.jsonl      每个结束的span写一行JSON
+- InMemoryExporter                   测试中收集span
+- python -m src.runtime.tracing data/traces.jsonl   打印瀑布图
+
+没有配置导出器时 span() / @traced 直接调用被包装的代码，几乎没有开销。
+
+当前span保存在contextvars中: Flask请求的span是根span，
+提交到线程池/后台线程的任务需要用 wrap() 包装才能继承调用链。
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Span kinds (OTLP)
+INTERNAL = 'SPAN_KIND_INTERNAL'
+SERVER = 'SPAN_KIND_SERVER'
+CLIENT = 'SPAN_KIND_CLIENT'
+
+_current: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+def _attribute(key: str, value: Any) -> Dict:
+    """OTLP JSON attribute"""
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class Span:
+    """One timed operation"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'attributes',
+                 'start_ns', 'end_ns', 'cpu_ns', 'error')
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = '', kind: str = INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        # 开始时记录线程CPU时间，结束时替换为span期间消耗的CPU时间
+        self.cpu_ns = time.thread_time_ns()
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.error = message
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def cpu_ms(self) -> float:
+        """CPU time of the span's thread; duration_ms - cpu_ms is time spent waiting"""
+        return self.cpu_ns / 1e6
+
+    def to_dict(self) -> Dict:
+        """OTLP JSON representation"""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': 'STATUS_CODE_ERROR', 'message': self.error} if self.error
+            else {'code': 'STATUS_CODE_UNSET'},
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled, so callers never check for None"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class InMemoryExporter:
+    """Collects finished spans in a list (tests)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name: str) -> List[Span]:
+        return [span for span in self.spans if span.name == name]
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonFileExporter:
+    """Appends each finished span to a JSON lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+_exporter = None
+_exporter_loaded = False
+
+
+def configure(exporter) -> None:
+    """Set the span exporter (None disables tracing)"""
+    global _exporter, _exporter_loaded
+    _exporter = exporter
+    _exporter_loaded = True
+
+
+def get_exporter():
+    """Exporter in use; created from TRACE_FILE on first call"""
+    global _exporter, _exporter_loaded
+    if not _exporter_loaded:
+        path = os.getenv('TRACE_FILE')
+        _exporter = JsonFileExporter(path) if path else None
+        _exporter_loaded = True
+    return _exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, kind: str = INTERNAL, parent: Optional[Tuple[str, str]] = None,
+               **attributes) -> Tuple[Optional[Span], Optional[contextvars.Token]]:
+    """
+    Start a span and make it current; pair with end_span()
+
+    Args:
+        name: Span name
+        kind: INTERNAL, SERVER or CLIENT
+        parent: Remote (trace_id, span_id), e.g. from a traceparent header;
+                defaults to the current span
+        **attributes: Span attributes
+
+    Returns:
+        (span, context token), or (None, None) when tracing is disabled
+    """
+    if get_exporter() is None:
+        return None, None
+    if parent is None:
+        current = _current.get()
+        parent = (current.trace_id, current.span_id) if current is not None else None
+    trace_id, parent_id = parent if parent else (f'{random.getrandbits(128):032x}', '')
+    span = Span(name, trace_id, parent_id, kind, attributes)
+    return span, _current.set(span)
+
+
+def end_span(span: Optional[Span], token: Optional[contextvars.Token]):
+    """Finish a span started by start_span() and export it"""
+    if span is None:
+        return
+    span.end_ns = time.time_ns()
+    span.cpu_ns = time.thread_time_ns() - span.cpu_ns
+    span.attributes['thread.cpu_time_ms'] = round(span.cpu_ms, 3)
+    try:
+        _current.reset(token)
+    except ValueError:
+        # 在另一个context中结束 (例如流式响应)，当前span不属于这里
+        pass
+    exporter = get_exporter()
+    if exporter is not None:
+        exporter.export(span)
+
+
+@contextmanager
+def span(name: str, kind: str = INTERNAL, **attributes) -> Iterator[Any]:
+    """Trace a block; exceptions mark the span as failed and propagate"""
+    current, token = start_span(name, kind, **attributes)
+    if current is None:
+        yield NOOP_SPAN
+        return
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(f'{type(e).__name__}: {e}')
+        raise
+    finally:
+        end_span(current, token)
+
+
+def traced(name: str) -> Callable:
+    """Decorator form of span()"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if get_exporter() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(fn: Callable) -> Callable:
+    """Bind fn to the current trace context so it can run in another thread"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return wrapper
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """W3C traceparent '00-<trace_id>-<span_id>-<flags>' -> (trace_id, span_id)"""
+    if not header:
+        return None
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def traceparent(span_obj: Optional[Span]) -> Optional[str]:
+    """W3C traceparent header value of a span"""
+    if span_obj is None:
+        return None
+    return f'00-{span_obj.trace_id}-{span_obj.span_id}-01'
+
+
+# ============================================================================
+# 瀑布图
+# ============================================================================
+
+def load_spans(path: str) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_waterfall(spans: List[Dict], width: int = 40) -> str:
+    """Render the spans of each trace as an indented text waterfall"""
+    traces: Dict[str, List[Dict]] = {}
+    for item in spans:
+        traces.setdefault(item['traceId'], []).append(item)
+
+    lines = []
+    for trace_id, items in traces.items():
+        start = min(int(s['startTimeUnixNano']) for s in items)
+        end = max(int(s['endTimeUnixNano']) for s in items)
+        total = max(end - start, 1)
+        children: Dict[str, List[Dict]] = {}
+        ids = {s['spanId'] for s in items}
+        for s in sorted(items, key=lambda s: int(s['startTimeUnixNano'])):
+            parent = s['parentSpanId'] if s['parentSpanId'] in ids else ''
+            children.setdefault(parent, []).append(s)
+
+        lines.append(f'trace {trace_id} ({total / 1e6:.1f} ms)')
+
+        def walk(parent_id: str, depth: int):
+            for s in children.get(parent_id, []):
+                offset = int(s['startTimeUnixNano']) - start
+                duration = int(s['endTimeUnixNano']) - int(s['startTimeUnixNano'])
+                lead = int(offset / total * width)
+                bar = '#' * max(1, int(duration / total * width))
+                failed = ' !' if s['status'].get('code') == 'STATUS_CODE_ERROR' else ''
+                label = ('  ' * depth + s['name'])[:48]
+                lines.append(f'  {label:<48} {duration / 1e6:9.1f} ms |{" " * lead}{bar:<{width - lead}}|{failed}')
+                walk(s['spanId'], depth + 1)
+
+        walk('', 0)
+        lines.append('')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: python -m src.runtime.tracing <traces.jsonl>')
+        sys.exit(1)
+    print(format_waterfall(load_spans(sys.argv[1])))
@@ -0,0 +1,291 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+API Model - 文档解析结果 (PlatformDocParser.parse_api_structure) 的数据模型
+生成守护进程会同时保留多个平台的解析结果，所以模型尽量紧凑:
+
+- 使用 __slots__ 的dataclass，实例没有 __dict__
+- 端点的 method / resource_type 字符串驻留 (sys.intern)，所有端点共享同一个对象
+- raw_text 以zlib压缩保存，读取时才解压 (生成提示时不使用它)
+- to_dict / from_dict 直接构造，不经过 dataclasses.asdict 的递归深拷贝；
+  to_json / from_json 用于缓存解析结果
+- EndpointIndex: 端点路径模板的前缀树，查找资源的创建端点、路径的父实体参数、URL对应的模板
+
+兼容以前的dict结果: 支持只读的 api_info['base_url'] 和 endpoint.get('path')。
+"""
+import json
+import sys
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.runtime.routes import RouteTrie, is_param, split_path
+
+
+def segment_resource_type(segment: str) -> str:
+    """Resource type named by one path segment: 'adsquads' -> 'ad_squad', 'v1' -> 'unknown'"""
+    segment = segment.strip('{}').lower()
+    if 'campaign' in segment:
+        return 'campaign'
+    if any(x in segment for x in ('squad', 'adgroup', 'ad_group', 'adset', 'ad_set')):
+        return 'ad_squad'
+    if 'media' in segment:
+        return 'media'
+    if 'creative' in segment:
+        return 'creative'
+    if segment in ('ads', 'ad', 'ad_id'):
+        return 'ad'
+    return 'unknown'
+
+
+class _ReadOnlyMapping:
+    """dict-style read access to the fields: obj['name'], obj.get('name')"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+
+@dataclass(slots=True)
+class Endpoint(_ReadOnlyMapping):
+    """One API endpoint found in the documentation"""
+
+    method: str
+    path: str
+    description: str = ''
+    resource_type: str = 'unknown'
+    requires_parent: bool = False
+
+    def __post_init__(self):
+        self.method = sys.intern(self.method)
+        self.resource_type = sys.intern(self.resource_type)
+
+    def to_dict(self) -> Dict:
+        return {
+            'method': self.method,
+            'path': self.path,
+            'description': self.description,
+            'resource_type': self.resource_type,
+            'requires_parent': self.requires_parent,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Endpoint':
+        return cls(
+            data['method'],
+            data['path'],
+            data.get('description', ''),
+            data.get('resource_type', 'unknown'),
+            data.get('requires_parent', False)
+        )
+
+
+@dataclass(slots=True)
+class AuthInfo(_ReadOnlyMapping):
+    """How requests to the platform are authenticated"""
+
+    type: str = 'oauth2'
+    methods: List[str] = field(default_factory=list)
+    token_location: str = 'header'
+    header_name: str = 'Authorization'
+    header_format: str = 'Bearer {token}'
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': self.type,
+            'methods': list(self.methods),
+            'token_location': self.token_location,
+            'header_name': self.header_name,
+            'header_format': self.header_format,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'AuthInfo':
+        auth = cls(methods=list(data.get('methods', [])))
+        for name in ('type', 'token_location', 'header_name', 'header_format'):
+            if name in data:
+                setattr(auth, name, data[name])
+        return auth
+
+
+@dataclass(slots=True)
+class Workflow(_ReadOnlyMapping):
+    """Order in which the entities are created and their parents"""
+
+    steps: List[str] = field(default_factory=list)
+    dependencies: Dict[str, List[str]] = field(default_factory=dict)
+    notes: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'steps': list(self.steps),
+            'dependencies': {k: list(v) for k, v in self.dependencies.items()},
+            'notes': list(self.notes),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Workflow':
+        return cls(
+            list(data.get('steps', [])),
+            {k: list(v) for k, v in data.get('dependencies', {}).items()},
+            list(data.get('notes', []))
+        )
+
+
+@dataclass(slots=True)
+class ApiInfo(_ReadOnlyMapping):
+    """Everything the code generator needs to know about a platform API"""
+
+    platform: str
+    base_url: str
+    endpoints: List[Endpoint] = field(default_factory=list)
+    authentication: AuthInfo = field(default_factory=AuthInfo)
+    hierarchy: List[str] = field(default_factory=list)
+    schemas: Dict[str, Any] = field(default_factory=dict)
+    workflow: Workflow = field(default_factory=Workflow)
+    code_examples: List[str] = field(default_factory=list)
+    # 压缩后的 raw_text，通过 raw_text 属性读写
+    raw_text_zlib: bytes = b''
+    _index: Optional['EndpointIndex'] = field(default=None, init=False, repr=False, compare=False)
+
+    def endpoint_index(self) -> 'EndpointIndex':
+        """Trie index of the endpoints, built on first use"""
+        if self._index is None:
+            self._index = EndpointIndex(self.endpoints, self.base_url)
+        return self._index
+
+    @property
+    def raw_text(self) -> str:
+        """Start of the documentation text, decompressed on access"""
+        return zlib.decompress(self.raw_text_zlib).decode('utf-8') if self.raw_text_zlib else ''
+
+    @raw_text.setter
+    def raw_text(self, text: str):
+        self.raw_text_zlib = zlib.compress(text.encode('utf-8'), 1) if text else b''
+
+    def to_dict(self) -> Dict:
+        """The dict parse_api_structure used to return"""
+        return {
+            'platform': self.platform,
+            'base_url': self.base_url,
+            'endpoints': [endpoint.to_dict() for endpoint in self.endpoints],
+            'authentication': self.authentication.to_dict(),
+            'hierarchy': list(self.hierarchy),
+            'schemas': self.schemas,
+            'workflow': self.workflow.to_dict(),
+            'raw_text': self.raw_text,
+            'code_examples': list(self.code_examples),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ApiInfo':
+        info = cls(
+            platform=data['platform'],
+            base_url=data['base_url'],
+            endpoints=[Endpoint.from_dict(endpoint) for endpoint in data.get('endpoints', [])],
+            authentication=AuthInfo.from_dict(data.get('authentication', {})),
+            hierarchy=list(data.get('hierarchy', [])),
+            schemas=data.get('schemas', {}),
+            workflow=Workflow.from_dict(data.get('workflow', {})),
+            code_examples=list(data.get('code_examples', []))
+        )
+        info.raw_text = data.get('raw_text', '')
+        return info
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text: str) -> 'ApiInfo':
+        return cls.from_dict(json.loads(text))
+
+
+class EndpointIndex:
+    """Path-template trie over the endpoints of a platform"""
+
+    def __init__(self, endpoints: List[Endpoint], base_url: str = ''):
+        """
+        Args:
+            endpoints: Endpoints in priority order (earlier ones win on conflicts)
+            base_url: API base URL; its path (e.g. /v1) is prefixed to templates
+                      documented without it, so templates match request URLs
+        """
+        self.base_path = urlsplit(base_url).path.rstrip('/') if base_url else ''
+        self.endpoints = endpoints
+        self._trie = RouteTrie()
+        for endpoint in endpoints:
+            self._trie.add(endpoint.method, self.full_path(endpoint.path), endpoint)
+
+    def full_path(self, path: str) -> str:
+        """Template with the base path: '/adaccounts/{id}/campaigns' -> '/v1/adaccounts/{id}/campaigns'"""
+        if not self.base_path or path == self.base_path or path.startswith(self.base_path + '/'):
+            return path
+        return self.base_path + path
+
+    def relative_path(self, path: str) -> str:
+        """Template without the base path, to append to BASE_URL"""
+        path = self.full_path(path)
+        return path[len(self.base_path):] if self.base_path else path
+
+    def match(self, method: str, url: str) -> Optional[Endpoint]:
+        """Endpoint whose template matches a concrete URL or path"""
+        route = self._trie.match(method, url)
+        return route[1] if route is not None else None
+
+    def create_endpoint(self, resource_type: str) -> Optional[Endpoint]:
+        """The POST endpoint creating a resource: its path ends with the collection, not an ID"""
+        for endpoint in self.endpoints:
+            if endpoint.method != 'POST' or endpoint.resource_type != resource_type:
+                continue
+            segments = split_path(endpoint.path)
+            if segments and not is_param(segments[-1]) and segment_resource_type(segments[-1]) == resource_type:
+                return endpoint
+        return None
+
+    def parent_params(self, path: str, method: str = 'POST') -> List[Tuple[str, str]]:
+        """
+        Path parameters that identify parent entities, with their resource types
+
+        '/v1/campaigns/{campaign_id}/adsquads' -> [('campaign_id', 'campaign')]
+
+        Args:
+            path: A template or a concrete URL of a registered endpoint
+            method: HTTP method used to find the template of a concrete URL
+        """
+        endpoint = self.match(method, path)
+        segments = split_path(endpoint.path if endpoint is not None else path)
+        # 最后一个字面量段之后的参数是实体自己的ID
+        last_literal = max((i for i, s in enumerate(segments) if not is_param(s)), default=-1)
+        parents = []
+        for index in range(last_literal):
+            if not is_param(segments[index]):
+                continue
+            name = segments[index][1:-1]
+            parent = segment_resource_type(segments[index - 1]) if index > 0 else 'unknown'
+            if parent == 'unknown':
+                parent = segment_resource_type(name.rsplit('_id', 1)[0])
+            parents.append((name, parent))
+        return parents
+
+    def routes(self) -> List[str]:
+        """'METHOD /full/template' of every endpoint, for src.runtime.routes.register()"""
+        seen = set()
+        result = []
+        for endpoint in self.endpoints:
+            route = f'{endpoint.method} {self.full_path(endpoint.path)}'
+            if route not in seen:
+                seen.add(route)
+                result.append(route)
+        return result
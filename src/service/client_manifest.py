@@ -0,0 +1,102 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Client Manifest - 生成客户端索引
+CodeAgent 每保存一个客户端就更新 generated_clients/manifest.json，
+Flask 服务器读取它提供 /api/platforms，而不是每次请求都扫描目录。
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+MANIFEST_FILENAME = 'manifest.json'
+# 守护进程的多个worker可能同时保存客户端，读-改-写必须串行
+_manifest_lock = threading.Lock()
+
+
+def list_functions(code: str) -> List[str]:
+    """Names of the top-level functions defined in a module"""
+    try:
+        tree = ast.parse(code)
+        return [node.name for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    except SyntaxError:
+        return re.findall(r'^def\s+(\w+)\s*\(', code, re.MULTILINE)
+
+
+def build_entry(platform: str, filepath: str, code: str, docs_url: str, mock_auth: bool,
+                routes: Optional[List[str]] = None) -> Dict:
+    """
+    Build the manifest entry of a generated client
+
+    Args:
+        platform: Platform name
+        filepath: Path of the saved client file
+        code: Full content of the saved file
+        docs_url: Documentation URL the client was generated from
+        mock_auth: Whether the client is a MOCK client
+        routes: Documented endpoint templates ('POST /v1/campaigns/{id}/adsquads');
+                the server registers them to label outbound requests
+
+    Returns:
+        Manifest entry
+    """
+    entry = {
+        'platform': platform,
+        'file': os.path.basename(filepath),
+        'mode': 'MOCK' if mock_auth else 'PRODUCTION',
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'content_hash': 'sha256:' + hashlib.sha256(code.encode('utf-8')).hexdigest(),
+        'functions': list_functions(code),
+        'docs_url': docs_url,
+    }
+    if routes:
+        entry['routes'] = routes
+    return entry
+
+
+def load_manifest(output_dir: str) -> Dict:
+    """Load the manifest of a clients directory (empty if missing or invalid)"""
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get('platforms'), dict):
+            return manifest
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {'version': 1, 'platforms': {}}
+
+
+def update_manifest(output_dir: str, entry: Dict) -> str:
+    """
+    Add or replace a platform entry, writing the manifest atomically
+
+    Returns:
+        Path to the manifest file
+    """
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    with _manifest_lock:
+        manifest = load_manifest(output_dir)
+        manifest['platforms'][entry['platform']] = entry
+        manifest['updated_at'] = entry['generated_at']
+
+        # 临时文件名唯一，并发写入不会互相覆盖半成品
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{MANIFEST_FILENAME}.', suffix='.tmp', dir=output_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+            # mkstemp 创建的是 0600，保持普通文件的权限
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return path
@@ -8,9 +8,14 @@ Stage 2: 生成launch_campaign orchestrator
 Stage 3: 整合并检查语法
 """
 import os
+import tempfile
 from typing import Optional, Dict
+from .api_model import ApiInfo
 from .platform_doc_parser import PlatformDocParser
 from .llm_remote import LLMRemote
+from .client_manifest import build_entry, update_manifest
+from .function_library import FUNCTION_LIBRARY_PATH, FunctionLibrary, function_specs
+from src.runtime import tracing
 
 
 class CodeAgent:
@@ -18,10 +23,19 @@ class CodeAgent:
     AI Agent that generates platform-specific API clients in 3 stages
     """
 
-    def __init__(self):
-        """Initialize the code agent with necessary services"""
-        self.doc_parser = PlatformDocParser()
+    def __init__(self, doc_cache_ttl: float = 0, function_library_path: Optional[str] = None):
+        """
+        Initialize the code agent with necessary services
+
+        Args:
+            doc_cache_ttl: Seconds fetched documentation is reused between runs
+            function_library_path: Library of validated Stage 1 functions reused
+                                   across platforms (default: FUNCTION_LIBRARY_PATH; unset = off)
+        """
+        self.doc_parser = PlatformDocParser(cache_ttl=doc_cache_ttl)
         self.llm = LLMRemote()
+        function_library_path = function_library_path or FUNCTION_LIBRARY_PATH
+        self.library = FunctionLibrary(function_library_path) if function_library_path else None
 
     def generate_api_client(
             self,
@@ -58,11 +72,17 @@ class CodeAgent:
         # Stage 1: Generate basic API functions
         print(f"\nStage 1: 生成基础API函数")
         print(f"{'=' * 70}")
+        specs = function_specs(api_info, platform, mock_auth)
+        plan = None
+        if self.library is not None:
+            plan = self.library.plan(specs, platform, api_info)
+            print(f"  ✓ 函数库: {len(plan.adapted)} 个函数本地改写, {len(plan.references)} 个参考实现")
         stage1_code = self.llm.generate_stage1_code(
             platform=platform,
             api_info=api_info,
             mock_auth=mock_auth,
-            step1_prompt=step1_prompt
+            step1_prompt=step1_prompt,
+            library=plan
         )
         print(f"✓ Stage 1 完成 ({len(stage1_code)} 字符)")
 
@@ -93,10 +113,19 @@ class CodeAgent:
         print(f"\n{'=' * 70}")
         print(f"保存生成的代码")
         print(f"{'=' * 70}")
-        output_file = self._save_code(final_code, platform, output_dir)
+        with tracing.span('save'):
+            output_file = self._save_code(final_code, platform, output_dir)
 
-        # Add __init__.py if needed
-        self._ensure_init_file(output_dir)
+            # Add __init__.py if needed
+            self._ensure_init_file(output_dir)
+
+            # Record the client in the manifest served by /api/platforms
+            self._update_manifest(output_file, platform, docs_url, mock_auth, api_info)
+
+            # 保存的模块可以编译时，它的Stage 1函数进入函数库
+            if self.library is not None:
+                stored = self.library.add_client(platform, final_code, specs, api_info)
+                print(f"✓ 函数库: 保存了 {stored} 个函数")
 
         print(f"\n✓ 代码已保存到: {output_file}")
         print(f"✓ 包含函数数量: {final_code.count('def ')}")
@@ -170,18 +199,38 @@ This client includes:
 3. Proper error handling and logging
 
 To use in Flask:
-1. Import this module in src/flask_api/api.py
-2. Register routes manually
+The server discovers this module automatically and serves
+POST /api/{platform}/launch-campaign
 """
 
 '''
 
-        # Write to file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(header + code)
+        # Write to a temp file and rename, so a running Flask server
+        # never hot-reloads a half-written client; 临时文件名唯一，并发生成同一个平台不会互相覆盖
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{os.path.basename(filepath)}.', suffix='.tmp', dir=output_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(header + code)
+            # mkstemp 创建的是 0600，保持普通文件的权限
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
         return filepath
 
+    def _update_manifest(self, filepath: str, platform: str, docs_url: str, mock_auth: bool, api_info: ApiInfo):
+        """Add the saved client and its documented routes to manifest.json in its directory"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            code = f.read()
+
+        routes = api_info.endpoint_index().routes()
+        entry = build_entry(platform, filepath, code, docs_url, mock_auth, routes=routes)
+        manifest_path = update_manifest(os.path.dirname(filepath), entry)
+        print(f"✓ 已更新客户端索引: {manifest_path}")
+
     def _ensure_init_file(self, output_dir: str):
         """Create __init__.py in output directory if it doesn't exist"""
         init_file = os.path.join(output_dir, '__init__.py')
@@ -194,18 +243,12 @@ To use in Flask:
         print(f"\n{'=' * 70}")
         print(f"Flask 集成提示")
         print(f"{'=' * 70}")
-        print(f"\n在 src/flask_api/api.py 中添加以下代码：\n")
-        print(f"# 导入生成的客户端")
-        print(f"from src.generated_clients.{platform}_api import launch_campaign as {platform}_launch\n")
-        print(f"# 注册路由")
-        print(f"@app.route('/api/{platform}/launch-campaign', methods=['POST'])")
-        print(f"def {platform}_launch_campaign():")
-        print(f"    data = request.get_json()")
-        print(f"    result = {platform}_launch(")
-        print(f"        account_id=data['account_id'],")
-        print(f"        campaign_data=data['campaign'],")
-        print(f"        ad_squads_data=data['ad_squads'],")
-        print(f"        ads_data=data['ads']")
-        print(f"    )")
-        print(f"    return jsonify(result)")
+        print(f"\nFlask服务器启动时会自动发现该客户端并注册路由：\n")
+        print(f"POST /api/{platform}/launch-campaign")
+        print(f"{{")
+        print(f'    "account_id": "...",')
+        print(f'    "campaign": {{...}},')
+        print(f'    "ad_squads": [{{...}}],')
+        print(f'    "ads": [{{...}}]')
+        print(f"}}")
         print()
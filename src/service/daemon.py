@@ -0,0 +1,348 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Generation Daemon - 常驻的代码生成服务
+每次运行 python -m src.main 都要重新导入langchain、创建 ChatOpenAI 和 requests.Session；
+守护进程只初始化一次 CodeAgent (每个worker一个；LLM客户端、文档解析器和文档缓存保持warm)，
+通过本地HTTP接口接收生成任务，任务在队列中按顺序执行。
+
+启动:
+    python -m src.service.daemon --port 5100
+
+CLI作为瘦客户端提交任务并实时打印日志:
+    python -m src.main --platform snapchat --docs <url> --daemon http://127.0.0.1:5100
+    (或设置 GENERATOR_DAEMON_URL)
+
+接口:
+    POST /jobs              {"platform", "docs_url", "mock_auth", "output_dir"} -> 202 {"job_id"}
+                            output_dir 必须在 --output-root (GENERATOR_OUTPUT_ROOT) 之内
+    GET  /jobs/<id>?since=N 任务状态、结果和第N行之后的日志
+    GET  /health
+    GET  /metrics           Prometheus指标 (LLM耗时/token数、文档和解析缓存、函数库)
+"""
+import argparse
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from src.runtime.metrics import REGISTRY
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5100
+# 文档在守护进程中缓存的秒数
+DEFAULT_DOC_CACHE_TTL = float(os.getenv('GENERATOR_DOC_CACHE_TTL', 3600))
+# 已完成任务保留（可查询）的秒数
+DEFAULT_JOB_TTL = float(os.getenv('GENERATOR_JOB_TTL', 3600))
+# 客户端指定的 output_dir 只能在这个目录之内 (默认 src/generated_clients)
+DEFAULT_OUTPUT_ROOT = os.getenv('GENERATOR_OUTPUT_ROOT') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'generated_clients'
+)
+
+REQUIRED_FIELDS = ['platform', 'docs_url']
+
+
+class _ThreadLog(io.TextIOBase):
+    """
+    sys.stdout replacement sending each worker thread's prints to its job log
+
+    只在有任务运行时安装：第一个任务 attach 时替换 sys.stdout，最后一个任务 detach 时还原，
+    其他线程的输出原样写到原来的 stdout。
+    """
+
+    def __init__(self):
+        self.stream = None
+        self._logs: Dict[int, List[str]] = {}
+        self._partial: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, log: List[str]):
+        with self._lock:
+            if not self._logs:
+                self.stream = sys.stdout
+                sys.stdout = self
+            self._logs[threading.get_ident()] = log
+
+    def detach(self):
+        ident = threading.get_ident()
+        with self._lock:
+            rest = self._partial.pop(ident, '')
+            log = self._logs.pop(ident, None)
+            if rest and log is not None:
+                log.append(rest)
+            if not self._logs and sys.stdout is self:
+                sys.stdout = self.stream
+
+    def write(self, text: str) -> int:
+        self.stream.write(text)
+        ident = threading.get_ident()
+        log = self._logs.get(ident)
+        if log is not None:
+            lines = (self._partial.pop(ident, '') + text).split('\n')
+            log.extend(lines[:-1])
+            if lines[-1]:
+                self._partial[ident] = lines[-1]
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class GenerationDaemon:
+    """Queue of generation jobs executed by a warm CodeAgent"""
+
+    def __init__(self, agent_factory: Callable[[], object], workers: int = 1,
+                 job_ttl: float = DEFAULT_JOB_TTL, output_root: str = DEFAULT_OUTPUT_ROOT):
+        """
+        Args:
+            agent_factory: Creates a CodeAgent (called once per worker, at startup)
+            workers: Jobs generated concurrently
+            job_ttl: Seconds a finished job stays queryable
+            output_root: Directory that contains every job's output_dir
+        """
+        # 每个worker一个agent：CodeAgent 的 LLM客户端和解析器不保证线程安全
+        self.agents = [agent_factory() for _ in range(workers)]
+        self.job_ttl = job_ttl
+        self.output_root = os.path.realpath(output_root)
+        self.jobs: Dict[str, Dict] = {}
+        self.queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._log = _ThreadLog()
+        for index, agent in enumerate(self.agents):
+            threading.Thread(target=self._work, args=(agent,), name=f'generator-{index}', daemon=True).start()
+
+    def close(self):
+        """Restore sys.stdout if a job is still capturing it"""
+        if sys.stdout is self._log:
+            sys.stdout = self._log.stream
+
+    def _evict(self):
+        """Drop finished jobs older than job_ttl (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job['finished_at'] is not None and job['finished_at'] <= cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def output_dir(self, requested: Optional[str]) -> str:
+        """
+        Resolve a job's output directory inside output_root
+
+        Raises:
+            ValueError: The directory is outside output_root
+        """
+        if not requested:
+            return self.output_root
+        if not isinstance(requested, str):
+            raise ValueError('output_dir must be a string')
+        path = os.path.realpath(os.path.join(self.output_root, requested))
+        if os.path.commonpath([path, self.output_root]) != self.output_root:
+            raise ValueError(f'output_dir must be inside {self.output_root}')
+        return path
+
+    def submit(self, payload: Dict) -> str:
+        """
+        Queue a generation job and return its ID
+
+        Raises:
+            ValueError: output_dir is outside output_root
+        """
+        payload = {**payload, 'output_dir': self.output_dir(payload.get('output_dir'))}
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._evict()
+            self.jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'platform': payload['platform'],
+                'payload': payload,
+                'output_file': None,
+                'error': None,
+                'log': [],
+                'created_at': time.time(),
+                'duration': None,
+                'finished_at': None,
+            }
+        self.queue.put(job_id)
+        return job_id
+
+    def get(self, job_id: str, since: int = 0) -> Optional[Dict]:
+        """Job status with the log lines after `since`"""
+        with self._lock:
+            self._evict()
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            view = {k: v for k, v in job.items() if k not in ('payload', 'log')}
+            view['log'] = job['log'][since:]
+            view['log_offset'] = since
+            return view
+
+    def _work(self, agent):
+        while True:
+            job_id = self.queue.get()
+            with self._lock:
+                job = self.jobs[job_id]
+                job['status'] = 'running'
+            payload = job['payload']
+            self._log.attach(job['log'])
+            start = time.perf_counter()
+            result = {'status': 'failed'}
+            try:
+                output_file = agent.generate_api_client(
+                    platform=payload['platform'],
+                    docs_url=payload['docs_url'],
+                    mock_auth=bool(payload.get('mock_auth', False)),
+                    output_dir=payload['output_dir']
+                )
+                result = {'status': 'succeeded', 'output_file': output_file}
+            except Exception as e:
+                print(f"❌ Error generating API client: {e}")
+                result = {'status': 'failed', 'error': str(e)}
+            finally:
+                # get() 在锁内读取任务，状态和结果一起更新
+                with self._lock:
+                    job.update(result, duration=round(time.perf_counter() - start, 3), finished_at=time.time())
+                self._log.detach()
+
+
+def make_handler(daemon: GenerationDaemon):
+    """HTTP request handler bound to a daemon"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send(self, status: int, body: Dict):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path, _, query = self.path.partition('?')
+            if path == '/health':
+                return self._send(200, {'status': 'healthy', 'queued': daemon.queue.qsize()})
+            if path == '/metrics':
+                # 生成相关的指标只在这个进程中递增，Flask的 /metrics 看不到
+                data = REGISTRY.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            if path.startswith('/jobs/'):
+                params = dict(p.split('=', 1) for p in query.split('&') if '=' in p)
+                since = params.get('since', '0')
+                if not since.isdigit():
+                    return self._send(400, {'error': 'since must be a non-negative integer'})
+                job = daemon.get(path[len('/jobs/'):], int(since))
+                if job is None:
+                    return self._send(404, {'error': 'Job not found'})
+                return self._send(200, job)
+            self._send(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            if self.path != '/jobs':
+                return self._send(404, {'error': 'Not found'})
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            except ValueError:
+                return self._send(400, {'error': 'Request body must be JSON'})
+            missing = [f for f in REQUIRED_FIELDS if not (isinstance(payload, dict) and payload.get(f))]
+            if missing:
+                return self._send(400, {'error': f'Missing required field: {missing[0]}'})
+            try:
+                job_id = daemon.submit(payload)
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            self._send(202, {'job_id': job_id})
+
+        def log_message(self, format, *args):
+            # 轮询请求很频繁，不打印访问日志
+            pass
+
+    return Handler
+
+
+# ============================================================================
+# 瘦客户端 (src/main.py --daemon)
+# ============================================================================
+
+def _call(url: str, data: Optional[Dict] = None) -> Dict:
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def run_remote(daemon_url: str, payload: Dict, poll_interval: float = 0.2) -> Dict:
+    """
+    Submit a generation job to the daemon and print its log until it finishes
+
+    Args:
+        daemon_url: e.g. http://127.0.0.1:5100
+        payload: platform, docs_url, mock_auth, output_dir
+        poll_interval: Seconds between status polls
+
+    Returns:
+        Final job status (status, output_file, error, duration)
+    """
+    base = daemon_url.rstrip('/')
+    job_id = _call(f'{base}/jobs', payload)['job_id']
+    seen = 0
+    while True:
+        job = _call(f'{base}/jobs/{job_id}?since={seen}')
+        for line in job['log']:
+            print(line)
+        seen += len(job['log'])
+        if job['status'] in ('succeeded', 'failed'):
+            return job
+        time.sleep(poll_interval)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Keep a warm code generator running for src.main --daemon')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=1, help='Jobs generated concurrently')
+    parser.add_argument('--doc-cache-ttl', type=float, default=DEFAULT_DOC_CACHE_TTL,
+                        help='Seconds fetched documentation is reused')
+    parser.add_argument('--job-ttl', type=float, default=DEFAULT_JOB_TTL,
+                        help='Seconds a finished job stays queryable')
+    parser.add_argument('--output-root', default=DEFAULT_OUTPUT_ROOT,
+                        help='Directory jobs may write clients to (default: $GENERATOR_OUTPUT_ROOT or src/generated_clients)')
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not os.getenv('OPENAI_API_KEY'):
+        print("Error: OPENAI_API_KEY not found in environment")
+        sys.exit(1)
+
+    from src.service.code_agent import CodeAgent
+
+    daemon = GenerationDaemon(lambda: CodeAgent(doc_cache_ttl=args.doc_cache_ttl), workers=args.workers,
+                              job_ttl=args.job_ttl, output_root=args.output_root)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(daemon))
+    print(f"✓ Generation daemon listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,494 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Function Library - 已验证的Stage 1函数库，在平台之间复用
+每个平台都需要同样的六个函数 (create_campaign ... create_ad)，而且不同平台的实现往往只差URL、
+层级名称和平台名称。客户端保存后在独立的模块命名空间中执行一次，通过验证的函数
+(签名和规格一致、PRODUCTION函数使用规格中的URL、MOCK函数试运行返回dict) 连同引用的
+辅助函数/常量一起存入库中，按 (函数角色, 模式, 认证方式, URL模板形状/签名) 建立索引。
+
+为新平台生成Stage 1时，每个函数在库中查找最相似的实现:
+- 相似度 >= ADAPT_SCORE (角色、模式、认证方式和URL形状都相同；MOCK函数没有URL，
+  需要 MOCK_ADAPT_SCORE: 签名、层级名称和认证方式都相同): 在本地替换URL路径段、
+  层级名称 (ad_squad -> ad_group)、平台名称和base URL，不调用LLM
+- 相似度 >= REFERENCE_SCORE: 作为参考实现放进提示，LLM只需要修改不同的部分
+- 所有函数都在本地得到时Stage 1不调用LLM
+
+    library = FunctionLibrary('data/function_library.json')
+    plan = library.plan(function_specs(api_info, 'pinterest', mock_auth=False), 'pinterest', api_info)
+    ...
+    library.add_client('pinterest', final_code, specs, api_info)
+"""
+import ast
+import inspect
+import json
+import os
+import re
+import threading
+import types
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from src.runtime.metrics import CACHE_REQUESTS
+from src.runtime.routes import is_param, split_path
+from .api_model import ApiInfo
+
+# 函数库文件，未设置时不使用函数库
+FUNCTION_LIBRARY_PATH = os.getenv('FUNCTION_LIBRARY_PATH')
+# 角色和位置、认证方式、URL形状都相同才在本地改写
+ADAPT_SCORE = 0.8
+# MOCK函数没有URL可比较，签名、层级名称和认证方式都要相同
+MOCK_ADAPT_SCORE = 0.9
+# 低于这个相似度的实现不作为参考
+REFERENCE_SCORE = 0.5
+
+
+@dataclass(slots=True)
+class FunctionSpec:
+    """One Stage 1 function a platform client needs"""
+
+    role: str  # create_campaign / create_ad_squad / ... (不随层级名称变化)
+    name: str  # create_ad_group
+    signature: str
+    path: str  # 相对 base URL 的路径模板，MOCK模式为空
+    mode: str  # MOCK / PRODUCTION
+    auth: str  # 'Authorization: Bearer {token}'
+    hierarchy: str = 'ad_squad'  # 第二层实体的名称
+
+
+@dataclass(slots=True)
+class LibraryFunction:
+    """A validated function of a generated client"""
+
+    role: str
+    name: str
+    source: str
+    # 函数引用的模块级函数和常量的源码 (按模块中的顺序)
+    helpers: List[str]
+    platform: str
+    mode: str
+    auth: str
+    path: str
+    base_url: str
+    hierarchy_name: str
+    created_at: str = ''
+    signature: str = ''
+
+    def to_dict(self) -> Dict:
+        return {
+            'role': self.role,
+            'name': self.name,
+            'source': self.source,
+            'helpers': list(self.helpers),
+            'platform': self.platform,
+            'mode': self.mode,
+            'auth': self.auth,
+            'path': self.path,
+            'base_url': self.base_url,
+            'hierarchy_name': self.hierarchy_name,
+            'created_at': self.created_at,
+            'signature': self.signature,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LibraryFunction':
+        return cls(**{name: data[name] for name in cls.__dataclass_fields__ if name in data})
+
+
+@dataclass(slots=True)
+class LibraryPlan:
+    """What Stage 1 takes from the library"""
+
+    # 函数名 -> 改写后的源码，可以直接使用
+    adapted: Dict[str, str] = field(default_factory=dict)
+    # 改写后的函数需要的辅助函数/常量
+    helpers: List[str] = field(default_factory=list)
+    # 函数名 -> 相似的已验证实现，放进提示作为参考
+    references: Dict[str, str] = field(default_factory=dict)
+
+    def code(self) -> str:
+        """Helpers and adapted functions as one module fragment"""
+        return '\n\n\n'.join(self.helpers + list(self.adapted.values()))
+
+
+def function_specs(api_info: ApiInfo, platform: str, mock_auth: bool) -> List[FunctionSpec]:
+    """The six Stage 1 functions of a platform, with the URLs the prompt gives the LLM"""
+    hierarchy = api_info.hierarchy or ['campaign', 'ad_squad', 'ad']
+    squad = hierarchy[1]
+    index = api_info.endpoint_index()
+
+    def create_path(resource_type: str, default_path: str) -> str:
+        # 文档中有该资源的创建端点时使用文档中的路径
+        endpoint = index.create_endpoint(resource_type)
+        return index.relative_path(endpoint.path) if endpoint is not None else default_path
+
+    functions = [
+        ('create_campaign', 'create_campaign', 'account_id: str',
+         create_path('campaign', '/adaccounts/{account_id}/campaigns')),
+        ('create_ad_squad', f'create_{squad}', 'campaign_id: str, account_id: str',
+         create_path('ad_squad', f'/campaigns/{{campaign_id}}/{squad}s')),
+        ('create_media', 'create_media', 'account_id: str',
+         create_path('media', '/adaccounts/{account_id}/media')),
+        ('upload_media', 'upload_media', 'media_id: str', '/media/{media_id}/upload'),
+        ('create_creative', 'create_creative', 'account_id: str',
+         create_path('creative', '/adaccounts/{account_id}/creatives')),
+        ('create_ad', 'create_ad', f'{squad}_id: str, account_id: str',
+         create_path('ad', f'/{squad}s/{{{squad}_id}}/ads')),
+    ]
+    auth = api_info.authentication
+    return [
+        FunctionSpec(
+            role=role,
+            name=name,
+            signature=f'{name}({params}, **kwargs) -> Dict',
+            path='' if mock_auth else path,
+            mode='MOCK' if mock_auth else 'PRODUCTION',
+            auth=f'{auth.header_name}: {auth.header_format}',
+            hierarchy=squad
+        )
+        for role, name, params, path in functions
+    ]
+
+
+def path_shape(path: str) -> Tuple[str, ...]:
+    """'/adaccounts/{id}/campaigns' -> ('adaccounts', '{}', 'campaigns') with literals kept"""
+    return tuple('{}' if is_param(segment) else segment for segment in split_path(path))
+
+
+def signature_params(signature: str) -> Tuple[str, ...]:
+    """
+    Parameter names of 'create_ad(ad_squad_id: str, **kwargs) -> Dict' or of a function source
+
+    **kwargs is kept as '**kwargs'; () if the text does not parse
+    """
+    text = signature if signature.lstrip().startswith(('def ', 'async def ', '@')) else f'def {signature}: pass'
+    try:
+        node = next(n for n in ast.parse(text).body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)))
+    except (SyntaxError, StopIteration):
+        return ()
+    args = node.args
+    params = [arg.arg for arg in args.posonlyargs + args.args]
+    if args.kwarg is not None:
+        params.append(f'**{args.kwarg.arg}')
+    return tuple(params)
+
+
+def similarity(spec: FunctionSpec, function: LibraryFunction) -> float:
+    """
+    0..1 similarity of a library function to the function a platform needs
+
+    Role and mode must be equal. PRODUCTION: URL shape (positions of the path
+    parameters) counts 0.5, equal literal segments 0.2. MOCK functions have no
+    URL: their signature (hierarchy name normalized) counts 0.5, the same
+    hierarchy name 0.2. Authentication style counts 0.3.
+    """
+    if spec.role != function.role or spec.mode != function.mode:
+        return 0.0
+    auth_score = 1.0 if spec.auth == function.auth else 0.0
+    if spec.mode == 'MOCK':
+        new = [p.replace(spec.hierarchy, '{squad}') for p in signature_params(spec.signature)]
+        old = [p.replace(function.hierarchy_name, '{squad}')
+               for p in signature_params(function.signature or function.source)]
+        shape_score = 1.0 if new == old else SequenceMatcher(None, new, old).ratio() * 0.5
+        literal_score = 1.0 if spec.hierarchy == function.hierarchy_name else 0.0
+        return round(0.5 * shape_score + 0.2 * literal_score + 0.3 * auth_score, 3)
+    new, old = path_shape(spec.path), path_shape(function.path)
+    new_kinds = [segment == '{}' for segment in new]
+    old_kinds = [segment == '{}' for segment in old]
+    shape_score = 1.0 if new_kinds == old_kinds else SequenceMatcher(None, new_kinds, old_kinds).ratio() * 0.5
+    literals = [(a, b) for a, b in zip(new, old) if a != '{}' and b != '{}']
+    literal_score = sum(a == b for a, b in literals) / len(literals) if literals else 1.0
+    return round(0.5 * shape_score + 0.2 * literal_score + 0.3 * auth_score, 3)
+
+
+def adapt_score(spec: FunctionSpec) -> float:
+    """Similarity from which a library function is rewritten locally"""
+    return MOCK_ADAPT_SCORE if spec.mode == 'MOCK' else ADAPT_SCORE
+
+
+def _replace_word(source: str, old: str, new: str) -> str:
+    """Replace old where it is not part of a longer identifier or word ('_' separates words)"""
+    if not old or old == new:
+        return source
+    return re.sub(rf'(?<![A-Za-z0-9]){re.escape(old)}(?![A-Za-z0-9])', new, source)
+
+
+def _path_pattern(path: str) -> str:
+    """Regex of a URL path template in source code, any expression in the {param} segments"""
+    return '/'.join(r'(\{[^{}/]*\})' if is_param(s) else re.escape(s) for s in split_path(path))
+
+
+def _replace_path(source: str, old_path: str, new_path: str) -> Optional[str]:
+    """Swap the literal segments of a URL path with the same shape, keeping the {param} expressions"""
+    old_segments, new_segments = split_path(old_path), split_path(new_path)
+    if old_segments == new_segments:
+        return source
+    pattern = _path_pattern(old_path)
+    if not re.search(pattern, source):
+        return None
+
+    def replace(match) -> str:
+        params = iter(match.groups())
+        return '/'.join(next(params) if is_param(s) else s for s in new_segments)
+
+    return re.sub(pattern, replace, source)
+
+
+def adapt_source(source: str, function: LibraryFunction, spec: FunctionSpec, platform: str,
+                 base_url: str, hierarchy_name: str, require_path: bool = True) -> Optional[str]:
+    """
+    Rewrite a library function (or helper) for another platform
+
+    Args:
+        require_path: Fail if the URL path of the function is not in the source
+                      (helpers usually do not contain it)
+
+    Returns:
+        The rewritten source, or None if the URL path cannot be found in it
+    """
+    if function.base_url and base_url:
+        source = source.replace(function.base_url, base_url)
+    if spec.mode == 'PRODUCTION' and spec.path and function.path:
+        replaced = _replace_path(source, function.path, spec.path)
+        if replaced is None and require_path:
+            return None
+        source = replaced if replaced is not None else source
+    source = _replace_word(source, function.name, spec.name)
+    # ad_squad -> ad_group，包括参数名 ad_squad_id 和docstring中的 'ad squad'
+    source = _replace_word(source, function.hierarchy_name, hierarchy_name)
+    source = _replace_word(source, function.hierarchy_name.replace('_', ' '), hierarchy_name.replace('_', ' '))
+    for old, new in ((function.platform, platform), (function.platform.upper(), platform.upper()),
+                     (function.platform.capitalize(), platform.capitalize())):
+        source = _replace_word(source, old, new)
+    return source
+
+
+def extract_functions(code: str, names: List[str]) -> Dict[str, Tuple[str, List[str]]]:
+    """
+    Source of top-level functions and of the module-level helpers they use
+
+    Returns:
+        name -> (function source, helper sources in module order)
+    """
+    tree = ast.parse(code)
+    lines = code.splitlines()
+
+    def segment(node) -> str:
+        start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+        return '\n'.join(lines[start - 1:node.end_lineno])
+
+    # 模块级定义: 名称 -> 节点 (导入、函数、类、常量赋值)
+    definitions: Dict[str, ast.AST] = {}
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                definitions[alias.asname or alias.name.split('.')[0]] = node
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            definitions[node.name] = node
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    definitions[target.id] = node
+
+    def used_names(node) -> set:
+        return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+    result = {}
+    for name in names:
+        node = definitions.get(name)
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        # 引用的模块级定义 (传递)，不包括其他Stage 1函数
+        needed, pending = set(), [node]
+        while pending:
+            for used in used_names(pending.pop()):
+                helper = definitions.get(used)
+                if helper is not None and used not in names and helper not in needed:
+                    needed.add(helper)
+                    pending.append(helper)
+        helpers = [segment(helper) for helper in tree.body if helper in needed]
+        result[name] = (segment(node), helpers)
+    return result
+
+
+class FunctionLibrary:
+    """Validated Stage 1 functions stored in a JSON file"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Library file (created on the first add_client)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.functions: List[LibraryFunction] = self._load()
+
+    def _load(self) -> List[LibraryFunction]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return [LibraryFunction.from_dict(item) for item in data.get('functions', [])]
+        except (OSError, ValueError, AttributeError, KeyError, TypeError):
+            return []
+
+    def _save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'functions': [function.to_dict() for function in self.functions]},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def find(self, spec: FunctionSpec) -> Optional[Tuple[float, LibraryFunction]]:
+        """Most similar library function, or None"""
+        with self._lock:
+            scored = [(similarity(spec, function), function) for function in self.functions]
+        scored = [item for item in scored if item[0] > 0]
+        # 相同分数时使用最新的实现
+        return max(scored, key=lambda item: (item[0], item[1].created_at), default=None)
+
+    def plan(self, specs: List[FunctionSpec], platform: str, api_info: ApiInfo) -> LibraryPlan:
+        """Adapt close matches locally and pick references for the rest"""
+        plan = LibraryPlan()
+        base_url = api_info.base_url or f'https://api.{platform}.com/v1'
+        hierarchy_name = (api_info.hierarchy or ['campaign', 'ad_squad', 'ad'])[1]
+        for spec in specs:
+            match = self.find(spec)
+            if match is None or match[0] < REFERENCE_SCORE:
+                CACHE_REQUESTS.labels('function_library', 'miss').inc()
+                continue
+            score, function = match
+            if score >= adapt_score(spec):
+                adapted = adapt_source(function.source, function, spec, platform, base_url, hierarchy_name)
+                helpers = [adapt_source(helper, function, spec, platform, base_url, hierarchy_name, require_path=False)
+                           for helper in function.helpers]
+                if adapted is not None and _defines(adapted, spec.name):
+                    plan.adapted[spec.name] = adapted
+                    for helper in helpers:
+                        if helper not in plan.helpers:
+                            plan.helpers.append(helper)
+                    CACHE_REQUESTS.labels('function_library', 'hit').inc()
+                    continue
+            plan.references[spec.name] = function.source
+            CACHE_REQUESTS.labels('function_library', 'reference').inc()
+        return plan
+
+    def add_client(self, platform: str, code: str, specs: List[FunctionSpec], api_info: ApiInfo) -> int:
+        """
+        Store the validated Stage 1 functions of a saved client
+
+        The module is executed in its own namespace; only functions passing
+        validate_function are stored. They replace those stored earlier for
+        the same platform and mode.
+
+        Returns:
+            Number of functions stored
+        """
+        try:
+            module = load_isolated(code, platform)
+            extracted = extract_functions(code, [spec.name for spec in specs])
+        except Exception as e:
+            print(f"⚠ 函数库: {platform} 客户端无法加载，不保存 ({type(e).__name__}: {e})")
+            return 0
+
+        created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        hierarchy_name = (api_info.hierarchy or ['campaign', 'ad_squad', 'ad'])[1]
+        added = []
+        for spec in specs:
+            if spec.name not in extracted:
+                continue
+            source, helpers = extracted[spec.name]
+            problem = validate_function(module, spec, '\n\n'.join(helpers + [source]))
+            if problem:
+                print(f"⚠ 函数库: {spec.name} 未通过验证，不保存 ({problem})")
+                continue
+            added.append(LibraryFunction(
+                role=spec.role,
+                name=spec.name,
+                source=source,
+                helpers=helpers,
+                platform=platform,
+                mode=spec.mode,
+                auth=spec.auth,
+                path=spec.path,
+                base_url=api_info.base_url,
+                hierarchy_name=hierarchy_name,
+                created_at=created_at,
+                signature=spec.signature
+            ))
+        if not added:
+            return 0
+        replaced = {(function.platform, function.mode, function.role) for function in added}
+        with self._lock:
+            self.functions = [
+                function for function in self.functions
+                if (function.platform, function.mode, function.role) not in replaced
+            ] + added
+            self._save()
+        return len(added)
+
+
+def load_isolated(code: str, platform: str) -> types.ModuleType:
+    """Execute a client module in a fresh namespace (not registered in sys.modules)"""
+    module = types.ModuleType(f'_function_library_{platform}_api')
+    exec(compile(code, f'{platform}_api.py', 'exec'), module.__dict__)
+    return module
+
+
+def validate_function(module: types.ModuleType, spec: FunctionSpec, source: str) -> Optional[str]:
+    """
+    Check a function of a loaded client against its spec
+
+    Args:
+        module: load_isolated() client
+        spec: The function the platform needs
+        source: Source of the function and its helpers
+
+    Returns:
+        The problem found, or None if the function can be stored
+    """
+    function = getattr(module, spec.name, None)
+    if not callable(function):
+        return 'not a function'
+
+    # 必需的位置参数和 **kwargs 与规格一致
+    expected = signature_params(spec.signature)
+    try:
+        parameters = list(inspect.signature(function).parameters.values())
+    except (TypeError, ValueError):
+        return 'signature unavailable'
+    required = tuple(p.name for p in parameters
+                     if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) and p.default is p.empty)
+    if any(p.kind == p.VAR_KEYWORD for p in parameters):
+        required += ('**kwargs',)
+    if required != expected:
+        return f"signature ({', '.join(required)}) != ({', '.join(expected)})"
+
+    if spec.mode == 'PRODUCTION':
+        # 使用的URL必须是规格中的路径 (参数表达式可以不同)
+        if spec.path and not re.search(_path_pattern(spec.path), source):
+            return f'URL path {spec.path} not used'
+        return None
+
+    # MOCK函数不访问网络，试运行一次
+    args = [f'test_{name}' for name in expected if not name.startswith('**')]
+    try:
+        result = function(*args)
+    except Exception as e:
+        return f'MOCK call failed: {type(e).__name__}: {e}'
+    if not isinstance(result, dict):
+        return f'MOCK call returned {type(result).__name__}, not a dict'
+    return None
+
+
+def _defines(source: str, name: str) -> bool:
+    try:
+        return any(isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name
+                   for node in ast.parse(source).body)
+    except SyntaxError:
+        return False
@@ -0,0 +1,119 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+HTML Stream - 增量解析HTML，边下载边提取文本和代码块
+BeautifulSoup 需要完整的HTML字符串，然后同时保存整棵树和 get_text() 的副本；
+这里把下载的数据块直接交给 lxml 的 HTMLPullParser，每个文本节点完整后立即输出，
+已经处理过的元素从树中删除，所以内存中只保留当前路径上的元素 (代码块在结束前保留)。
+
+输出和 PlatformDocParser.parse_page 一致:
+- 文本: 去掉首尾空白的非空字符串 (不含 script/style/template 和注释)，即 get_text('\\n', strip=True)
+- 代码块: code / pre / div.highlight / div.code-block 的文本，按选择器分组，组内按文档顺序
+- code / pre 的原始文本，用于提取JSON示例 (schemas)
+
+    stream = HTMLTextStream()
+    for chunk in response.iter_content(64 * 1024):
+        for segment in stream.feed(chunk):
+            ...
+    segments = stream.close()
+"""
+from typing import List, Optional, Union
+
+# PlatformDocParser._extract_code_blocks 使用的选择器: (标签, class)
+CODE_SELECTORS = (('code', None), ('pre', None), ('div', 'highlight'), ('div', 'code-block'))
+# 这些元素中的文本不是页面内容 (BeautifulSoup.get_text 也不包含)
+SKIPPED_TAGS = ('script', 'style', 'template')
+
+
+class HTMLTextStream:
+    """Incremental HTML -> text segments and code blocks"""
+
+    def __init__(self, encoding: Optional[str] = None):
+        """
+        Args:
+            encoding: Encoding of byte chunks (default: detected by libxml2)
+        """
+        from lxml import etree
+        self._parser = etree.HTMLPullParser(events=('start', 'end', 'comment'), encoding=encoding)
+        # 每个选择器匹配的代码块
+        self._code_blocks: List[List[str]] = [[] for _ in CODE_SELECTORS]
+        # code / pre 的原始文本
+        self.block_texts: List[str] = []
+        # 打开的代码块元素数 (>0 时不删除元素)，打开的 script/style/template 数
+        self._capture = 0
+        self._skip = 0
+
+    @property
+    def code_blocks(self) -> List[str]:
+        """Code blocks in the order of PlatformDocParser._extract_code_blocks"""
+        return [block for blocks in self._code_blocks for block in blocks]
+
+    def feed(self, data: Union[bytes, str]) -> List[str]:
+        """Parse a chunk; returns the text segments completed by it"""
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[str]:
+        """Finish parsing; returns the last text segments"""
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[str]:
+        segments: List[str] = []
+        for event, element in self._parser.read_events():
+            if event == 'end':
+                # 元素的最后一个文本节点: 没有子元素时是 text，否则是最后一个子元素的 tail
+                self._emit(element[-1].tail if len(element) else element.text, segments)
+                self._end(element)
+                if self._capture == 0:
+                    element.clear(keep_tail=True)
+            else:
+                # 新节点 (元素或注释) 开始时，它前面的文本节点已经完整
+                previous = element.getprevious()
+                if previous is not None:
+                    self._emit(previous.tail, segments)
+                    if self._capture == 0:
+                        element.getparent().remove(previous)
+                elif element.getparent() is not None:
+                    self._emit(element.getparent().text, segments)
+                if event == 'start':
+                    self._start(element)
+        return segments
+
+    def _emit(self, text: Optional[str], segments: List[str]):
+        if text and self._skip == 0:
+            text = text.strip()
+            if text:
+                segments.append(text)
+
+    def _matches(self, element) -> List[int]:
+        """Indexes of the code selectors matching an element"""
+        if element.tag not in ('code', 'pre', 'div'):
+            return []
+        classes = (element.get('class') or '').split()
+        return [
+            index for index, (tag, css_class) in enumerate(CODE_SELECTORS)
+            if element.tag == tag and (css_class is None or css_class in classes)
+        ]
+
+    def _start(self, element):
+        if element.tag in SKIPPED_TAGS:
+            self._skip += 1
+        if self._matches(element):
+            self._capture += 1
+
+    def _end(self, element):
+        if element.tag in SKIPPED_TAGS:
+            self._skip -= 1
+        matches = self._matches(element)
+        if not matches:
+            return
+        self._capture -= 1
+        strings = list(element.itertext())
+        if element.tag in ('code', 'pre'):
+            self.block_texts.append(''.join(strings))
+        code_text = ''.join(s.strip() for s in strings)
+        if len(code_text) > 20:  # Filter out very short snippets
+            for index in matches:
+                self._code_blocks[index].append(code_text)
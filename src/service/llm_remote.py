@@ -5,9 +5,14 @@
 LLM Remote Service - 三阶段代码生成
 """
 import os
-from typing import Dict, Optional
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+import time
+from typing import Optional
+
+from src.runtime import tracing
+from src.runtime.metrics import LLM_CALL_DURATION, LLM_TOKENS
+from .api_model import ApiInfo
+from .client_manifest import list_functions
+from .function_library import LibraryPlan, function_specs
 
 
 class LLMRemote:
@@ -17,20 +22,28 @@ class LLMRemote:
         """Initialize LLM client"""
         api_key = os.getenv('OPENAI_API_KEY')
         api_base = os.getenv('API_BASE', 'https://api.deepseek.com/v1')
+        # 流式接收回复，可以测量首token延迟 (llm.time_to_first_token_ms)
+        self.streaming = os.getenv('LLM_STREAMING', 'False').lower() == 'true'
 
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment")
 
+        # langchain加载需要1秒以上，只在真正创建LLM客户端时导入
+        from langchain_openai import ChatOpenAI
+
         # Initialize ChatOpenAI
         self.llm = ChatOpenAI(
             model='deepseek-chat',
             base_url=api_base,
             temperature=0.3,
-            max_tokens=6000
+            max_tokens=6000,
+            stream_usage=self.streaming
         )
 
-    def generate_code(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def generate_code(self, prompt: str, system_prompt: Optional[str] = None, stage: str = 'other') -> str:
         """Generate code using LLM API"""
+        from langchain_core.messages import HumanMessage, SystemMessage
+
         messages = []
 
         if system_prompt:
@@ -38,18 +51,42 @@ class LLMRemote:
 
         messages.append(HumanMessage(content=prompt))
 
+        span = tracing.current_span()
+        start = time.perf_counter()
         try:
-            response = self.llm.invoke(messages)
-            return response.content
+            if self.streaming:
+                response = None
+                for chunk in self.llm.stream(messages):
+                    # 第一个chunk通常只有role，首token是第一个有内容的chunk
+                    if chunk.content and (response is None or not response.content) and span is not None:
+                        span.set_attribute('llm.time_to_first_token_ms',
+                                           round((time.perf_counter() - start) * 1000, 3))
+                    response = chunk if response is None else response + chunk
+                if response is None:
+                    raise Exception("empty response stream")
+            else:
+                response = self.llm.invoke(messages)
         except Exception as e:
             raise Exception(f"LLM API call failed: {str(e)}")
-
+        finally:
+            LLM_CALL_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+        usage = getattr(response, 'usage_metadata', None) or {}
+        LLM_TOKENS.labels(stage, 'prompt').inc(usage.get('input_tokens', 0))
+        LLM_TOKENS.labels(stage, 'completion').inc(usage.get('output_tokens', 0))
+        if span is not None:
+            span.set_attribute('llm.prompt_tokens', usage.get('input_tokens', 0))
+            span.set_attribute('llm.completion_tokens', usage.get('output_tokens', 0))
+        return response.content
+
+    @tracing.traced('llm.stage1')
     def generate_stage1_code(
             self,
             platform: str,
-            api_info: Dict,
+            api_info: ApiInfo,
             mock_auth: bool,
-            step1_prompt: Optional[str]
+            step1_prompt: Optional[str],
+            library: Optional[LibraryPlan] = None
     ) -> str:
         """
         Stage 1: 生成基础API函数
@@ -61,6 +98,8 @@ class LLMRemote:
         - upload_media
         - create_creative
         - create_ad
+
+        library: 函数库的计划；已改写的函数不再让LLM生成，参考实现放进提示
         """
         system_prompt = """你是一个专业的Python API客户端生成专家。
 
@@ -77,8 +116,8 @@ class LLMRemote:
 """
 
         # Build user prompt
-        base_url = api_info.get('base_url', f'https://api.{platform}.com/v1')
-        hierarchy = api_info.get('hierarchy', ['campaign', 'ad_squad', 'ad'])
+        base_url = api_info.base_url or f'https://api.{platform}.com/v1'
+        hierarchy = api_info.hierarchy or ['campaign', 'ad_squad', 'ad']
 
         user_prompt = f"""平台: {platform.upper()}
 Base URL: {base_url}
@@ -93,78 +132,101 @@ Base URL: {base_url}
 
 """
 
+        specs = function_specs(api_info, platform, mock_auth)
+        library = library or LibraryPlan()
+        missing = [spec for spec in specs if spec.name not in library.adapted]
+        span = tracing.current_span()
+        if span is not None:
+            span.set_attribute('library.adapted', len(specs) - len(missing))
+            span.set_attribute('library.references', len(library.references))
+        if not missing:
+            print(f"  ✓ 全部 {len(specs)} 个函数由函数库改写，不调用LLM")
+            return library.code()
+
         if mock_auth:
             user_prompt += f"""请生成MOCK模式的API函数:
 
 必需函数:
-1. create_campaign(account_id: str, **kwargs) -> Dict
-2. create_{hierarchy[1]}(campaign_id: str, account_id: str, **kwargs) -> Dict
-3. create_media(account_id: str, **kwargs) -> Dict
-4. upload_media(media_id: str, **kwargs) -> Dict
-5. create_creative(account_id: str, **kwargs) -> Dict
-6. create_ad({hierarchy[1]}_id: str, account_id: str, **kwargs) -> Dict
-
+"""
+            for number, spec in enumerate(missing, 1):
+                user_prompt += f"{number}. {spec.signature}\n"
+            user_prompt += f"""
 要求:
 - 所有函数返回mock数据，不进行真实API调用
 - 生成mock ID使用格式: f"{{resource}}_mock_{{random.randint(10000, 99999)}}"
 - 包含必要的导入: import random, from typing import Dict, Any
 - 每个函数包含完整的docstring
-
-生成代码:
 """
         else:
             user_prompt += f"""请生成PRODUCTION模式的API函数:
 
 基于以下API端点:
 """
-            for ep in api_info.get('endpoints', [])[:10]:
-                user_prompt += f"- {ep.get('method', 'POST')} {ep.get('path', '')}\n"
+            for route in api_info.endpoint_index().routes()[:10]:
+                user_prompt += f"- {route}\n"
 
             user_prompt += f"""
 必需函数:
-1. create_campaign(account_id: str, **kwargs) -> Dict
-   - URL: {base_url}/adaccounts/{{account_id}}/campaigns
-   - Method: POST
-   
-2. create_{hierarchy[1]}(campaign_id: str, account_id: str, **kwargs) -> Dict
-   - URL: {base_url}/campaigns/{{campaign_id}}/{hierarchy[1]}s
-   - Method: POST
-   
-3. create_media(account_id: str, **kwargs) -> Dict
-   - URL: {base_url}/adaccounts/{{account_id}}/media
-   - Method: POST
-   
-4. upload_media(media_id: str, **kwargs) -> Dict
-   - URL: {base_url}/media/{{media_id}}/upload
-   - Method: POST
-   - 注意: 如果kwargs中有image_url，需要先下载图片
-   
-5. create_creative(account_id: str, **kwargs) -> Dict
-   - URL: {base_url}/adaccounts/{{account_id}}/creatives
-   - Method: POST
-   
-6. create_ad({hierarchy[1]}_id: str, account_id: str, **kwargs) -> Dict
-   - URL: {base_url}/{hierarchy[1]}s/{{{hierarchy[1]}_id}}/ads
+"""
+            for number, spec in enumerate(missing, 1):
+                user_prompt += f"""{number}. {spec.signature}
+   - URL: {base_url}{spec.path}
    - Method: POST
+"""
+                if spec.role == 'upload_media':
+                    user_prompt += f"""   - 注意: 如果kwargs中有image_url，不要自己下载整个文件，使用共享运行时流式上传:
+     from src.runtime.media_upload import upload_media_from_url
+     return upload_media_from_url(BASE_URL, media_id, kwargs['image_url'], headers={{'Authorization': f'Bearer {{token}}'}},
+                                  platform='{platform}')
+"""
+                user_prompt += "\n"
+
+            user_prompt += f"""URL中的路径参数对应函数参数 (例如 {{ad_account_id}} -> account_id)
 
 要求:
-- 使用requests库
+- 通过共享运行时发送请求 (自动限流，429时按Retry-After重试)，不要直接调用requests.post:
+  from src.runtime.http import request
+  response = request('POST', url, platform='{platform}', account_id=account_id, headers=headers, json=payload)
+  没有account_id参数的函数传 account_id=None
 - 从环境变量读取token: os.getenv('{platform.upper()}_ACCESS_TOKEN')
 - 设置headers: Authorization: Bearer {{token}}, Content-Type: application/json
 - 实现错误处理
 - 返回解析后的JSON响应
+"""
+
+        if library.adapted:
+            # 已经在本地得到的函数只给出名称，LLM只生成缺少的部分
+            user_prompt += f"""
+以下函数已由函数库提供，不要生成它们: {', '.join(library.adapted)}
+"""
+        for name, source in library.references.items():
+            if name in library.adapted:
+                continue
+            user_prompt += f"""
+{name} 可以参考另一个平台已验证的实现，只修改URL、参数和平台相关的部分:
+{source}
+"""
 
+        user_prompt += """
 生成代码:
 """
 
         print(f"  调用LLM生成Stage 1代码...")
-        code = self.generate_code(user_prompt, system_prompt)
-        return self._extract_code(code)
+        code = self._extract_code(self.generate_code(user_prompt, system_prompt, stage='stage1'))
+        if not library.adapted:
+            return code
+        # LLM仍然生成了的函数以LLM的版本为准
+        defined = set(list_functions(code))
+        library_code = '\n\n\n'.join(
+            library.helpers + [source for name, source in library.adapted.items() if name not in defined]
+        )
+        return library_code + '\n\n\n' + code
 
+    @tracing.traced('llm.stage2')
     def generate_stage2_code(
             self,
             platform: str,
-            api_info: Dict,
+            api_info: ApiInfo,
             mock_auth: bool,
             step2_prompt: Optional[str],
             stage1_code: str
@@ -191,7 +253,7 @@ Base URL: {base_url}
 6. 不要使用markdown代码块标记
 """
 
-        hierarchy = api_info.get('hierarchy', ['campaign', 'ad_squad', 'ad'])
+        hierarchy = api_info.hierarchy or ['campaign', 'ad_squad', 'ad']
 
         user_prompt = f"""平台: {platform.upper()}
 实体层级: {' -> '.join(hierarchy)}
@@ -214,20 +276,30 @@ def launch_campaign(
     account_id: str,
     campaign_data: Dict[str, Any],
     ad_squads_data: List[Dict[str, Any]],
-    ads_data: List[Dict[str, Any]]
+    ads_data: List[Dict[str, Any]],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
 ) -> Dict[str, Any]:
     \"\"\"
     完整的广告投放工作流
     
     步骤:
     1. 创建campaign
-    2. 创建ad_squad(s)
+    2. 创建{hierarchy[1]}(s)
     3. 对每个ad:
        - 创建media
        - 上传图片 (从image_url)
        - 创建creative
        - 创建ad
     
+    progress_callback不为None时，每完成一步调用一次，参数是一个事件dict:
+    {{'event': 'campaign_created', 'campaign_id': ...}}
+    {{'event': '{hierarchy[1]}_created', 'index': i, '{hierarchy[1]}_id': ...}}
+    {{'event': 'media_created' / 'media_uploaded', 'index': i, 'media_id': ...}}
+    {{'event': 'creative_created', 'index': i, 'creative_id': ...}}
+    {{'event': 'ad_created', 'index': i, 'ad_id': ...}}
+    {{'event': 'step_failed', 'step': 'create_ad', 'error': ...}}
+    最后: {{'event': 'completed', 'result': 返回值}}
+    
     返回:
     {{
         'status': 'success' or 'partial',
@@ -246,16 +318,21 @@ def launch_campaign(
 2. 正确解析campaign_data, ad_squads_data, ads_data
 3. 按顺序执行6个步骤
 4. 处理image_url: 如果ads_data中有image_url，用于create_media和upload_media
-5. 错误处理: 使用try-except，部分失败返回status='partial'
-6. 包含详细的日志输出 (print语句)
+5. media类型来自ad的media_type字段 (默认'IMAGE')，不要写死
+6. ad中的 name, status, start_time, end_time 传给create_ad；其余字段 (headline, brand_name,
+   call_to_action等) 和name传给create_creative；image_url, media_type, {hierarchy[1]}_index 不传给平台
+7. 错误处理: 使用try-except，部分失败返回status='partial'
+8. 按上面的格式调用progress_callback
+9. 包含详细的日志输出 (print语句)
 
 生成代码:
 """
 
         print(f"  调用LLM生成Stage 2代码...")
-        code = self.generate_code(user_prompt, system_prompt)
+        code = self.generate_code(user_prompt, system_prompt, stage='stage2')
         return self._extract_code(code)
 
+    @tracing.traced('llm.stage3')
     def generate_stage3_code(
             self,
             platform: str,
@@ -311,7 +388,7 @@ Stage 2 代码 (launch_campaign orchestrator):
 """
 
         print(f"  调用LLM整合代码...")
-        code = self.generate_code(user_prompt, system_prompt)
+        code = self.generate_code(user_prompt, system_prompt, stage='stage3')
         return self._extract_code(code)
 
     def _extract_code(self, text: str) -> str:
@@ -0,0 +1,121 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Parse Pool - 在进程池中运行 PlatformDocParser 的提取器和多页文档的HTML解析
+提取器 (端点、认证、层级、base URL、工作流) 都只读同一段文本，互不依赖 (工作流需要端点)，
+HTML解析和正则匹配都是CPU密集的，线程受GIL限制，所以使用进程:
+
+- 文本 / HTML 以UTF-8写入一块共享内存 (multiprocessing.shared_memory)，任务只传递
+  (名称, 起始字节, 结束字节)，工作进程按引用读取，不为每个任务pickle一份文本；
+  代码块和端点列表以JSON写入共享内存，用 SharedJson 传给 run_extractor
+- 结果按提交顺序合并，与完成顺序无关，多次运行得到相同的 ApiInfo
+- 工作进程使用spawn启动 (调用方通常是多线程的Flask/守护进程，fork不安全)，
+  池在第一次使用时创建并保持，工作进程中关闭tracing
+
+    pool = ParsePool(4)
+    with SharedText(['<html>...</html>', '<html>...</html>']) as shared:
+        pages = pool.map(parse_page, shared.refs)
+"""
+import json
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# (共享内存名称, 起始字节, 结束字节)
+TextRef = Tuple[str, int, int]
+
+
+class SharedText:
+    """Strings stored back to back in one shared memory block"""
+
+    def __init__(self, texts: List[str]):
+        data = [text.encode('utf-8') for text in texts]
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, sum(len(d) for d in data)))
+        self.refs: List[TextRef] = []
+        offset = 0
+        for chunk in data:
+            self._shm.buf[offset:offset + len(chunk)] = chunk
+            self.refs.append((self._shm.name, offset, offset + len(chunk)))
+            offset += len(chunk)
+
+    def close(self):
+        """Release and remove the block; the refs are invalid afterwards"""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> 'SharedText':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_text(ref: TextRef) -> str:
+    """The string a ref points to (called in the worker process)"""
+    name, start, end = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[start:end]).decode('utf-8')
+    finally:
+        shm.close()
+
+
+class SharedJson(NamedTuple):
+    """Argument of run_extractor stored as JSON in shared memory"""
+    ref: TextRef
+
+
+def _init_worker():
+    from src.runtime import tracing
+    tracing.configure(None)
+
+
+def parse_page(ref: TextRef) -> Tuple[str, List[str], Dict]:
+    """HTML page -> (text, code blocks, schemas)"""
+    from .platform_doc_parser import PlatformDocParser
+    return PlatformDocParser(workers=0).parse_page(read_text(ref))
+
+
+def run_extractor(name: str, ref: TextRef, *args) -> Any:
+    """Run PlatformDocParser._extract_<name>(text, *args) on shared text; SharedJson args are decoded"""
+    from .platform_doc_parser import PlatformDocParser
+    args = [json.loads(read_text(arg.ref)) if isinstance(arg, SharedJson) else arg for arg in args]
+    return getattr(PlatformDocParser(workers=0), f'_extract_{name}')(read_text(ref), *args)
+
+
+class ParsePool:
+    """Process pool created on first use"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        return self.executor.submit(fn, *args)
+
+    def map(self, fn: Callable, *iterables) -> List:
+        """Results in input order"""
+        return list(self.executor.map(fn, *iterables))
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
@@ -1,22 +1,105 @@
 # @Home    : www.pi-apple.com
 # @Author  : Leon
 # @Email   : 88978827@qq.com
-import requests
-from bs4 import BeautifulSoup
-from typing import Dict, List
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+import os
 import re
 import json
+import threading
+import time
+
+from src.runtime.metrics import CACHE_REQUESTS
+from src.runtime.tracing import traced
+from .api_model import ApiInfo, AuthInfo, Endpoint, EndpointIndex, Workflow, segment_resource_type
+from src.runtime.routes import is_param, split_path
+from .html_stream import HTMLTextStream
+from .stream_extract import StreamExtractor
+from .parse_pool import ParsePool, SharedJson, SharedText, parse_page, run_extractor
+
+# requests 和 bs4 在第一次使用时才导入，CLI的 --help 和参数错误不需要等待它们加载
+if TYPE_CHECKING:
+    import requests
+    from bs4 import BeautifulSoup
+
+# 解析文档的工作进程数 (0/1 = 在当前进程中顺序解析)
+DOC_PARSER_WORKERS = int(os.getenv('DOC_PARSER_WORKERS', 0))
+# 文档 (所有页面) 至少这么多字符才使用进程池，小文档的进程间通信比解析本身还慢
+DOC_PARSER_PARALLEL_MIN_CHARS = int(os.getenv('DOC_PARSER_PARALLEL_MIN_CHARS', 256 * 1024))
+# 边下载边解析 (lxml增量解析)，不在内存中保留完整的HTML和BeautifulSoup树
+DOC_PARSER_STREAMING = os.getenv('DOC_PARSER_STREAMING', 'False').lower() == 'true'
+# 流式下载时每次读取的字节数
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 class PlatformDocParser:
     """Parse and extract comprehensive API documentation for ad platforms"""
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-
+    # Enhanced patterns for endpoint detection
+    ENDPOINT_PATTERNS = [
+        # Standard REST format: POST /v1/campaigns
+        r'(POST|GET|PUT|DELETE|PATCH)\s+(/[\w\-/{}:]+)',
+        # URL format: https://adsapi.snapchat.com/v1/campaigns
+        r'https?://[\w\-.]+(/v\d+/[\w\-/{}:]+)',
+        # Path only: /adaccounts/{id}/campaigns
+        r'(/adaccounts/[{\w\-}]+/[\w\-/{}:]+)',
+        r'(/campaigns/[{\w\-}]+/[\w\-/{}:]+)',
+        r'(/media/[{\w\-}]+/[\w\-/{}:]+)',
+        r'(/creatives)',
+        r'(/adsquads/[{\w\-}]+/[\w\-/{}:]+)'
+    ]
+    # 认证方式的关键词
+    OAUTH_KEYWORDS = ('oauth', 'access token', 'bearer')
+    API_KEY_KEYWORDS = ('api key', 'api_key')
+    # (header regex, header name, format)，第一个匹配的生效
+    AUTH_HEADER_PATTERNS = [
+        (r'authorization:\s*bearer\s+', 'Authorization', 'Bearer {token}'),
+        (r'x-api-key', 'X-API-Key', '{token}'),
+    ]
+    # 文本中出现的实体名称 -> 层级，按顺序检查
+    HIERARCHY_KEYWORDS = [
+        (('ad squad', 'adsquad'), ['campaign', 'ad_squad', 'ad']),
+        (('ad group', 'adgroup'), ['campaign', 'ad_group', 'ad']),
+        (('ad set', 'adset'), ['campaign', 'ad_set', 'ad']),
+    ]
+    BASE_URL_PATTERN = r'https?://[\w\-.]+\.com/v\d+'
+
+    def __init__(self, cache_ttl: float = 0, workers: Optional[int] = None,
+                 parallel_min_chars: Optional[int] = None, streaming: Optional[bool] = None):
+        """
+        Args:
+            cache_ttl: Seconds fetched documentation is reused (0 = no cache).
+                       The generation daemon keeps documents between jobs.
+            workers: Processes running the extractors and page parses of large
+                     documents (default: DOC_PARSER_WORKERS; 0/1 = sequential)
+            parallel_min_chars: Smallest document parsed in the process pool
+                                (default: DOC_PARSER_PARALLEL_MIN_CHARS)
+            streaming: Parse documentation while it downloads in get_api_info
+                       (default: DOC_PARSER_STREAMING)
+        """
+        self.streaming = DOC_PARSER_STREAMING if streaming is None else streaming
+        workers = DOC_PARSER_WORKERS if workers is None else workers
+        self.pool = ParsePool(workers) if workers > 1 else None
+        self.parallel_min_chars = (DOC_PARSER_PARALLEL_MIN_CHARS if parallel_min_chars is None
+                                   else parallel_min_chars)
+        self._session = None
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[float, str]] = {}
+        # (url, platform) -> (时间, ApiInfo.to_json())，每次命中都反序列化出独立的对象
+        self._api_info_cache: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._cache_lock = threading.Lock()
+
+    @property
+    def session(self) -> 'requests.Session':
+        """HTTP session, created on first fetch"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            })
+        return self._session
+
+    @traced('doc_parser.fetch_documentation')
     def fetch_documentation(self, url: str) -> str:
         """
         Fetch raw documentation content from URL
@@ -27,14 +110,33 @@ class PlatformDocParser:
         Returns:
             Raw HTML/text content
         """
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                cached = self._cache.get(url)
+            if cached is not None and cached[0] > time.time() - self.cache_ttl:
+                CACHE_REQUESTS.labels('documentation', 'hit').inc()
+                print(f"  ✓ 使用缓存的文档 ({int(time.time() - cached[0])}s 前下载)")
+                return cached[1]
+            CACHE_REQUESTS.labels('documentation', 'miss').inc()
+
         try:
             response = self.session.get(url, timeout=30)
             response.raise_for_status()
-            return response.text
         except Exception as e:
             raise Exception(f"Failed to fetch documentation from {url}: {str(e)}")
 
-    def parse_api_structure(self, html_content: str, platform: str) -> Dict:
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                self._cache[url] = (time.time(), response.text)
+        return response.text
+
+    def close(self):
+        """Stop the parse worker processes, if any were started"""
+        if self.pool is not None:
+            self.pool.close()
+
+    @traced('doc_parser.parse_api_structure')
+    def parse_api_structure(self, html_content: str, platform: str) -> ApiInfo:
         """
         Parse API documentation to extract comprehensive information
 
@@ -43,8 +145,66 @@ class PlatformDocParser:
             platform: Platform name
 
         Returns:
-            Dictionary containing detailed API structure information
+            Detailed API structure information (ApiInfo.to_dict() gives the plain dict)
+        """
+        return self._parse_pages([html_content], platform)
+
+    @traced('doc_parser.parse_pages')
+    def parse_pages(self, pages: List[str], platform: str) -> ApiInfo:
+        """
+        Parse documentation split over several HTML pages
+
+        Text, code blocks and schemas of the pages are merged in page order,
+        so the result does not depend on which worker finished first.
+
+        Args:
+            pages: Raw HTML of each page
+            platform: Platform name
+        """
+        return self._parse_pages(pages, platform)
+
+    @traced('doc_parser.parse_stream')
+    def parse_stream(self, chunks: Iterable[Union[bytes, str]], platform: str,
+                     encoding: Optional[str] = None) -> ApiInfo:
         """
+        Parse documentation incrementally as its chunks arrive
+
+        Each text segment goes through the extractors (StreamExtractor) as
+        soon as HTMLTextStream completes it, while the next chunk downloads.
+        Neither the HTML, a parse tree nor the joined page text is built;
+        only the code blocks and a bounded carry-over are kept.
+
+        Args:
+            chunks: HTML chunks, e.g. response.iter_content()
+            platform: Platform name
+            encoding: Encoding of byte chunks (default: detected from the HTML)
+        """
+        stream = HTMLTextStream(encoding)
+        extractor = StreamExtractor(self, platform)
+        for chunk in chunks:
+            for segment in stream.feed(chunk):
+                extractor.feed(segment)
+        for segment in stream.close():
+            extractor.feed(segment)
+
+        code_blocks = stream.code_blocks
+        endpoints, auth_info, hierarchy, workflow, base_url, raw_text = extractor.finish(code_blocks)
+        api_info = ApiInfo(
+            platform=platform,
+            base_url=base_url,
+            endpoints=endpoints,
+            authentication=auth_info,
+            hierarchy=hierarchy,
+            schemas=self._schemas_from_blocks(stream.block_texts),
+            workflow=workflow,
+            code_examples=code_blocks[:20]
+        )
+        api_info.raw_text = raw_text
+        return api_info
+
+    def parse_page(self, html_content: str) -> Tuple[str, List[str], Dict]:
+        """One HTML page -> (text, code blocks, schemas)"""
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_content, 'html.parser')
 
         # Extract all text content
@@ -53,37 +213,92 @@ class PlatformDocParser:
         # Extract code blocks with better parsing
         code_blocks = self._extract_code_blocks(soup)
 
-        # Extract endpoints with detailed information
-        endpoints = self._extract_detailed_endpoints(text_content, code_blocks, soup)
+        # Extract request/response schemas
+        schemas = self._extract_schemas(soup, text_content)
+        return text_content, code_blocks, schemas
 
-        # Extract authentication information
-        auth_info = self._extract_auth_info(text_content)
+    def _parse_pages(self, pages: List[str], platform: str) -> ApiInfo:
+        parallel = self.pool is not None and sum(len(page) for page in pages) >= self.parallel_min_chars
 
-        # Extract entity hierarchy
-        hierarchy = self._extract_hierarchy(text_content, platform)
+        # 多个页面时每个页面在一个工作进程中解析；单个页面在当前进程解析 (需要soup)
+        if parallel and len(pages) > 1:
+            with SharedText(pages) as shared:
+                parsed = self.pool.map(parse_page, shared.refs)
+        else:
+            parsed = [self.parse_page(page) for page in pages]
 
-        # Extract request/response schemas
-        schemas = self._extract_schemas(soup, text_content)
+        text_content = '\n'.join(text for text, _, _ in parsed)
+        code_blocks = [block for _, blocks, _ in parsed for block in blocks]
+        schemas = {}
+        for _, _, page_schemas in parsed:
+            schemas.update(page_schemas)
+        return self._build_api_info(text_content, code_blocks, schemas, platform, parallel)
+
+    def _build_api_info(self, text_content: str, code_blocks: List[str], schemas: Dict, platform: str,
+                        parallel: bool) -> ApiInfo:
+        """Run the text extractors and assemble the ApiInfo"""
+        if parallel:
+            endpoints, auth_info, hierarchy, workflow, base_url = self._extract_parallel(
+                text_content, code_blocks, platform
+            )
+        else:
+            # Extract endpoints with detailed information
+            endpoints = self._extract_detailed_endpoints(text_content, code_blocks)
+
+            # Extract authentication information
+            auth_info = self._extract_auth_info(text_content)
+
+            # Extract entity hierarchy
+            hierarchy = self._extract_hierarchy(text_content, platform)
+
+            # Extract dependencies and workflow
+            workflow = self._extract_workflow(text_content, endpoints, platform)
+
+            # Extract base URL patterns
+            base_url = self._extract_base_url(text_content, endpoints, platform)
+
+        api_info = ApiInfo(
+            platform=platform,
+            base_url=base_url,
+            endpoints=endpoints,
+            authentication=auth_info,
+            hierarchy=hierarchy,
+            schemas=schemas,
+            workflow=workflow,
+            code_examples=code_blocks[:20]  # First 20 code blocks
+        )
+        api_info.raw_text = text_content[:10000]  # First 10000 chars for context
+        return api_info
 
-        # Extract dependencies and workflow
-        workflow = self._extract_workflow(text_content, endpoints, platform)
-
-        # Extract base URL patterns
-        base_url = self._extract_base_url(text_content, endpoints, platform)
-
-        return {
-            'platform': platform,
-            'base_url': base_url,
-            'endpoints': endpoints,
-            'authentication': auth_info,
-            'hierarchy': hierarchy,
-            'schemas': schemas,
-            'workflow': workflow,
-            'raw_text': text_content[:10000],  # First 10000 chars for context
-            'code_examples': code_blocks[:20]  # First 20 code blocks
-        }
+    @traced('doc_parser.extract_parallel')
+    def _extract_parallel(
+            self,
+            text: str,
+            code_blocks: List[str],
+            platform: str
+    ) -> Tuple[List[Endpoint], AuthInfo, List[str], Workflow, str]:
+        """
+        Run the extractors in the process pool over one shared copy of the text
 
-    def _extract_code_blocks(self, soup: BeautifulSoup) -> List[str]:
+        The code blocks and the endpoints the workflow extractor needs are
+        passed through shared memory as JSON, not pickled into each task.
+        """
+        with SharedText([text, json.dumps(code_blocks)]) as shared:
+            ref, code_blocks_ref = shared.refs
+            endpoints = self.pool.submit(run_extractor, 'detailed_endpoints', ref, SharedJson(code_blocks_ref))
+            auth_info = self.pool.submit(run_extractor, 'auth_info', ref)
+            hierarchy = self.pool.submit(run_extractor, 'hierarchy', ref, platform)
+            # base URL只看文本，不需要端点
+            base_url = self.pool.submit(run_extractor, 'base_url', ref, [], platform)
+            # 工作流需要端点
+            endpoints = endpoints.result()
+            with SharedText([json.dumps([endpoint.to_dict() for endpoint in endpoints])]) as shared_endpoints:
+                endpoints_ref, = shared_endpoints.refs
+                workflow = self.pool.submit(run_extractor, 'workflow', ref, SharedJson(endpoints_ref), platform)
+                return endpoints, auth_info.result(), hierarchy.result(), workflow.result(), base_url.result()
+
+    @traced('doc_parser.extract_code_blocks')
+    def _extract_code_blocks(self, soup: 'BeautifulSoup') -> List[str]:
         """Extract code blocks from documentation"""
         code_blocks = []
 
@@ -97,85 +312,88 @@ class PlatformDocParser:
 
         return code_blocks
 
+    @traced('doc_parser.extract_detailed_endpoints')
     def _extract_detailed_endpoints(
             self,
             text: str,
             code_blocks: List[str],
-            soup: BeautifulSoup
-    ) -> List[Dict]:
+            soup: Optional['BeautifulSoup'] = None
+    ) -> List[Endpoint]:
         """Extract detailed API endpoints with methods, paths, and descriptions"""
-        endpoints = []
-        seen = set()
-
         # Combine text and code blocks for analysis
         content = text + '\n' + '\n'.join(code_blocks)
 
-        # Enhanced patterns for endpoint detection
-        patterns = [
-            # Standard REST format: POST /v1/campaigns
-            r'(POST|GET|PUT|DELETE|PATCH)\s+(/[\w\-/{}:]+)',
-            # URL format: https://adsapi.snapchat.com/v1/campaigns
-            r'https?://[\w\-.]+(/v\d+/[\w\-/{}:]+)',
-            # Path only: /adaccounts/{id}/campaigns
-            r'(/adaccounts/[{\w\-}]+/[\w\-/{}:]+)',
-            r'(/campaigns/[{\w\-}]+/[\w\-/{}:]+)',
-            r'(/media/[{\w\-}]+/[\w\-/{}:]+)',
-            r'(/creatives)',
-            r'(/adsquads/[{\w\-}]+/[\w\-/{}:]+)'
-        ]
-
-        for pattern in patterns:
-            matches = re.finditer(pattern, content, re.IGNORECASE | re.MULTILINE)
-            for match in matches:
-                if isinstance(match.groups(), tuple) and len(match.groups()) >= 2:
-                    method = match.group(1).upper()
-                    path = match.group(2)
-                elif isinstance(match.groups(), tuple) and len(match.groups()) == 1:
-                    path = match.group(1)
-                    # Infer method from context
-                    method = self._infer_http_method(path, content)
+        matches = []
+        for pattern in self.ENDPOINT_PATTERNS:
+            for match in re.finditer(pattern, content, re.IGNORECASE | re.MULTILINE):
+                if len(match.groups()) >= 2:
+                    matches.append((match.group(1).upper(), match.group(2)))
                 else:
-                    continue
+                    matches.append((None, match.group(1)))
+
+        return self._build_endpoints(
+            matches,
+            lambda path: self._infer_http_method(path, content),
+            lambda path: self._extract_endpoint_description(path, soup, text)
+        )
 
-                # Clean path
-                path = path.strip()
+    def _build_endpoints(
+            self,
+            matches: Iterable[Tuple[Optional[str], str]],
+            infer_method: Callable[[str], str],
+            describe: Callable[[str], str]
+    ) -> List[Endpoint]:
+        """
+        Endpoints from the (method, path) pattern matches, in pattern order
 
-                # Create unique key
-                key = f"{method}:{path}"
-                if key in seen:
-                    continue
-                seen.add(key)
+        Args:
+            matches: Method (None = infer from context) and path of each match
+            infer_method: Infers the method of a path
+            describe: Description of a path
+        """
+        endpoints = []
+        seen = set()
 
-                # Extract description
-                description = self._extract_endpoint_description(path, soup, text)
+        for method, path in matches:
+            if method is None:
+                # Infer method from context
+                method = infer_method(path)
 
-                # Determine resource type
-                resource_type = self._determine_resource_type(path)
+            # Clean path
+            path = path.strip()
 
-                endpoint_info = {
-                    'method': method,
-                    'path': path,
-                    'description': description,
-                    'resource_type': resource_type,
-                    'requires_parent': '{' in path or '/' in path[1:]  # Has path params
-                }
+            # Create unique key
+            key = f"{method}:{path}"
+            if key in seen:
+                continue
+            seen.add(key)
 
-                endpoints.append(endpoint_info)
+            endpoints.append(Endpoint(
+                method=method,
+                path=path,
+                description=describe(path),
+                resource_type=self._determine_resource_type(path),
+                requires_parent='{' in path or '/' in path[1:]  # Has path params
+            ))
 
         # Sort by typical workflow order
-        priority_order = ['campaign', 'squad', 'media', 'creative', 'ad']
+        priority_order = ['campaign', 'ad_squad', 'media', 'creative', 'ad']
         endpoints.sort(key=lambda x: self._endpoint_priority(x, priority_order))
 
         return endpoints[:30]  # Limit to 30 most relevant endpoints
 
     def _infer_http_method(self, path: str, context: str) -> str:
         """Infer HTTP method from path and context"""
+        # Look for method mentions near the path in context
+        path_index = context.lower().find(path.lower())
+        nearby_text = context[max(0, path_index - 100):path_index + 100].lower() if path_index != -1 else None
+        return self._method_from_nearby(path, nearby_text)
+
+    def _method_from_nearby(self, path: str, nearby_text: Optional[str]) -> str:
+        """Method named near the first mention of a path, else from the path itself"""
         path_lower = path.lower()
 
-        # Look for method mentions near the path in context
-        path_index = context.lower().find(path_lower)
-        if path_index != -1:
-            nearby_text = context[max(0, path_index - 100):path_index + 100].lower()
+        if nearby_text is not None:
             for method in ['post', 'get', 'put', 'delete', 'patch']:
                 if method in nearby_text:
                     return method.upper()
@@ -193,7 +411,7 @@ class PlatformDocParser:
     def _extract_endpoint_description(
             self,
             path: str,
-            soup: BeautifulSoup,
+            soup: Optional['BeautifulSoup'],
             text: str
     ) -> str:
         """Extract description for an endpoint"""
@@ -204,32 +422,35 @@ class PlatformDocParser:
         for i, line in enumerate(lines):
             if path_lower in line.lower():
                 # Look at surrounding lines
-                context_lines = lines[max(0, i - 2):min(len(lines), i + 3)]
-                description = ' '.join(context_lines).strip()
-                if len(description) > 200:
-                    description = description[:200] + '...'
-                return description
+                return self._description_from_lines(path, lines[max(0, i - 2):min(len(lines), i + 3)])
+
+        return self._description_from_lines(path, None)
 
-        return f"API endpoint: {path}"
+    def _description_from_lines(self, path: str, context_lines: Optional[List[str]]) -> str:
+        """Description from the lines around the first line mentioning a path"""
+        if context_lines is None:
+            return f"API endpoint: {path}"
+        description = ' '.join(context_lines).strip()
+        if len(description) > 200:
+            description = description[:200] + '...'
+        return description
 
     def _determine_resource_type(self, path: str) -> str:
-        """Determine the resource type from path"""
-        path_lower = path.lower()
+        """
+        Determine the resource type from path
 
-        if 'campaign' in path_lower:
-            return 'campaign'
-        elif 'squad' in path_lower or 'adgroup' in path_lower:
-            return 'ad_squad'
-        elif 'media' in path_lower:
-            return 'media'
-        elif 'creative' in path_lower:
-            return 'creative'
-        elif path_lower.endswith('/ads') or '/ads/' in path_lower:
-            return 'ad'
+        The last literal segment naming a resource wins:
+        /campaigns/{id}/adsquads -> ad_squad, /media/{id}/upload -> media
+        """
+        for segment in reversed(split_path(path)):
+            if not is_param(segment):
+                resource_type = segment_resource_type(segment)
+                if resource_type != 'unknown':
+                    return resource_type
 
         return 'unknown'
 
-    def _endpoint_priority(self, endpoint: Dict, priority_order: List[str]) -> int:
+    def _endpoint_priority(self, endpoint: Endpoint, priority_order: List[str]) -> int:
         """Calculate priority for sorting endpoints"""
         resource_type = endpoint.get('resource_type', 'unknown')
         try:
@@ -237,45 +458,49 @@ class PlatformDocParser:
         except ValueError:
             return len(priority_order)
 
-    def _extract_auth_info(self, text: str) -> Dict:
+    @traced('doc_parser.extract_auth_info')
+    def _extract_auth_info(self, text: str) -> AuthInfo:
         """Extract detailed authentication information"""
-        auth_info = {
-            'type': 'oauth2',
-            'methods': [],
-            'token_location': 'header',
-            'header_name': 'Authorization',
-            'header_format': 'Bearer {token}'
-        }
-
         text_lower = text.lower()
+        keywords = {k for k in self.OAUTH_KEYWORDS + self.API_KEY_KEYWORDS if k in text_lower}
+        headers = {i for i, (pattern, _, _) in enumerate(self.AUTH_HEADER_PATTERNS) if re.search(pattern, text_lower)}
+        return self._auth_from(keywords, headers)
+
+    def _auth_from(self, keywords: Set[str], headers: Set[int]) -> AuthInfo:
+        """
+        AuthInfo from what the text mentions
+
+        Args:
+            keywords: OAUTH_KEYWORDS / API_KEY_KEYWORDS found in the text
+            headers: Indexes of the AUTH_HEADER_PATTERNS found in the text
+        """
+        auth_info = AuthInfo()
 
         # Detect OAuth
-        if 'oauth' in text_lower or 'access token' in text_lower or 'bearer' in text_lower:
-            auth_info['type'] = 'oauth2'
-            auth_info['methods'].append('Bearer Token')
+        if keywords.intersection(self.OAUTH_KEYWORDS):
+            auth_info.type = 'oauth2'
+            auth_info.methods.append('Bearer Token')
 
         # Detect API Key
-        if 'api key' in text_lower or 'api_key' in text_lower:
-            auth_info['methods'].append('API Key')
+        if keywords.intersection(self.API_KEY_KEYWORDS):
+            auth_info.methods.append('API Key')
 
         # Extract header information
-        header_patterns = [
-            (r'authorization:\s*bearer\s+', 'Authorization', 'Bearer {token}'),
-            (r'x-api-key', 'X-API-Key', '{token}'),
-        ]
-
-        for pattern, header_name, format_str in header_patterns:
-            if re.search(pattern, text_lower):
-                auth_info['header_name'] = header_name
-                auth_info['header_format'] = format_str
-                break
+        if headers:
+            _, auth_info.header_name, auth_info.header_format = self.AUTH_HEADER_PATTERNS[min(headers)]
 
         return auth_info
 
+    @traced('doc_parser.extract_hierarchy')
     def _extract_hierarchy(self, text: str, platform: str) -> List[str]:
         """Extract entity hierarchy with better detection"""
         text_lower = text.lower()
+        return self._hierarchy_from(
+            {k for names, _ in self.HIERARCHY_KEYWORDS for k in names if k in text_lower}, platform
+        )
 
+    def _hierarchy_from(self, keywords: Set[str], platform: str) -> List[str]:
+        """Hierarchy from the HIERARCHY_KEYWORDS found in the text"""
         # Platform-specific hierarchies
         known_hierarchies = {
             'snapchat': ['campaign', 'ad_squad', 'ad'],
@@ -286,24 +511,24 @@ class PlatformDocParser:
         }
 
         # Try to detect from text
-        if 'ad squad' in text_lower or 'adsquad' in text_lower:
-            return ['campaign', 'ad_squad', 'ad']
-        elif 'ad group' in text_lower or 'adgroup' in text_lower:
-            return ['campaign', 'ad_group', 'ad']
-        elif 'ad set' in text_lower or 'adset' in text_lower:
-            return ['campaign', 'ad_set', 'ad']
+        for names, hierarchy in self.HIERARCHY_KEYWORDS:
+            if keywords.intersection(names):
+                return list(hierarchy)
 
         # Return known hierarchy or default
         return known_hierarchies.get(platform.lower(), ['campaign', 'ad_group', 'ad'])
 
-    def _extract_schemas(self, soup: BeautifulSoup, text: str) -> Dict:
+    @traced('doc_parser.extract_schemas')
+    def _extract_schemas(self, soup: 'BeautifulSoup', text: str) -> Dict:
         """Extract request/response schemas"""
+        return self._schemas_from_blocks([block.get_text() for block in soup.find_all(['code', 'pre'])])
+
+    def _schemas_from_blocks(self, block_texts: List[str]) -> Dict:
+        """Schemas from the text of the code / pre elements"""
         schemas = {}
 
         # Look for JSON examples in code blocks
-        code_blocks = soup.find_all(['code', 'pre'])
-        for block in code_blocks:
-            code_text = block.get_text()
+        for code_text in block_texts:
             if '{' in code_text and '}' in code_text:
                 try:
                     # Try to parse as JSON
@@ -320,27 +545,33 @@ class PlatformDocParser:
 
         return schemas
 
-    def _extract_workflow(self, text: str, endpoints: List[Dict], platform: str) -> Dict:
+    @traced('doc_parser.extract_workflow')
+    def _extract_workflow(self, text: str, endpoints: List[Endpoint], platform: str) -> Workflow:
         """Extract workflow information and dependencies"""
-        workflow = {
-            'steps': [],
-            'dependencies': {},
-            'notes': []
-        }
-
-        # Analyze text for workflow clues
         text_lower = text.lower()
 
-        # Common workflow patterns
-        if 'first' in text_lower and 'campaign' in text_lower:
-            workflow['notes'].append('Create campaign first')
-
+        sentences = []
         if 'before' in text_lower or 'after' in text_lower:
             # Extract sentences with workflow information
-            sentences = text.split('.')
-            for sentence in sentences:
-                if 'before' in sentence.lower() or 'after' in sentence.lower():
-                    workflow['notes'].append(sentence.strip())
+            sentences = [s for s in text.split('.') if 'before' in s.lower() or 'after' in s.lower()]
+        return self._workflow_from('first' in text_lower and 'campaign' in text_lower, sentences, endpoints)
+
+    def _workflow_from(self, campaign_first: bool, sentences: List[str], endpoints: List[Endpoint]) -> Workflow:
+        """
+        Workflow from the text clues and the endpoints
+
+        Args:
+            campaign_first: The text mentions 'first' and 'campaign'
+            sentences: Sentences mentioning 'before' or 'after', in order
+            endpoints: Extracted endpoints
+        """
+        workflow = Workflow()
+        endpoints = [ep if isinstance(ep, Endpoint) else Endpoint.from_dict(ep) for ep in endpoints]
+
+        # Common workflow patterns
+        if campaign_first:
+            workflow.notes.append('Create campaign first')
+        workflow.notes.extend(sentence.strip() for sentence in sentences)
 
         # Infer workflow from endpoints
         resource_order = []
@@ -349,30 +580,30 @@ class PlatformDocParser:
             if resource_type and resource_type not in resource_order:
                 resource_order.append(resource_type)
 
-        workflow['steps'] = resource_order
+        workflow.steps = resource_order
 
-        # Build dependency map from endpoints
+        # Build dependency map from the parent parameters of the endpoint paths
+        index = EndpointIndex(endpoints)
         for endpoint in endpoints:
-            if endpoint.get('requires_parent'):
-                resource = endpoint.get('resource_type')
-                path = endpoint.get('path', '')
-
-                # Detect parent dependencies from path
-                if '{campaign' in path.lower():
-                    workflow['dependencies'][resource] = workflow['dependencies'].get(resource, []) + ['campaign']
-                if '{squad' in path.lower() or '{adgroup' in path.lower():
-                    workflow['dependencies'][resource] = workflow['dependencies'].get(resource, []) + ['ad_squad']
-                if '{media' in path.lower():
-                    workflow['dependencies'][resource] = workflow['dependencies'].get(resource, []) + ['media']
+            if endpoint.requires_parent:
+                resource = endpoint.resource_type
+                for _, parent in index.parent_params(endpoint.path, endpoint.method):
+                    dependencies = workflow.dependencies.setdefault(resource, [])
+                    if parent not in ('unknown', resource) and parent not in dependencies:
+                        dependencies.append(parent)
+                if not workflow.dependencies.get(resource):
+                    workflow.dependencies.pop(resource, None)
 
         return workflow
 
-    def _extract_base_url(self, text: str, endpoints: List[Dict], platform: str) -> str:
+    @traced('doc_parser.extract_base_url')
+    def _extract_base_url(self, text: str, endpoints: List[Endpoint], platform: str) -> str:
         """Extract base URL from documentation"""
         # Look for base URL in text
-        base_url_pattern = r'https?://[\w\-.]+\.com/v\d+'
-        matches = re.findall(base_url_pattern, text)
+        return self._base_url_from(re.findall(self.BASE_URL_PATTERN, text), platform)
 
+    def _base_url_from(self, matches: List[str], platform: str) -> str:
+        """Most common BASE_URL_PATTERN match, else the platform's known base URL"""
         if matches:
             # Return most common base URL
             from collections import Counter
@@ -389,7 +620,8 @@ class PlatformDocParser:
 
         return known_base_urls.get(platform.lower(), f'https://api.{platform}.com/v1')
 
-    def get_api_info(self, url: str, platform: str) -> Dict:
+    @traced('doc_parser.get_api_info')
+    def get_api_info(self, url: str, platform: str) -> ApiInfo:
         """
         Main method to fetch and parse comprehensive API documentation
 
@@ -400,17 +632,55 @@ class PlatformDocParser:
         Returns:
             Comprehensive API information
         """
-        print(f"Fetching documentation from: {url}")
-        html_content = self.fetch_documentation(url)
+        api_info = self._cached_api_info(url, platform)
+        if api_info is None:
+            if self.streaming:
+                print(f"Fetching and parsing documentation from: {url}")
+                api_info = self._stream_api_info(url, platform)
+            else:
+                print(f"Fetching documentation from: {url}")
+                html_content = self.fetch_documentation(url)
+
+                print(f"Parsing comprehensive API structure for {platform}...")
+                api_info = self.parse_api_structure(html_content, platform)
+            if self.cache_ttl > 0:
+                with self._cache_lock:
+                    self._api_info_cache[(url, platform)] = (time.time(), api_info.to_json())
+
+        print(f"✓ Found {len(api_info.endpoints)} endpoints")
+        print(f"✓ Detected auth type: {api_info.authentication.type}")
+        print(f"✓ Entity hierarchy: {' -> '.join(api_info.hierarchy)}")
+        print(f"✓ Base URL: {api_info.base_url}")
+        if api_info.workflow.steps:
+            print(f"✓ Workflow steps: {' -> '.join(api_info.workflow.steps)}")
 
-        print(f"Parsing comprehensive API structure for {platform}...")
-        api_info = self.parse_api_structure(html_content, platform)
+        return api_info
 
-        print(f"✓ Found {len(api_info['endpoints'])} endpoints")
-        print(f"✓ Detected auth type: {api_info['authentication']['type']}")
-        print(f"✓ Entity hierarchy: {' -> '.join(api_info['hierarchy'])}")
-        print(f"✓ Base URL: {api_info['base_url']}")
-        if api_info['workflow']['steps']:
-            print(f"✓ Workflow steps: {' -> '.join(api_info['workflow']['steps'])}")
+    def _stream_api_info(self, url: str, platform: str) -> ApiInfo:
+        """Download and parse documentation at the same time (parse_stream)"""
+        try:
+            response = self.session.get(url, timeout=30, stream=True)
+            response.raise_for_status()
+        except Exception as e:
+            raise Exception(f"Failed to fetch documentation from {url}: {str(e)}")
 
-        return api_info
+        # 只使用响应头中明确的字符集，否则由lxml按 <meta charset> 检测
+        encoding = response.encoding if 'charset=' in response.headers.get('Content-Type', '').lower() else None
+        with response:
+            try:
+                return self.parse_stream(response.iter_content(STREAM_CHUNK_SIZE), platform, encoding)
+            except OSError as e:
+                raise Exception(f"Failed to fetch documentation from {url}: {str(e)}")
+
+    def _cached_api_info(self, url: str, platform: str) -> Optional[ApiInfo]:
+        """Parsed documentation from the cache, if cache_ttl allows"""
+        if self.cache_ttl <= 0:
+            return None
+        with self._cache_lock:
+            cached = self._api_info_cache.get((url, platform))
+        if cached is None or cached[0] <= time.time() - self.cache_ttl:
+            CACHE_REQUESTS.labels('api_info', 'miss').inc()
+            return None
+        CACHE_REQUESTS.labels('api_info', 'hit').inc()
+        print(f"  ✓ 使用缓存的解析结果 ({int(time.time() - cached[0])}s 前解析)")
+        return ApiInfo.from_json(cached[1])
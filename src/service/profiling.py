@@ -0,0 +1,190 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Profiling - 代码生成各阶段的耗时分析 (python src/main.py --profile)
+每个阶段记录墙钟时间和CPU时间，两者之差是等待网络 (下载文档、LLM API) 的时间:
+
+- Stage 0 fetch / parse: 下载文档 / 解析文档
+- Stage 1-3: LLM生成 (等待API vs 本地处理)
+- Save: 写文件和更新manifest
+
+阶段耗时来自已有的tracing span (doc_parser.* / llm.stage* / save)，
+StageProfiler 作为span导出器收集它们，同时转发给原来的导出器 (TRACE_FILE)。
+
+--profile-dir 额外输出:
+- stages.json         各阶段耗时，便于比较解析器或提示修改前后的差异
+- profile.pstats      cProfile结果 (python -m pstats / snakeviz)
+- stacks.collapsed    采样得到的调用栈，可直接交给 flamegraph.pl / speedscope
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from src.runtime import tracing
+
+# span名称 -> 报告中的阶段名称 (按执行顺序)
+STAGES = {
+    'doc_parser.fetch_documentation': 'Stage 0 fetch',
+    'doc_parser.parse_api_structure': 'Stage 0 parse',
+    'doc_parser.parse_pages': 'Stage 0 parse',
+    # DOC_PARSER_STREAMING: 下载和解析同时进行，等待时间是下载
+    'doc_parser.parse_stream': 'Stage 0 stream',
+    'llm.stage1': 'Stage 1',
+    'llm.stage2': 'Stage 2',
+    'llm.stage3': 'Stage 3',
+    'save': 'Save',
+}
+
+
+class StageProfiler:
+    """Span exporter that records wall and CPU time of the generation stages"""
+
+    def __init__(self, forward=None):
+        """
+        Args:
+            forward: Exporter that also receives every span (e.g. TRACE_FILE)
+        """
+        self.forward = forward
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def export(self, span: tracing.Span):
+        stage = STAGES.get(span.name)
+        if stage is not None:
+            with self._lock:
+                timing = self.timings.setdefault(stage, {'wall_ms': 0.0, 'cpu_ms': 0.0, 'calls': 0})
+                timing['wall_ms'] += span.duration_ms
+                timing['cpu_ms'] += span.cpu_ms
+                timing['calls'] += 1
+        if self.forward is not None:
+            self.forward.export(span)
+
+    def report(self) -> List[Dict]:
+        """Timings per stage in execution order; wait_ms = wall_ms - cpu_ms"""
+        rows = []
+        for stage in dict.fromkeys(STAGES.values()):
+            timing = self.timings.get(stage)
+            if timing is None:
+                continue
+            rows.append({
+                'stage': stage,
+                'wall_ms': round(timing['wall_ms'], 1),
+                'cpu_ms': round(timing['cpu_ms'], 1),
+                'wait_ms': round(max(timing['wall_ms'] - timing['cpu_ms'], 0.0), 1),
+                'calls': timing['calls'],
+            })
+        return rows
+
+    def format_report(self) -> str:
+        lines = [f"{'Stage':<16}{'wall ms':>12}{'cpu ms':>12}{'wait ms':>12}"]
+        total_wall = total_cpu = 0.0
+        for row in self.report():
+            lines.append(f"{row['stage']:<16}{row['wall_ms']:>12.1f}{row['cpu_ms']:>12.1f}{row['wait_ms']:>12.1f}")
+            total_wall += row['wall_ms']
+            total_cpu += row['cpu_ms']
+        lines.append(f"{'Total':<16}{total_wall:>12.1f}{total_cpu:>12.1f}{max(total_wall - total_cpu, 0.0):>12.1f}")
+        return '\n'.join(lines)
+
+
+class StackSampler:
+    """Samples the call stack of one thread into flamegraph collapsed format"""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        """
+        Args:
+            thread_id: Thread to sample (default: the calling thread)
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def write(self, path: str):
+        """One 'frame;frame;frame count' line per distinct stack"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class GenerationProfile:
+    """Profiles one code generation run; use as a context manager"""
+
+    def __init__(self, output_dir: Optional[str] = None):
+        """
+        Args:
+            output_dir: Also write stages.json, profile.pstats and
+                        stacks.collapsed to this directory
+        """
+        self.output_dir = output_dir
+        self.stages = StageProfiler()
+        self._previous = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._start = 0.0
+
+    def __enter__(self) -> 'GenerationProfile':
+        self._previous = tracing.get_exporter()
+        self.stages.forward = self._previous
+        tracing.configure(self.stages)
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._sampler = StackSampler()
+            self._sampler.start()
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._sampler.stop()
+        tracing.configure(self._previous)
+
+        print(f"\n{'=' * 70}")
+        print(f"Profile ({elapsed:.2f}s)")
+        print(f"{'=' * 70}")
+        print(self.stages.format_report())
+
+        if self.output_dir:
+            stages_path = os.path.join(self.output_dir, 'stages.json')
+            with open(stages_path, 'w', encoding='utf-8') as f:
+                json.dump({'total_s': round(elapsed, 3), 'stages': self.stages.report()}, f, indent=2, ensure_ascii=False)
+            pstats_path = os.path.join(self.output_dir, 'profile.pstats')
+            self._cprofile.dump_stats(pstats_path)
+            stacks_path = os.path.join(self.output_dir, 'stacks.collapsed')
+            self._sampler.write(stacks_path)
+            print(f"\n✓ 阶段耗时: {stages_path}")
+            print(f"✓ cProfile: {pstats_path}  (python -m pstats {pstats_path})")
+            print(f"✓ 调用栈: {stacks_path}  (flamegraph.pl {stacks_path} > flame.svg)")
+        return False
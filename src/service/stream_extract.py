@@ -0,0 +1,216 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Stream Extract - 边下载边运行文档提取器
+PlatformDocParser.parse_stream 把 HTMLTextStream 输出的每个文本片段交给 StreamExtractor，
+端点、认证、层级、工作流和base URL的提取器逐片段扫描，不再拼接完整的文本。
+
+文本 = 片段用 '\\n' 连接，端点在 文本 + '\\n' + 代码块 上匹配，和 parse_api_structure 一致。
+片段之间只保留有限的状态:
+- 上一个片段末尾的 CARRY_CHARS 个字符 (跨片段的 "POST\\n/v1/..." 和 "Authorization:\\nBearer")
+- 每个端点正则上次匹配的结束位置，保证和整段文本上的 finditer 得到相同的匹配
+- 每个端点路径第一次被匹配时的上下文 (前后100个字符和前后两行)，用于推断方法和描述
+- 最近两行文本和当前句子 (工作流说明按 '.' 分句)
+- raw_text 需要的前 RAW_TEXT_CHARS 个字符
+
+和 parse_api_structure 的区别: 推断方法和描述时使用路径第一次被端点正则匹配到的位置，
+而不是路径字符串在全文中第一次出现的位置 (例如只作为更长路径的一部分出现时)。
+"""
+import re
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from .api_model import AuthInfo, Endpoint, Workflow
+
+# 跨片段的匹配最多需要上一个片段末尾的这么多字符 (方法名、'authorization:'、路径前的100个字符)
+CARRY_CHARS = 128
+# 推断方法时路径前后的字符数 (PlatformDocParser._infer_http_method)
+NEARBY_CHARS = 100
+# 描述使用路径所在行前后的行数 (PlatformDocParser._extract_endpoint_description)
+CONTEXT_LINES = 2
+RAW_TEXT_CHARS = 10000
+
+
+class _Mention:
+    """Context of the first match of an endpoint path"""
+
+    __slots__ = ('position', 'nearby', 'need_chars', 'lines', 'need_lines')
+
+    def __init__(self, position: int, before: str, after: str):
+        self.position = position
+        self.nearby = before + after[:NEARBY_CHARS]
+        self.need_chars = NEARBY_CHARS - min(len(after), NEARBY_CHARS)
+        # 所在行及前后的行；None = 路径在代码块中，不在文本中
+        self.lines: Optional[List[str]] = None
+        self.need_lines = 0
+
+
+class StreamExtractor:
+    """Run the PlatformDocParser text extractors one text segment at a time"""
+
+    def __init__(self, parser, platform: str):
+        """
+        Args:
+            parser: PlatformDocParser providing the patterns and the final assembly
+            platform: Platform name
+        """
+        self.parser = parser
+        self.platform = platform
+        self._patterns = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in parser.ENDPOINT_PATTERNS]
+        self._headers = [re.compile(p) for p, _, _ in parser.AUTH_HEADER_PATTERNS]
+        self._base_url = re.compile(parser.BASE_URL_PATTERN)
+        self._keywords = (parser.OAUTH_KEYWORDS + parser.API_KEY_KEYWORDS
+                          + tuple(k for names, _ in parser.HIERARCHY_KEYWORDS for k in names)
+                          + ('first', 'campaign'))
+
+        # 已扫描内容的长度，和上一段末尾的字符
+        self._length = 0
+        self._carry = ''
+        # 每个端点正则上次匹配的结束位置和 (method, path) 匹配
+        self._last_end = [0] * len(self._patterns)
+        self._matches: List[List[Tuple[Optional[str], str]]] = [[] for _ in self._patterns]
+        # path.lower() -> 第一次匹配的上下文
+        self._mentions: Dict[str, _Mention] = {}
+        self._pending: List[_Mention] = []
+        self._recent_lines: Deque[str] = deque(maxlen=CONTEXT_LINES)
+
+        self._found: Set[str] = set()
+        self._found_headers: Set[int] = set()
+        self._base_urls: List[str] = []
+        self._sentence = ''
+        self._sentences: List[str] = []
+        self._raw_text: List[str] = []
+        self._raw_length = 0
+        self._segments = 0
+
+    def feed(self, segment: str):
+        """Scan the next text segment"""
+        piece = segment if self._segments == 0 else '\n' + segment
+        self._segments += 1
+
+        if self._raw_length < RAW_TEXT_CHARS:
+            self._raw_text.append(piece[:RAW_TEXT_CHARS - self._raw_length])
+            self._raw_length += len(self._raw_text[-1])
+
+        lower = segment.lower()
+        self._found.update(k for k in self._keywords if k in lower)
+        self._base_urls.extend(self._base_url.findall(segment))
+        self._split_sentences(piece)
+        self._scan(piece, segment)
+
+    def finish(self, code_blocks: List[str]) -> Tuple[List[Endpoint], AuthInfo, List[str], Workflow, str, str]:
+        """
+        Scan the code blocks and assemble the extractor results
+
+        Returns:
+            (endpoints, auth_info, hierarchy, workflow, base_url, raw_text)
+        """
+        # 端点在 文本 + '\n' + 代码块 上匹配
+        self._scan('\n' + '\n'.join(code_blocks), None)
+        self._pending = []
+        if 'before' in self._sentence.lower() or 'after' in self._sentence.lower():
+            self._sentences.append(self._sentence)
+        self._sentence = ''
+
+        parser = self.parser
+        endpoints = parser._build_endpoints(
+            [match for matches in self._matches for match in matches],
+            lambda path: parser._method_from_nearby(path, self._mentions[path.lower()].nearby),
+            lambda path: parser._description_from_lines(path, self._mentions[path.lower()].lines)
+        )
+        return (
+            endpoints,
+            parser._auth_from(self._found, self._found_headers),
+            parser._hierarchy_from(self._found, self.platform),
+            parser._workflow_from('first' in self._found and 'campaign' in self._found, self._sentences, endpoints),
+            parser._base_url_from(self._base_urls, self.platform),
+            ''.join(self._raw_text),
+        )
+
+    def _split_sentences(self, piece: str):
+        # 工作流说明: 文本按 '.' 分句，只保留当前未结束的句子
+        parts = piece.split('.')
+        self._sentence += parts[0]
+        for part in parts[1:]:
+            sentence_lower = self._sentence.lower()
+            if 'before' in sentence_lower or 'after' in sentence_lower:
+                self._sentences.append(self._sentence)
+            self._sentence = part
+
+    def _scan(self, piece: str, segment: Optional[str]):
+        """Match the endpoint patterns on the carry-over plus a new piece of content"""
+        window = self._carry + piece
+        window_lower = window.lower()
+        start = self._length - len(self._carry)
+        piece_start = len(self._carry)
+        self._extend_pending(window_lower[piece_start:], segment)
+
+        if segment is not None:
+            # 认证请求头只在文本中查找，可以跨片段 ("Authorization:" / "Bearer")
+            for index, header in enumerate(self._headers):
+                if index not in self._found_headers and header.search(window_lower):
+                    self._found_headers.add(index)
+
+        for index, pattern in enumerate(self._patterns):
+            position = max(0, self._last_end[index] - start)
+            while True:
+                match = pattern.search(window, position)
+                if match is None:
+                    break
+                if len(match.groups()) >= 2:
+                    method, group = match.group(1).upper(), 2
+                else:
+                    method, group = None, 1
+                self._matches[index].append((method, match.group(group)))
+                self._mention(match.group(group).lower(), start + match.start(group), match.start(group),
+                              window_lower, piece_start + len(piece) - len(segment or ''), segment)
+                self._last_end[index] = start + match.end()
+                position = match.end() if match.end() > match.start() else match.end() + 1
+
+        if segment is not None:
+            self._recent_lines.extend(segment.split('\n')[-CONTEXT_LINES:])
+        self._length += len(piece)
+        self._carry = window[-CARRY_CHARS:]
+
+    def _mention(self, path: str, position: int, local: int, window_lower: str, segment_start: int,
+                 segment: Optional[str]):
+        """Keep the context of the earliest match of a path"""
+        mention = self._mentions.get(path)
+        if mention is not None and mention.position <= position:
+            return
+
+        mention = _Mention(position, window_lower[max(0, local - NEARBY_CHARS):local],
+                           window_lower[local:local + NEARBY_CHARS])
+        if segment is not None:
+            # 路径在片段中的行号
+            lines = segment.split('\n')
+            line = segment.count('\n', 0, max(0, local - segment_start))
+            before = lines[max(0, line - CONTEXT_LINES):line]
+            if len(before) < CONTEXT_LINES:
+                before = list(self._recent_lines)[len(before) - CONTEXT_LINES:] + before
+            mention.lines = before + lines[line:line + CONTEXT_LINES + 1]
+            mention.need_lines = CONTEXT_LINES + 1 - len(lines[line:line + CONTEXT_LINES + 1])
+
+        self._mentions[path] = mention
+        if mention.need_chars or mention.need_lines:
+            self._pending.append(mention)
+
+    def _extend_pending(self, piece_lower: str, segment: Optional[str]):
+        """Give mentions waiting for following context the start of a new piece"""
+        if not self._pending:
+            return
+        lines = segment.split('\n') if segment is not None else []
+        waiting = []
+        for mention in self._pending:
+            if mention.need_chars:
+                added = piece_lower[:mention.need_chars]
+                mention.nearby += added
+                mention.need_chars -= len(added)
+            if mention.need_lines and segment is not None:
+                added_lines = lines[:mention.need_lines]
+                mention.lines.extend(added_lines)
+                mention.need_lines -= len(added_lines)
+            if mention.need_chars or (mention.need_lines and segment is not None):
+                waiting.append(mention)
+        self._pending = waiting
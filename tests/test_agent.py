@@ -5,11 +5,22 @@
 """
 Test suite for Code Agent
 Tests API client generation with real OPENAI_API_KEY
+(TestFakeLLM runs the same pipeline offline against benchmarks/fake_llm.py)
 """
+import importlib
+import json
 import os
+import pstats
 import sys
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import Mock
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+from http.server import ThreadingHTTPServer
+from unittest.mock import MagicMock, Mock, patch
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,6 +32,22 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from src.service.code_agent import CodeAgent
 from src.service.platform_doc_parser import PlatformDocParser
 from src.service.llm_remote import LLMRemote
+from src.service.api_model import ApiInfo, Endpoint
+from src.service.profiling import GenerationProfile
+from src.service.parse_pool import SharedJson, SharedText, read_text, run_extractor
+from src.service.html_stream import HTMLTextStream
+from src.service.function_library import ADAPT_SCORE, MOCK_ADAPT_SCORE, FunctionLibrary, LibraryFunction, function_specs, similarity
+from src.service import daemon
+from src.runtime import tracing
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks')
+
+
+def benchmark_module(name: str):
+    """Import a module of benchmarks/ (doc_parser_bench, fake_llm)"""
+    if BENCHMARKS_DIR not in sys.path:
+        sys.path.insert(0, BENCHMARKS_DIR)
+    return importlib.import_module(name)
 
 
 class TestPlatformDocParser(unittest.TestCase):
@@ -73,6 +100,100 @@ class TestPlatformDocParser(unittest.TestCase):
         print(f"✓ Extracted workflow steps: {workflow.get('steps', [])}")
 
 
+class TestDocCorpus(unittest.TestCase):
+    """The recorded benchmark corpus parses into usable API info"""
+
+    def test_corpus_documents(self):
+        doc_parser_bench = benchmark_module('doc_parser_bench')
+
+        corpus = doc_parser_bench.load_corpus()
+        self.assertEqual(sorted(corpus), ['facebook', 'pinterest', 'snapchat', 'tiktok'])
+
+        parser = PlatformDocParser()
+        api_info = parser.parse_api_structure(corpus['snapchat'], 'snapchat')
+        self.assertEqual(api_info['base_url'], 'https://adsapi.snapchat.com/v1')
+        self.assertIn('/v1/adaccounts/{ad_account_id}/campaigns', [ep['path'] for ep in api_info['endpoints']])
+        self.assertEqual(api_info['authentication']['type'], 'oauth2')
+
+        scaled = doc_parser_bench.scale_document(corpus['tiktok'], 3)
+        self.assertEqual(scaled.count('<h1>Marketing API</h1>'), 3)
+        self.assertEqual(scaled.count('<body>'), 1)
+
+    def test_parallel_parse_matches_sequential(self):
+        """The process pool mode gives the same ApiInfo as sequential parsing"""
+        doc_parser_bench = benchmark_module('doc_parser_bench')
+
+        corpus = doc_parser_bench.load_corpus()
+        pages = [corpus['snapchat'], corpus['pinterest'], corpus['tiktok']]
+        sequential = PlatformDocParser(workers=0)
+        parallel = PlatformDocParser(workers=2, parallel_min_chars=0)
+        self.addCleanup(parallel.close)
+
+        self.assertEqual(parallel.parse_api_structure(corpus['snapchat'], 'snapchat').to_dict(),
+                         sequential.parse_api_structure(corpus['snapchat'], 'snapchat').to_dict())
+        merged = parallel.parse_pages(pages, 'snapchat')
+        self.assertEqual(merged.to_dict(), sequential.parse_pages(pages, 'snapchat').to_dict())
+        # 按页面顺序合并
+        self.assertEqual(merged.code_examples[0], sequential.parse_api_structure(pages[0], 'snapchat').code_examples[0])
+        self.assertTrue(merged.raw_text.startswith(sequential.parse_page(pages[0])[0]))
+
+        # 小于阈值的文档不使用进程池
+        small = PlatformDocParser(workers=2)
+        small.parse_api_structure(corpus['tiktok'], 'tiktok')
+        self.assertIsNone(small.pool._executor)
+
+    def test_stream_parse_matches_soup(self):
+        """Streaming lxml parsing gives the same ApiInfo, however the download is chunked"""
+        doc_parser_bench = benchmark_module('doc_parser_bench')
+
+        parser = PlatformDocParser(workers=0)
+        for name, html in doc_parser_bench.load_corpus().items():
+            data = html.encode('utf-8')
+            chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+            self.assertEqual(parser.parse_stream(chunks, name).to_dict(),
+                             parser.parse_api_structure(html, name).to_dict(), name)
+
+    def test_stream_extractors_across_segments(self):
+        """Matches and context spanning text segments are found segment by segment"""
+        html = ('<html><body><h1>Campaigns</h1><p>Create the campaign first. Ads are created</p>'
+                '<p>after their ad squad.</p><span>POST</span><span>/v1/adaccounts/{id}/campaigns</span>'
+                '<p>Authorization:</p><p>Bearer token</p><ul>' + ''.join(f'<li>item {i}</li>' for i in range(40)) +
+                '</ul><p>See https://adsapi.snapchat.com/v1/media/{media_id}/upload for the upload</p>'
+                '<p>then</p><p>more</p><pre>GET /v1/campaigns/{campaign_id}/adsquads plus</pre></body></html>')
+        parser = PlatformDocParser(workers=0)
+        expected = parser.parse_api_structure(html, 'acme').to_dict()
+        for size in (1, 5, 64):
+            chunks = [html[i:i + size] for i in range(0, len(html), size)]
+            self.assertEqual(parser.parse_stream(chunks, 'acme').to_dict(), expected, size)
+        self.assertIn('POST', [ep['method'] for ep in expected['endpoints']])
+        self.assertEqual(expected['authentication']['header_name'], 'Authorization')
+        self.assertIn('Ads are created\nafter their ad squad', expected['workflow']['notes'])
+
+    def test_html_text_stream(self):
+        stream = HTMLTextStream('utf-8')
+        first = stream.feed('<html><head><title>广告</title><style>p {}</style></head><body>a<!-- x -->b'
+                            '<pre><code>POST /v1/campaigns {"name": "x"}</code></pre><p>tail')
+        # 已经完整的文本节点立即输出
+        self.assertEqual(first, ['广告', 'a', 'b', 'POST /v1/campaigns {"name": "x"}'])
+        self.assertEqual(stream.feed('</p><script>var x = 1;</script></body></html>'), ['tail'])
+        self.assertEqual(stream.close(), [])
+        # code 和 pre 各一个代码块，与 soup.select 的顺序一致
+        self.assertEqual(stream.code_blocks, ['POST /v1/campaigns {"name": "x"}'] * 2)
+        self.assertEqual(stream.block_texts, ['POST /v1/campaigns {"name": "x"}'] * 2)
+
+    def test_shared_text(self):
+        with SharedText(['广告 campaigns', '', 'adsquads']) as shared:
+            self.assertEqual([read_text(ref) for ref in shared.refs], ['广告 campaigns', '', 'adsquads'])
+
+        # 代码块以JSON传入共享内存，工作进程中解码后和直接传入列表的结果相同
+        code_blocks = ['POST /v1/adaccounts/{ad_account_id}/campaigns', 'POST /v1/campaigns/{campaign_id}/adsquads']
+        with SharedText(['Create a campaign first.', json.dumps(code_blocks)]) as shared:
+            text_ref, blocks_ref = shared.refs
+            endpoints = run_extractor('detailed_endpoints', text_ref, SharedJson(blocks_ref))
+        self.assertEqual(endpoints, PlatformDocParser(workers=0)._extract_detailed_endpoints('Create a campaign first.', code_blocks))
+        self.assertTrue(endpoints)
+
+
 class TestLLMRemote(unittest.TestCase):
     """Test LLM remote service"""
 
@@ -249,6 +370,439 @@ class TestWorkflowSystem(unittest.TestCase):
         os.remove('step_test.txt')
 
 
+class TestGenerationProfile(unittest.TestCase):
+    """Test the --profile stage timings and profile files"""
+
+    def test_stage_timings_and_files(self):
+        """Parse time is CPU time, a blocking LLM stage is wait time"""
+        parser = PlatformDocParser()
+        html = '<html><body><pre>POST /v1/adaccounts/{id}/campaigns</pre><p>Bearer token</p></body></html>'
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with GenerationProfile(tmp) as profile:
+                parser.parse_api_structure(html, 'snapchat')
+                with tracing.span('llm.stage1'):
+                    time.sleep(0.05)
+
+            rows = {row['stage']: row for row in profile.stages.report()}
+            self.assertEqual(list(rows), ['Stage 0 parse', 'Stage 1'])
+            self.assertGreaterEqual(rows['Stage 1']['wait_ms'], 40)
+            self.assertLess(rows['Stage 1']['cpu_ms'], 20)
+
+            with open(os.path.join(tmp, 'stages.json'), encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['stages'][1]['stage'], 'Stage 1')
+            stats = pstats.Stats(os.path.join(tmp, 'profile.pstats'))
+            self.assertTrue(any(name == 'parse_api_structure' for _, _, name in stats.stats))
+            with open(os.path.join(tmp, 'stacks.collapsed'), encoding='utf-8') as f:
+                self.assertIn('test_stage_timings_and_files', f.read())
+
+        # 结束后恢复原来的导出器
+        self.assertIsNone(tracing.get_exporter())
+
+
+class FakeAgent:
+    """Prints like CodeAgent and fails for platform 'broken'"""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_api_client(self, platform, docs_url, mock_auth, output_dir):
+        self.calls.append(platform)
+        print(f"Stage 0: 解析API文档")
+        print(f"✓ Stage 1 完成", end='')
+        print(f" (42 字符)")
+        if platform == 'broken':
+            raise Exception('LLM API call failed')
+        return os.path.join(output_dir, f'{platform}_api.py')
+
+
+class TestGenerationDaemon(unittest.TestCase):
+    """Test the warm generation daemon and its thin client"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+        self.daemon = daemon.GenerationDaemon(FakeAgent, output_root=self.root)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), daemon.make_handler(self.daemon))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.daemon.close()
+        self.tmp.cleanup()
+
+    def test_jobs_reuse_worker_agent(self):
+        """Jobs run on the worker's agent created at startup and stream their own log"""
+        out = os.path.join(self.root, 'out')
+        payload = {'platform': 'snapchat', 'docs_url': 'https://example.com', 'mock_auth': True, 'output_dir': out}
+        first = daemon.run_remote(self.url, payload, poll_interval=0.01)
+        second = daemon.run_remote(self.url, payload, poll_interval=0.01)
+
+        self.assertEqual(first['status'], 'succeeded')
+        self.assertEqual(second['output_file'], os.path.join(out, 'snapchat_api.py'))
+        self.assertEqual(self.daemon.agents[0].calls, ['snapchat', 'snapchat'])
+        job = self.daemon.get(second['id'])
+        self.assertEqual(job['log'], ['Stage 0: 解析API文档', '✓ Stage 1 完成 (42 字符)'])
+
+    def test_failure_and_validation(self):
+        job = daemon.run_remote(self.url, {'platform': 'broken', 'docs_url': 'https://example.com'}, poll_interval=0.01)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('LLM API call failed', job['error'])
+
+        with self.assertRaises(Exception):
+            daemon.run_remote(self.url, {'platform': 'snapchat'})
+
+    def test_request_validation(self):
+        """since must be a non-negative integer; output_dir must stay inside the output root"""
+        job_id = daemon._call(f'{self.url}/jobs', {'platform': 'snapchat', 'docs_url': 'https://example.com'})['job_id']
+        for since in ('abc', '-1'):
+            with self.assertRaises(urllib.error.HTTPError) as caught:
+                daemon._call(f'{self.url}/jobs/{job_id}?since={since}')
+            self.assertEqual(caught.exception.code, 400)
+
+        for output_dir in ('/etc', os.path.join(self.root, '..', 'elsewhere')):
+            with self.assertRaises(urllib.error.HTTPError) as caught:
+                daemon._call(f'{self.url}/jobs', {'platform': 'snapchat', 'docs_url': 'https://example.com',
+                                                  'output_dir': output_dir})
+            self.assertEqual(caught.exception.code, 400)
+
+        # 默认写到 output_root；相对路径按 output_root 解析
+        job = daemon.run_remote(self.url, {'platform': 'snapchat', 'docs_url': 'https://example.com'}, poll_interval=0.01)
+        self.assertEqual(job['output_file'], os.path.join(self.root, 'snapchat_api.py'))
+        job = daemon.run_remote(self.url, {'platform': 'snapchat', 'docs_url': 'https://example.com',
+                                           'output_dir': 'nested'}, poll_interval=0.01)
+        self.assertEqual(job['output_file'], os.path.join(self.root, 'nested', 'snapchat_api.py'))
+
+    def test_metrics_endpoint(self):
+        """LLM metrics recorded in the daemon are exposed on its own /metrics"""
+        from src.runtime.metrics import LLM_TOKENS
+        LLM_TOKENS.labels('stage1', 'prompt').inc(42)
+        with urllib.request.urlopen(f'{self.url}/metrics', timeout=5) as response:
+            self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+            body = response.read().decode('utf-8')
+        self.assertIn('ads_llm_tokens_total{stage="stage1",kind="prompt"}', body)
+
+    def test_one_agent_per_worker(self):
+        created = []
+        pool = daemon.GenerationDaemon(lambda: created.append(FakeAgent()) or created[-1], workers=3)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(len({id(agent) for agent in pool.agents}), 3)
+
+    def test_stdout_captured_only_while_jobs_run(self):
+        """The daemon leaves sys.stdout alone until a job runs and restores it afterwards"""
+        stdout = sys.stdout
+        self.assertNotIsInstance(stdout, daemon._ThreadLog)
+        job = daemon.run_remote(self.url, {'platform': 'snapchat', 'docs_url': 'https://example.com'}, poll_interval=0.01)
+        self.assertEqual(job['status'], 'succeeded')
+        for _ in range(100):
+            if sys.stdout is stdout:
+                break
+            time.sleep(0.01)
+        self.assertIs(sys.stdout, stdout)
+
+    def test_finished_jobs_evicted(self):
+        job = daemon.run_remote(self.url, {'platform': 'snapchat', 'docs_url': 'https://example.com'}, poll_interval=0.01)
+        self.assertIsNotNone(self.daemon.get(job['id']))
+        self.daemon.job_ttl = 0
+        self.assertIsNone(self.daemon.get(job['id']))
+
+
+class TestDocumentationCache(unittest.TestCase):
+
+    def test_cached_between_fetches(self):
+        parser = PlatformDocParser(cache_ttl=60)
+        parser._session = Mock()
+        parser._session.get.return_value = Mock(text='<html>docs</html>')
+
+        self.assertEqual(parser.fetch_documentation('https://example.com/docs'), '<html>docs</html>')
+        self.assertEqual(parser.fetch_documentation('https://example.com/docs'), '<html>docs</html>')
+        self.assertEqual(parser._session.get.call_count, 1)
+
+        uncached = PlatformDocParser()
+        uncached._session = parser._session
+        uncached.fetch_documentation('https://example.com/docs')
+        self.assertEqual(parser._session.get.call_count, 2)
+
+    def test_parsed_info_cached(self):
+        """With a cache TTL the parsed ApiInfo is reused; each call gets its own copy"""
+        parser = PlatformDocParser(cache_ttl=60)
+        parser._session = Mock()
+        parser._session.get.return_value = Mock(text='<html><body>POST /v1/adaccounts/{id}/campaigns</body></html>')
+        parser.parse_api_structure = Mock(wraps=parser.parse_api_structure)
+
+        first = parser.get_api_info('https://example.com/docs', 'snapchat')
+        second = parser.get_api_info('https://example.com/docs', 'snapchat')
+        self.assertEqual(parser.parse_api_structure.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+    def test_streaming_download(self):
+        """DOC_PARSER_STREAMING parses response chunks without keeping the page"""
+        html = '<html><body><p>Bearer token</p><pre>POST /v1/adaccounts/{id}/campaigns</pre></body></html>'
+        response = MagicMock(encoding='utf-8', headers={'Content-Type': 'text/html; charset=utf-8'})
+        response.iter_content.return_value = iter([html[:40].encode(), html[40:].encode()])
+        parser = PlatformDocParser(streaming=True)
+        parser._session = Mock()
+        parser._session.get.return_value = response
+
+        api_info = parser.get_api_info('https://example.com/docs', 'snapchat')
+        self.assertEqual(parser._session.get.call_args.kwargs['stream'], True)
+        self.assertIn('/v1/adaccounts/{id}/campaigns', [ep.path for ep in api_info.endpoints])
+        self.assertEqual(api_info.raw_text, 'Bearer token\nPOST /v1/adaccounts/{id}/campaigns')
+
+
+class TestApiModel(unittest.TestCase):
+    """Slotted ApiInfo model returned by parse_api_structure"""
+
+    def setUp(self):
+        doc_parser_bench = benchmark_module('doc_parser_bench')
+        self.api_info = PlatformDocParser().parse_api_structure(doc_parser_bench.load_corpus()['snapchat'], 'snapchat')
+
+    def test_compact(self):
+        info = self.api_info
+        self.assertIsInstance(info, ApiInfo)
+        self.assertFalse(hasattr(info, '__dict__'))
+        self.assertFalse(hasattr(info.endpoints[0], '__dict__'))
+        # 相同的method字符串是同一个对象
+        posts = [ep.method for ep in info.endpoints if ep.method == 'POST']
+        self.assertGreater(len(posts), 1)
+        self.assertTrue(all(method is posts[0] for method in posts))
+        self.assertLess(len(info.raw_text_zlib), len(info.raw_text.encode('utf-8')))
+        self.assertLessEqual(len(info.raw_text), 10000)
+
+    def test_round_trip(self):
+        info = self.api_info
+        self.assertEqual(ApiInfo.from_json(info.to_json()), info)
+        self.assertEqual(ApiInfo.from_dict(info.to_dict()), info)
+        self.assertEqual(info.to_dict()['raw_text'], info.raw_text)
+
+    def test_dict_style_access(self):
+        """Code written against the old dict result keeps working"""
+        info = self.api_info
+        self.assertEqual(info['base_url'], info.base_url)
+        self.assertEqual(info['authentication']['type'], 'oauth2')
+        self.assertEqual(info.get('missing', 'default'), 'default')
+        endpoint = Endpoint('POST', '/v1/ads')
+        self.assertEqual(endpoint.get('resource_type'), 'unknown')
+        with self.assertRaises(KeyError):
+            endpoint['missing']
+
+    def test_endpoint_index(self):
+        info = self.api_info
+        index = info.endpoint_index()
+        self.assertEqual(index.create_endpoint('ad_squad').path, '/v1/campaigns/{campaign_id}/adsquads')
+        self.assertEqual(index.create_endpoint('campaign').path, '/v1/adaccounts/{ad_account_id}/campaigns')
+        self.assertEqual(index.relative_path('/adaccounts/{ad_account_id}/media'), '/adaccounts/{ad_account_id}/media')
+        self.assertEqual(index.parent_params('/v1/adsquads/{ad_squad_id}/ads'), [('ad_squad_id', 'ad_squad')])
+        self.assertEqual(index.parent_params('https://adsapi.snapchat.com/v1/campaigns/c1/adsquads'),
+                         [('campaign_id', 'campaign')])
+        self.assertEqual(index.match('POST', 'https://adsapi.snapchat.com/v1/media/m1/upload').path,
+                         '/v1/media/{media_id}/upload')
+        self.assertIn('POST /v1/adsquads/{ad_squad_id}/ads', index.routes())
+
+    def test_workflow_dependencies(self):
+        """Resource types and parents come from path segments, not substrings of the whole path"""
+        info = self.api_info
+        squad_endpoint = info.endpoint_index().match('POST', '/v1/campaigns/c1/adsquads')
+        self.assertEqual(squad_endpoint.resource_type, 'ad_squad')
+        self.assertEqual(info.workflow.dependencies, {'ad_squad': ['campaign'], 'ad': ['ad_squad']})
+        self.assertEqual(info.workflow.steps[:2], ['campaign', 'ad_squad'])
+
+
+SNAPCHAT_PRODUCTION_CODE = '''import os
+from typing import Dict
+
+BASE_URL = "https://adsapi.snapchat.com/v1"
+SNAPCHAT_TOKEN = os.getenv("SNAPCHAT_ACCESS_TOKEN", "")
+
+
+def _post(url: str, payload: Dict) -> Dict:
+    """Stand-in for the shared runtime request"""
+    return {'url': url, 'payload': payload, 'token': SNAPCHAT_TOKEN}
+
+
+def create_campaign(account_id: str, **kwargs) -> Dict:
+    return _post(f"{BASE_URL}/adaccounts/{account_id}/campaigns", kwargs)
+
+
+def create_ad_squad(campaign_id: str, account_id: str, **kwargs) -> Dict:
+    """Create a Snapchat ad squad"""
+    return _post(f"{BASE_URL}/campaigns/{campaign_id}/adsquads", kwargs)
+
+
+def create_ad(ad_squad_id: str, account_id: str, **kwargs) -> Dict:
+    return _post(f"{BASE_URL}/adsquads/{ad_squad_id}/ads", kwargs)
+'''
+
+
+class TestFunctionLibrary(unittest.TestCase):
+    """Stage 1 functions reused across platforms"""
+
+    def setUp(self):
+        doc_parser_bench = benchmark_module('doc_parser_bench')
+        corpus = doc_parser_bench.load_corpus()
+        parser = PlatformDocParser()
+        self.api_info = {name: parser.parse_api_structure(corpus[name], name) for name in ('snapchat', 'tiktok', 'facebook')}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.library = FunctionLibrary(os.path.join(self.tmp.name, 'library.json'))
+        specs = function_specs(self.api_info['snapchat'], 'snapchat', mock_auth=False)
+        self.assertEqual(self.library.add_client('snapchat', SNAPCHAT_PRODUCTION_CODE, specs, self.api_info['snapchat']), 3)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_adapt_same_shape(self):
+        """/campaigns/{campaign_id}/adsquads -> /campaigns/{campaign_id}/ad_groups is rewritten locally"""
+        specs = function_specs(self.api_info['tiktok'], 'tiktok', mock_auth=False)
+        plan = self.library.plan(specs, 'tiktok', self.api_info['tiktok'])
+        self.assertEqual(sorted(plan.adapted), ['create_ad', 'create_ad_group', 'create_campaign'])
+        squad = plan.adapted['create_ad_group']
+        self.assertIn('def create_ad_group(campaign_id: str', squad)
+        self.assertIn('{BASE_URL}/campaigns/{campaign_id}/ad_groups', squad)
+        self.assertIn('Create a Tiktok ad group', squad)
+        self.assertIn('def create_ad(ad_group_id: str', plan.adapted['create_ad'])
+        self.assertIn('{BASE_URL}/ad_groups/{ad_group_id}/ads', plan.adapted['create_ad'])
+
+        code = plan.code()
+        self.assertIn('BASE_URL = "https://business-api.tiktok.com/open_api/v1.3"', code)
+        self.assertIn('TIKTOK_TOKEN = os.getenv("TIKTOK_ACCESS_TOKEN"', code)
+        self.assertEqual(code.count('def _post('), 1)
+        module = {}
+        exec(compile(code, 'tiktok_api.py', 'exec'), module)
+        self.assertEqual(module['create_ad_group']('c1', 'a1')['url'],
+                         'https://business-api.tiktok.com/open_api/v1.3/campaigns/c1/ad_groups')
+
+    def test_reference_different_shape(self):
+        """/act_{ad_account_id}/campaigns has another shape: the snapchat version is only a reference"""
+        specs = function_specs(self.api_info['facebook'], 'facebook', mock_auth=False)
+        campaign = next(spec for spec in specs if spec.role == 'create_campaign')
+        score, function = self.library.find(campaign)
+        self.assertLess(score, ADAPT_SCORE)
+        plan = self.library.plan(specs, 'facebook', self.api_info['facebook'])
+        self.assertNotIn('create_campaign', plan.adapted)
+        self.assertEqual(plan.references['create_campaign'], function.source)
+        # 角色和模式不同的函数不参与比较
+        self.assertIsNone(self.library.find(function_specs(self.api_info['facebook'], 'facebook', mock_auth=True)[0]))
+        self.assertNotIn('create_media', plan.adapted)
+        self.assertNotIn('create_media', plan.references)
+
+    def test_persisted_and_validated(self):
+        self.assertEqual(len(FunctionLibrary(self.library.path).functions), 3)
+        specs = function_specs(self.api_info['tiktok'], 'tiktok', mock_auth=False)
+        self.assertEqual(self.library.add_client('tiktok', 'def create_campaign(:\n', specs, self.api_info['tiktok']), 0)
+        self.assertEqual(len(FunctionLibrary(self.library.path).functions), 3)
+
+    def test_rejects_invalid_functions(self):
+        """Import errors, wrong signatures, wrong URLs and failing MOCK functions are not stored"""
+        info = self.api_info['snapchat']
+        specs = function_specs(info, 'snapchat', mock_auth=False)
+        broken = 'raise RuntimeError("import side effect")\n' + SNAPCHAT_PRODUCTION_CODE
+        self.assertEqual(self.library.add_client('snapchat', broken, specs, info), 0)
+
+        code = SNAPCHAT_PRODUCTION_CODE.replace(
+            'def create_campaign(account_id: str, **kwargs)', 'def create_campaign(account_id: str, name: str)'
+        ).replace('/adsquads/{ad_squad_id}/ads', '/adsquads/{ad_squad_id}/creatives')
+        self.assertEqual(self.library.add_client('other', code, specs, info), 1)
+        self.assertEqual([f.name for f in self.library.functions if f.platform == 'other'], ['create_ad_squad'])
+
+        mock_specs = function_specs(info, 'snapchat', mock_auth=True)
+        mock_code = (
+            'def create_campaign(account_id: str, **kwargs):\n    return {"id": "c1"}\n\n'
+            'def create_ad_squad(campaign_id: str, account_id: str, **kwargs):\n    return None\n\n'
+            'def create_ad(ad_squad_id: str, account_id: str, **kwargs):\n    raise KeyError("x")\n'
+        )
+        self.assertEqual(self.library.add_client('mock', mock_code, mock_specs, info), 1)
+        self.assertEqual([f.name for f in self.library.functions if f.platform == 'mock'], ['create_campaign'])
+
+    def test_mock_similarity_uses_signature_and_hierarchy(self):
+        """MOCK functions of another hierarchy are only references"""
+        spec = next(s for s in function_specs(self.api_info['tiktok'], 'tiktok', mock_auth=True)
+                    if s.role == 'create_ad')
+        function = LibraryFunction(
+            role=spec.role, name='create_ad', source='def create_ad(ad_squad_id: str, account_id: str, **kwargs):\n    return {}\n',
+            helpers=[], platform='snapchat', mode='MOCK', auth=spec.auth, path='',
+            base_url='', hierarchy_name='ad_squad'
+        )
+        self.assertLess(similarity(spec, function), MOCK_ADAPT_SCORE)
+        function.hierarchy_name, function.signature = spec.hierarchy, spec.signature
+        self.assertEqual(similarity(spec, function), 1.0)
+
+
+class TestFakeLLM(unittest.TestCase):
+    """End-to-end generation against benchmarks/fake_llm.py, without network or API key"""
+
+    def setUp(self):
+        fake_llm = benchmark_module('fake_llm')
+        self.server = fake_llm.create_server('127.0.0.1', 0, fake_llm.FakeLLMSettings(
+            first_token_ms=0, token_latency_ms=0
+        ))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def generate(self, streaming: str, agent: Optional[CodeAgent] = None, platform: str = 'fake_platform') -> str:
+        env = {'API_BASE': f'{self.url}/v1', 'OPENAI_API_KEY': 'fake', 'LLM_STREAMING': streaming}
+        with patch.dict(os.environ, env), tempfile.TemporaryDirectory() as tmp:
+            output_file = (agent or CodeAgent()).generate_api_client(
+                platform=platform,
+                docs_url=f'{self.url}/docs/snapchat',
+                mock_auth=True,
+                output_dir=tmp
+            )
+            with open(output_file, 'r', encoding='utf-8') as f:
+                return f.read()
+
+    def stats(self) -> Dict:
+        with urllib.request.urlopen(f'{self.url}/stats') as response:
+            return json.loads(response.read())
+
+    def assert_working_client(self, code: str):
+        module = {}
+        exec(compile(code, 'fake_platform_api.py', 'exec'), module)
+        self.assertEqual(module['HIERARCHY'], ['campaign', 'ad_squad', 'ad'])
+        events = []
+        result = module['launch_campaign']('acc', {'name': 'C'}, [{'name': 'S'}], [{'name': 'A', 'image_url': 'x'}],
+                                           progress_callback=events.append)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(len(result['ad_ids']), 1)
+        self.assertEqual(events[-1], {'event': 'completed', 'result': result})
+
+    def test_generate_client(self):
+        self.assert_working_client(self.generate('false'))
+        stats = self.stats()
+        self.assertEqual([stats[f'requests.stage{i}'] for i in (1, 2, 3)], [1, 1, 1])
+        self.assertEqual(stats['documents'], 1)
+        self.assertGreater(stats['completion_tokens'], 0)
+
+    def test_generate_client_streaming(self):
+        exporter = tracing.InMemoryExporter()
+        tracing.configure(exporter)
+        try:
+            self.assert_working_client(self.generate('true'))
+        finally:
+            tracing.configure(None)
+        stage3, = exporter.find('llm.stage3')
+        self.assertIn('llm.time_to_first_token_ms', stage3.attributes)
+        self.assertGreater(stage3.attributes['llm.completion_tokens'], 0)
+
+    def test_function_library(self):
+        """The second platform takes all Stage 1 functions from the library, without a Stage 1 LLM call"""
+        env = {'API_BASE': f'{self.url}/v1', 'OPENAI_API_KEY': 'fake'}
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, env):
+                agent = CodeAgent(function_library_path=os.path.join(tmp, 'library.json'))
+            self.assert_working_client(self.generate('false', agent))
+            self.assertEqual(len(agent.library.functions), 6)
+            self.assert_working_client(self.generate('false', agent, platform='other_platform'))
+        stats = self.stats()
+        self.assertEqual([stats[f'requests.stage{i}'] for i in (1, 2, 3)], [1, 2, 2])
+
+
 def run_specific_test(test_class, test_method):
     """Run a specific test method"""
     suite = unittest.TestSuite()
@@ -266,9 +820,13 @@ def run_all_tests():
 
     # Add all test classes
     suite.addTests(loader.loadTestsFromTestCase(TestPlatformDocParser))
+    suite.addTests(loader.loadTestsFromTestCase(TestDocCorpus))
     suite.addTests(loader.loadTestsFromTestCase(TestLLMRemote))
     suite.addTests(loader.loadTestsFromTestCase(TestCodeAgent))
     suite.addTests(loader.loadTestsFromTestCase(TestWorkflowSystem))
+    suite.addTests(loader.loadTestsFromTestCase(TestGenerationProfile))
+    suite.addTests(loader.loadTestsFromTestCase(TestGenerationDaemon))
+    suite.addTests(loader.loadTestsFromTestCase(TestDocumentationCache))
 
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
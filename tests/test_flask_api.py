@@ -0,0 +1,901 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Test suite for the Flask API server
+Uses a fake launcher instead of a generated client
+"""
+import os
+import sys
+import json
+import tempfile
+import threading
+import time
+import types
+import unittest
+from contextlib import closing
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.flask_api import api
+from src.runtime import orchestrator, routes, tracing
+from src.runtime.breaker import BreakerRegistry
+from src.service.client_manifest import build_entry, update_manifest
+
+LAUNCH_PAYLOAD = {
+    'platform': 'mock',
+    'account_id': 'test_account',
+    'campaign': {'name': 'Test Campaign'},
+    'ad_squads': [{'name': 'Squad 1'}],
+    'ads': [{'name': 'Ad 1', 'image_url': 'https://example.com/a.jpg'}],
+}
+
+
+def make_mock_client() -> types.ModuleType:
+    """Build a module shaped like a generated MOCK client"""
+    client = types.ModuleType('mock_api')
+    client.__mode__ = 'MOCK'
+    client.HIERARCHY = ['campaign', 'ad_squad', 'ad']
+    client.create_campaign = lambda account_id, **kwargs: {'id': 'campaign_mock_1', **kwargs}
+    client.create_ad_squad = lambda campaign_id, account_id, **kwargs: {'id': 'squad_mock_1'}
+    client.create_media = lambda account_id, **kwargs: {'id': 'media_mock_1'}
+    client.upload_media = lambda media_id, **kwargs: {'request_status': 'SUCCESS'}
+    client.create_creative = lambda account_id, **kwargs: {'id': 'creative_mock_1'}
+    client.create_ad = lambda ad_squad_id, account_id, **kwargs: {'id': 'ad_mock_1'}
+    return client
+
+
+MOCK_CLIENT = make_mock_client()
+
+MOCK_CLIENT_SOURCE = '''
+import random
+from typing import Dict
+
+__mode__ = 'MOCK'
+HIERARCHY = ['campaign', 'ad_squad', 'ad']
+BASE_URL = 'https://adsapi.example.com/v1'
+VERSION = {version}
+
+
+def create_campaign(account_id: str, **kwargs) -> Dict:
+    return {{'id': f"campaign_mock_{{random.randint(10000, 99999)}}", 'account_id': account_id, **kwargs}}
+
+
+def launch_campaign(account_id, campaign_data, ad_squads_data, ads_data):
+    return {{'status': 'success', 'campaign_id': create_campaign(account_id)['id'], 'version': VERSION}}
+'''
+
+
+# 没有HIERARCHY，第二层级是ad group
+AD_GROUP_CLIENT_SOURCE = '''
+def create_campaign(account_id, **kwargs):
+    return {'id': 'campaign_1'}
+
+
+def create_ad_group(campaign_id, account_id, **kwargs):
+    return {'id': 'group_1'}
+
+
+def create_media(account_id, **kwargs):
+    return {'id': 'media_1'}
+
+
+def upload_media(media_id, **kwargs):
+    return {'request_status': 'SUCCESS'}
+
+
+def create_creative(account_id, **kwargs):
+    return {'id': 'creative_1'}
+
+
+def create_ad(ad_group_id, account_id, **kwargs):
+    return {'id': 'ad_1'}
+
+
+def launch_campaign(account_id, campaign_data, ad_squads_data, ads_data):
+    return {'status': 'success', 'generated': True}
+'''
+
+
+def write_mock_client(clients_dir: str, platform: str, version: int = 1) -> str:
+    """Write a minimal generated MOCK client file"""
+    path = os.path.join(clients_dir, f'{platform}_api.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(MOCK_CLIENT_SOURCE.format(version=version))
+    return path
+
+
+def fake_launcher(data, progress_callback=None):
+    """Launcher driving the mock client through the runtime orchestrator"""
+    return orchestrator.launch_campaign(
+        MOCK_CLIENT,
+        account_id=data['account_id'],
+        campaign_data=data['campaign'],
+        ad_squads_data=data['ad_squads'],
+        ads_data=data['ads'],
+        progress_callback=progress_callback
+    )
+
+
+class FlaskApiTestCase(unittest.TestCase):
+    """Base class: isolated data directory and a 'mock' platform"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        api.app.config['TESTING'] = True
+        api.app.config['JOBS_DB_PATH'] = os.path.join(self.tmp.name, 'jobs.db')
+        api.app.config['IDEMPOTENCY_DB_PATH'] = os.path.join(self.tmp.name, 'idempotency.db')
+        api.app.config['LAUNCH_JOURNAL_PATH'] = os.path.join(self.tmp.name, 'launches.db')
+        api._job_runner = None
+        api._idempotency = None
+        api._launch_journal = None
+        api.LAUNCHERS['mock'] = fake_launcher
+        self.client = api.app.test_client()
+
+    def tearDown(self):
+        if api._job_runner is not None:
+            api._job_runner.close()
+            api._job_runner = None
+        api._batch_launcher = None
+        api._idempotency = None
+        api._launch_journal = None
+        api.LAUNCHERS.pop('mock', None)
+        self.tmp.cleanup()
+
+    def wait_for_job(self, job_id: str, timeout: float = 5.0) -> dict:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.client.get(f'/api/jobs/{job_id}').get_json()
+            if job['status'] in ('succeeded', 'failed'):
+                return job
+            time.sleep(0.02)
+        self.fail(f'Job {job_id} did not finish')
+
+
+class TestHealth(FlaskApiTestCase):
+    """Test the health endpoint"""
+
+    def test_health_reports_open_breakers(self):
+        """/health lists circuit breakers and is degraded while one is open"""
+        original = api.get_breakers
+        breakers = BreakerRegistry(min_calls=1)
+        api.get_breakers = lambda: breakers
+        try:
+            self.assertEqual(self.client.get('/health').get_json()['status'], 'healthy')
+
+            breaker = breakers.get('snapchat', 'POST /v1/adaccounts/{id}/campaigns')
+            breaker.record(False, 30.0)
+            body = self.client.get('/health').get_json()
+        finally:
+            api.get_breakers = original
+
+        self.assertEqual(body['status'], 'degraded')
+        self.assertEqual(body['circuit_breakers'][0]['state'], 'open')
+        self.assertEqual(body['circuit_breakers'][0]['name'], 'snapchat POST /v1/adaccounts/{id}/campaigns')
+
+
+class TestMetrics(FlaskApiTestCase):
+    """Test the /metrics endpoint"""
+
+    def test_metrics_exported(self):
+        """Route latency and launch step latency show up in Prometheus format"""
+        self.client.post('/api/launch-campaign', json=LAUNCH_PAYLOAD)
+        self.client.get('/api/jobs/unknown-job-id')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+
+        self.assertIn('# TYPE ads_http_request_duration_seconds histogram', text)
+        self.assertIn('route="/api/launch-campaign",status="200"', text)
+        self.assertIn('route="/api/jobs/<job_id>",status="404"', text)
+        self.assertNotIn('unknown-job-id', text)
+        self.assertIn('ads_launch_step_duration_seconds_count{platform="mock",entity="campaign"}', text)
+        self.assertIn('ads_launch_step_duration_seconds_count{platform="mock",entity="upload"}', text)
+
+
+class TestTracing(FlaskApiTestCase):
+    """Test that request spans parent the launch steps"""
+
+    def setUp(self):
+        super().setUp()
+        self.exporter = tracing.InMemoryExporter()
+        tracing.configure(self.exporter)
+
+    def tearDown(self):
+        tracing.configure(None)
+        super().tearDown()
+
+    def test_job_steps_join_request_trace(self):
+        """Steps run on the job worker thread belong to the submitting request"""
+        response = self.client.post('/api/jobs', json=LAUNCH_PAYLOAD)
+        self.wait_for_job(response.get_json()['job_id'])
+
+        request_span = self.exporter.find('POST /api/jobs')[0]
+        self.assertEqual(request_span.kind, tracing.SERVER)
+        self.assertEqual(request_span.attributes['http.status_code'], 202)
+        self.assertEqual(response.headers['traceparent'], tracing.traceparent(request_span))
+
+        launch = self.exporter.find('launch_campaign')[0]
+        self.assertEqual(launch.parent_id, request_span.span_id)
+        steps = [s for s in self.exporter.spans if s.name.startswith('launch.')]
+        self.assertEqual([s.name for s in steps],
+                         ['launch.campaign', 'launch.ad_squad', 'launch.media', 'launch.upload',
+                          'launch.creative', 'launch.ad'])
+        self.assertTrue(all(s.parent_id == launch.span_id and s.trace_id == request_span.trace_id for s in steps))
+
+    def test_incoming_traceparent(self):
+        """An upstream traceparent header becomes the parent of the request span"""
+        header = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+        self.client.get('/health', headers={'traceparent': header})
+        span = self.exporter.find('GET /health')[0]
+        self.assertEqual((span.trace_id, span.parent_id), ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'))
+
+
+class TestLaunchJobs(FlaskApiTestCase):
+    """Test the asynchronous launch jobs API"""
+
+    def test_submit_and_poll(self):
+        """POST /api/jobs returns 202 and the job completes in the background"""
+        response = self.client.post('/api/jobs', json=LAUNCH_PAYLOAD)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job_id']
+
+        job = self.wait_for_job(job_id)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result']['campaign_id'], 'campaign_mock_1')
+        self.assertEqual(job['progress'][0]['event'], 'campaign_created')
+        self.assertNotIn('payload', job)
+
+    def test_validation_and_unknown_job(self):
+        """Invalid payloads are rejected and unknown job IDs return 404"""
+        response = self.client.post('/api/jobs', json={'platform': 'mock'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/jobs', json={**LAUNCH_PAYLOAD, 'platform': 'nope'})
+        self.assertEqual(response.status_code, 404)
+
+        self.assertEqual(self.client.get('/api/jobs/missing').status_code, 404)
+
+    def test_jobs_survive_restart(self):
+        """Queued jobs are resumed and running jobs are failed after a restart"""
+        store = api.JobStore(api.app.config['JOBS_DB_PATH'])
+        queued = store.create('mock', LAUNCH_PAYLOAD)
+        running = store.create('mock', LAUNCH_PAYLOAD)
+        store.update(running, status='running')
+
+        self.assertEqual(self.wait_for_job(queued)['status'], 'succeeded')
+        job = self.wait_for_job(running)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('restart', job['error'])
+
+    def test_job_claimed_once(self):
+        """Only one worker process can claim a queued job"""
+        store = api.JobStore(api.app.config['JOBS_DB_PATH'])
+        job_id = store.create('mock', LAUNCH_PAYLOAD)
+        other_worker = api.JobStore(api.app.config['JOBS_DB_PATH'])
+
+        self.assertTrue(store.claim(job_id))
+        self.assertFalse(other_worker.claim(job_id))
+        self.assertEqual(store.get(job_id)['status'], 'running')
+
+    def test_expired_lease_reclaimed(self):
+        """A running job without heartbeats can be claimed and run by another worker"""
+        store = api.JobStore(api.app.config['JOBS_DB_PATH'], lease_timeout=60)
+        job_id = store.create('mock', LAUNCH_PAYLOAD)
+        self.assertTrue(store.claim(job_id))
+        self.assertFalse(store.claim(job_id))
+
+        # 心跳续期后仍然不能被接手
+        store.heartbeat([job_id])
+        self.assertEqual(store.list_expired(), [])
+
+        # 崩溃的worker不再续期
+        with closing(store._connect()) as conn, conn:
+            conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (time.time() - 120, job_id))
+        self.assertEqual([job['id'] for job in store.list_expired()], [job_id])
+
+        # 作为应用的runner，wait_for_job 不会再创建一个执行 fail_interrupted 的runner
+        runner = api._job_runner = api.JobRunner(store, max_workers=1)
+        runner.recover(api.resolve_launcher, fail_interrupted=False)
+        job = self.wait_for_job(job_id)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result']['campaign_id'], 'campaign_mock_1')
+
+    def test_workers_do_not_fail_running_jobs(self):
+        """A worker started with JOBS_RECOVER_INTERRUPTED off leaves running jobs alone"""
+        store = api.JobStore(api.app.config['JOBS_DB_PATH'])
+        running = store.create('mock', LAUNCH_PAYLOAD)
+        store.update(running, status='running')
+
+        api.app.config['JOBS_RECOVER_INTERRUPTED'] = False
+        try:
+            api.get_job_runner()
+        finally:
+            api.app.config['JOBS_RECOVER_INTERRUPTED'] = True
+        self.assertEqual(store.get(running)['status'], 'running')
+
+
+class TestLaunchStream(FlaskApiTestCase):
+    """Test progress streaming of launch-campaign"""
+
+    EXPECTED_EVENTS = [
+        'campaign_created', 'ad_squad_created', 'media_created',
+        'media_uploaded', 'creative_created', 'ad_created', 'completed'
+    ]
+
+    def test_ndjson_stream(self):
+        """One NDJSON line per completed step, ending with the result"""
+        response = self.client.post('/api/launch-campaign/stream', json=LAUNCH_PAYLOAD)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([e['event'] for e in events], self.EXPECTED_EVENTS)
+        self.assertEqual(events[-1]['result']['status'], 'success')
+
+    def test_sse_stream(self):
+        """Accept: text/event-stream switches to Server-Sent Events"""
+        response = self.client.post(
+            '/api/launch-campaign/stream',
+            json=LAUNCH_PAYLOAD,
+            headers={'Accept': 'text/event-stream'}
+        )
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertIn('event: campaign_created\ndata: ', body)
+        self.assertTrue(body.rstrip().split('\n')[-2].startswith('event: completed'))
+
+    def test_partial_failure_events(self):
+        """A failing step is reported and the launch ends as partial"""
+        def broken_launcher(data, progress_callback=None):
+            client = make_mock_client()
+            client.create_creative = lambda account_id, **kwargs: 1 / 0
+            return orchestrator.launch_campaign(
+                client, data['account_id'], data['campaign'],
+                data['ad_squads'], data['ads'], progress_callback=progress_callback
+            )
+
+        api.LAUNCHERS['mock'] = broken_launcher
+        response = self.client.post('/api/launch-campaign/stream', json=LAUNCH_PAYLOAD)
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        failed = [e for e in events if e['event'] == 'step_failed']
+        self.assertEqual(failed[0]['step'], 'create_creative')
+        self.assertEqual(events[-1]['result']['status'], 'partial')
+
+    def test_media_type_and_field_split(self):
+        """Media type comes from the ad; creative and ad get their own fields"""
+        client = make_mock_client()
+        calls = {}
+
+        def recorder(name, response):
+            def create(*args, **kwargs):
+                calls[name] = kwargs
+                return response
+            return create
+
+        client.create_media = recorder('media', {'id': 'm1'})
+        client.create_creative = recorder('creative', {'id': 'c1'})
+        client.create_ad = recorder('ad', {'id': 'a1'})
+        ad = {'name': 'Ad 1', 'headline': 'Sale', 'status': 'PAUSED', 'media_type': 'video',
+              'image_url': 'https://example.com/a.mp4', 'ad_squad_index': 0}
+        result = orchestrator.launch_campaign(client, 'acc', {'name': 'C'}, [{'name': 'S'}], [ad])
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(calls['media'], {'name': 'Ad 1', 'type': 'VIDEO'})
+        self.assertEqual(calls['creative'], {'media_id': 'm1', 'name': 'Ad 1', 'headline': 'Sale'})
+        self.assertEqual(calls['ad'], {'creative_id': 'c1', 'name': 'Ad 1', 'status': 'PAUSED'})
+
+
+class TestBatchLaunch(FlaskApiTestCase):
+    """Test the bulk launch endpoint"""
+
+    def test_results_in_order_with_partial_failure(self):
+        """Each item gets its own result; failures do not affect other items"""
+        def failing_launcher(data, progress_callback=None):
+            raise RuntimeError('platform down')
+
+        api.LAUNCHERS['broken'] = failing_launcher
+        try:
+            launches = [
+                LAUNCH_PAYLOAD,
+                {**LAUNCH_PAYLOAD, 'platform': 'broken'},
+                {'platform': 'mock'},
+                {**LAUNCH_PAYLOAD, 'platform': 'unknown'},
+                LAUNCH_PAYLOAD,
+            ]
+            response = self.client.post('/api/launch-campaigns:batch', json={'launches': launches})
+        finally:
+            api.LAUNCHERS.pop('broken', None)
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual([r['index'] for r in body['results']], [0, 1, 2, 3, 4])
+        self.assertEqual(
+            [r['status'] for r in body['results']],
+            ['success', 'failed', 'failed', 'failed', 'success']
+        )
+        self.assertIn('platform down', body['results'][1]['error'])
+        self.assertIn('Missing required field', body['results'][2]['error'])
+        self.assertEqual(body['summary'], {'total': 5, 'success': 2, 'partial': 0, 'failed': 3})
+
+    def test_per_platform_concurrency_limit(self):
+        """No more than the configured number of launches run at once per platform"""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def slow_launcher(data, progress_callback=None):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+            return {'status': 'success'}
+
+        api.LAUNCHERS['mock'] = slow_launcher
+        api._batch_launcher = api.BatchLauncher(max_workers=8, platform_limits={'mock': 2})
+        response = self.client.post('/api/launch-campaigns:batch', json=[LAUNCH_PAYLOAD] * 10)
+
+        self.assertEqual(response.get_json()['summary']['success'], 10)
+        self.assertEqual(state['peak'], 2)
+
+    def test_invalid_item_platform(self):
+        """A platform that is not a non-empty string fails only its own item"""
+        launches = [{**LAUNCH_PAYLOAD, 'platform': ['mock']}, {**LAUNCH_PAYLOAD, 'platform': 7},
+                    {**LAUNCH_PAYLOAD, 'platform': ''}, LAUNCH_PAYLOAD]
+        response = self.client.post('/api/launch-campaigns:batch', json={'launches': launches})
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual([r['status'] for r in results], ['failed', 'failed', 'failed', 'success'])
+        for result in results[:3]:
+            self.assertEqual(result['error'], 'platform must be a non-empty string')
+
+        response = self.client.post('/api/launch-campaign', json={**LAUNCH_PAYLOAD, 'platform': {'name': 'mock'}})
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_batch_rejected(self):
+        """An empty or malformed batch is a 400"""
+        self.assertEqual(self.client.post('/api/launch-campaigns:batch', json={'launches': []}).status_code, 400)
+        self.assertEqual(self.client.post('/api/launch-campaigns:batch', json={}).status_code, 400)
+
+
+class TestIdempotency(FlaskApiTestCase):
+    """Test Idempotency-Key deduplication"""
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+        def counting_launcher(data, progress_callback=None):
+            self.calls.append(data)
+            self.release.wait(5)
+            return {'status': 'success', 'campaign_id': f'campaign_{len(self.calls)}'}
+
+        api.LAUNCHERS['mock'] = counting_launcher
+
+    def post(self, key, payload=None):
+        return self.client.post('/api/launch-campaign', json=payload or LAUNCH_PAYLOAD,
+                                headers={'Idempotency-Key': key})
+
+    def test_completed_result_replayed(self):
+        """A retried request replays the stored result without launching again"""
+        first = self.post('retry-1')
+        second = self.post('retry-1')
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(second.get_json(), first.get_json())
+        self.assertNotIn('Idempotent-Replayed', first.headers)
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+
+        self.post('retry-2')
+        self.client.post('/api/launch-campaign', json=LAUNCH_PAYLOAD)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_concurrent_duplicates_coalesce(self):
+        """Concurrent requests with the same key share one execution"""
+        self.release.clear()
+        responses = []
+
+        def send():
+            with api.app.test_client() as client:
+                responses.append(client.post('/api/launch-campaign', json=LAUNCH_PAYLOAD,
+                                             headers={'Idempotency-Key': 'same'}))
+
+        threads = [threading.Thread(target=send) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        self.release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual({r.get_json()['campaign_id'] for r in responses}, {'campaign_1'})
+        self.assertEqual(sum('Idempotent-Replayed' in r.headers for r in responses), 4)
+
+    def test_key_reused_with_different_body(self):
+        """Reusing a key for a different request is a 422"""
+        self.post('reused')
+        response = self.post('reused', {**LAUNCH_PAYLOAD, 'account_id': 'other'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_server_errors_not_stored(self):
+        """A failed execution can be retried with the same key"""
+        def flaky_launcher(data, progress_callback=None):
+            self.calls.append(data)
+            if len(self.calls) == 1:
+                raise RuntimeError('platform timeout')
+            return {'status': 'success'}
+
+        api.LAUNCHERS['mock'] = flaky_launcher
+        self.assertEqual(self.post('flaky').status_code, 500)
+        self.assertEqual(self.post('flaky').status_code, 200)
+        self.assertEqual(self.post('flaky').headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_expired_and_in_progress_keys(self):
+        """Keys held by another process get a 409; expired results run again"""
+        store = api.get_idempotency().store
+        store.claim('elsewhere', 'hash')
+        self.assertEqual(self.post('elsewhere').status_code, 409)
+
+        self.post('old')
+        store.ttl = 0
+        self.post('old')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_conflicts_not_stored(self):
+        """A 409 is not a final outcome: the claim is released and the retry runs"""
+        manager = api.get_idempotency()
+        status, _, replayed = manager.run('busy', 'hash', lambda: (409, {'error': 'Launch launch-1 is in progress'}))
+        self.assertEqual((status, replayed), (409, False))
+        self.assertIsNone(manager.store.get('busy'))
+
+        self.assertEqual(manager.run('busy', 'hash', lambda: (201, {'status': 'success'})), (201, {'status': 'success'}, False))
+        self.assertEqual(manager.run('busy', 'hash', lambda: (500, {}))[0], 201)
+
+    def test_job_submission_deduplicated(self):
+        """Resubmitting a job with the same key returns the same job ID"""
+        headers = {'Idempotency-Key': 'job-1'}
+        first = self.client.post('/api/jobs', json=LAUNCH_PAYLOAD, headers=headers)
+        second = self.client.post('/api/jobs', json=LAUNCH_PAYLOAD, headers=headers)
+
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(first.get_json()['job_id'], second.get_json()['job_id'])
+        self.wait_for_job(first.get_json()['job_id'])
+        self.assertEqual(len(self.calls), 1)
+
+
+class TestPlatformRegistry(FlaskApiTestCase):
+    """Test auto-discovered platform routes"""
+
+    def setUp(self):
+        super().setUp()
+        self.clients_dir = os.path.join(self.tmp.name, 'generated_clients')
+        os.makedirs(self.clients_dir)
+        write_mock_client(self.clients_dir, 'acme')
+        self.original_registry = api.registry
+        # 和 api.registry 一样使用投放日志
+        api.registry = api.PlatformRegistry(self.clients_dir, journal=api.get_launch_journal)
+
+    def tearDown(self):
+        api.registry = self.original_registry
+        super().tearDown()
+
+    def test_discovery_is_lazy(self):
+        """Clients are discovered at startup but imported on first use"""
+        self.assertEqual(api.registry.platforms(), ['acme'])
+        self.assertNotIn('acme', api.registry._modules)
+
+        module = api.registry.get_module('acme')
+        self.assertIs(api.registry.get_module('acme'), module)
+
+    def test_platform_route(self):
+        """/api/<platform>/launch-campaign calls the generated launch_campaign"""
+        response = self.client.post('/api/acme/launch-campaign', json=LAUNCH_PAYLOAD)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'success')
+
+        response = self.client.post('/api/launch-campaign', json={**LAUNCH_PAYLOAD, 'platform': 'acme'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/api/unknown/launch-campaign', json=LAUNCH_PAYLOAD)
+        self.assertEqual(response.status_code, 404)
+
+    def rewrite(self, platform: str, version: int = None, source: str = None):
+        """Rewrite a client file and make sure its mtime changes"""
+        path = os.path.join(self.clients_dir, f'{platform}_api.py')
+        mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+        if source is None:
+            write_mock_client(self.clients_dir, platform, version)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(source)
+        os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+    def test_hot_reload(self):
+        """A regenerated client replaces the old one without a restart"""
+        api.registry.reload_interval = 0
+        old = api.registry.get_module('acme')
+        self.assertEqual(old.VERSION, 1)
+
+        self.rewrite('acme', version=2)
+        new = api.registry.get_module('acme')
+        self.assertEqual(new.VERSION, 2)
+        self.assertIsNot(old, new)
+        # 旧版本仍可完成正在运行的请求
+        self.assertEqual(old.launch_campaign('a', {}, [], [])['version'], 1)
+
+        response = self.client.post('/api/acme/launch-campaign', json=LAUNCH_PAYLOAD)
+        self.assertEqual(response.get_json()['version'], 2)
+
+    def test_invalid_reload_keeps_previous_version(self):
+        """A broken regeneration does not replace the working client"""
+        api.registry.reload_interval = 0
+        api.registry.get_module('acme')
+
+        self.rewrite('acme', source='def launch_campaign(:\n')
+        self.assertEqual(api.registry.get_module('acme').VERSION, 1)
+
+        self.rewrite('acme', source='VERSION = 3\n')
+        self.assertEqual(api.registry.get_module('acme').VERSION, 1)
+
+    def test_reload_checks_are_throttled(self):
+        """Within reload_interval the file is not checked again"""
+        api.registry.reload_interval = 3600
+        api.registry.get_module('acme')
+        self.rewrite('acme', version=2)
+        self.assertEqual(api.registry.get_module('acme').VERSION, 1)
+
+    def test_platforms_listing_from_manifest(self):
+        """/api/platforms serves manifest metadata with ETag revalidation"""
+        api.registry.reload_interval = 0
+        path = os.path.join(self.clients_dir, 'acme_api.py')
+        with open(path, 'r', encoding='utf-8') as f:
+            code = f.read()
+        update_manifest(self.clients_dir, build_entry('acme', path, code, 'https://docs.acme.com', True))
+
+        response = self.client.get('/api/platforms')
+        etag = response.headers['ETag']
+        acme = response.get_json()['platforms'][0]
+        self.assertEqual(acme['name'], 'acme')
+        self.assertEqual(acme['mode'], 'MOCK')
+        self.assertEqual(acme['docs_url'], 'https://docs.acme.com')
+        self.assertEqual(acme['functions'], ['create_campaign', 'launch_campaign'])
+        self.assertTrue(acme['content_hash'].startswith('sha256:'))
+
+        response = self.client.get('/api/platforms', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        # 新生成的客户端更新manifest后缓存失效
+        write_mock_client(self.clients_dir, 'newco')
+        path = os.path.join(self.clients_dir, 'newco_api.py')
+        update_manifest(self.clients_dir, build_entry('newco', path, code, 'https://docs.newco.com', False))
+        os.utime(os.path.join(self.clients_dir, 'manifest.json'), ns=(1, 1))
+
+        response = self.client.get('/api/platforms', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['name'] for p in response.get_json()['platforms']], ['acme', 'newco'])
+
+    def test_concurrent_manifest_updates(self):
+        """Daemon workers saving clients at the same time keep every entry"""
+        names = [f'p{i}' for i in range(8)]
+        threads = [threading.Thread(target=update_manifest, args=(self.clients_dir, build_entry(
+            name, os.path.join(self.clients_dir, f'{name}_api.py'), '', 'https://docs.example.com', True
+        ))) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with open(os.path.join(self.clients_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.assertEqual(sorted(json.load(f)['platforms']), names)
+        self.assertEqual([n for n in os.listdir(self.clients_dir) if n.endswith('.tmp')], [])
+
+    def test_documented_routes_registered(self):
+        """Loading a client registers its manifest routes for naming outbound requests"""
+        path = os.path.join(self.clients_dir, 'acme_api.py')
+        with open(path, 'r', encoding='utf-8') as f:
+            code = f.read()
+        update_manifest(self.clients_dir, build_entry(
+            'acme', path, code, 'https://docs.acme.com', False,
+            routes=['POST /v1/adaccounts/{ad_account_id}/campaigns']
+        ))
+        self.addCleanup(routes.register, 'acme', [])
+        api.registry.get_module('acme')
+
+        self.assertEqual(routes.match_route('acme', 'POST', 'https://api.acme.com/v1/adaccounts/42/campaigns'),
+                         'POST /v1/adaccounts/{ad_account_id}/campaigns')
+        listing = json.loads(api.registry.listing()[0])
+        self.assertNotIn('routes', listing['platforms'][0])
+
+    def test_generated_launch_campaign_called(self):
+        """Without a client launch_id the generated launch_campaign runs, whatever its hierarchy"""
+        self.rewrite('acme', source=AD_GROUP_CLIENT_SOURCE)
+        api.registry.reload_interval = 0
+
+        response = self.client.post('/api/acme/launch-campaign', json=LAUNCH_PAYLOAD)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {'status': 'success', 'generated': True})
+        self.assertIsNone(api._launch_journal)
+
+        # 客户端指定launch_id时由编排器执行，第二层级从 create_ad_group 推断
+        response = self.client.post('/api/acme/launch-campaign', json={**LAUNCH_PAYLOAD, 'launch_id': 'L1'})
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['ad_group_ids'], ['group_1'])
+        self.assertEqual(self.client.get('/api/launches/L1').get_json()['status'], 'success')
+
+    def test_generated_launch_streams_progress(self):
+        """A generated launch_campaign with progress_callback serves the stream itself"""
+        self.rewrite('acme', source=AD_GROUP_CLIENT_SOURCE.replace(
+            "def launch_campaign(account_id, campaign_data, ad_squads_data, ads_data):\n",
+            "def launch_campaign(account_id, campaign_data, ad_squads_data, ads_data, progress_callback=None):\n"
+            "    progress_callback({'event': 'campaign_created', 'campaign_id': 'campaign_1'})\n"
+        ))
+        api.registry.reload_interval = 0
+        response = self.client.post('/api/launch-campaign/stream', json={**LAUNCH_PAYLOAD, 'platform': 'acme'})
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([e['event'] for e in events], ['campaign_created', 'completed'])
+        self.assertEqual(events[-1]['result'], {'status': 'success', 'generated': True})
+
+        # 没有progress_callback参数的launch_campaign: 由编排器报告进度
+        self.rewrite('acme', source=AD_GROUP_CLIENT_SOURCE)
+        response = self.client.post('/api/launch-campaign/stream', json={**LAUNCH_PAYLOAD, 'platform': 'acme'})
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(events[1], {'event': 'ad_group_created', 'index': 0, 'ad_group_id': 'group_1'})
+        self.assertEqual(events[-1]['result']['status'], 'success')
+
+    def test_new_platform_discovered(self):
+        """Clients generated after startup are picked up by a throttled rescan"""
+        api.registry.reload_interval = 0
+        write_mock_client(self.clients_dir, 'newco')
+        response = self.client.post('/api/newco/launch-campaign', json=LAUNCH_PAYLOAD)
+        self.assertEqual(response.status_code, 200)
+
+
+class TestResumableLaunch(FlaskApiTestCase):
+    """Test journaled launches that resume from the failed steps"""
+
+    def setUp(self):
+        super().setUp()
+        self.original_registry = api.registry
+        api.registry = api.PlatformRegistry(self.tmp.name, journal=api.get_launch_journal)
+        api.registry._files['acme'] = 'acme_api.py'
+        api.registry._modules['acme'] = self.client_module = make_mock_client()
+        api.registry.reload_interval = -1
+
+        self.calls = []
+        for name in ('create_campaign', 'create_ad_squad', 'create_media', 'upload_media',
+                     'create_creative', 'create_ad'):
+            setattr(self.client_module, name, self.counted(name, getattr(self.client_module, name)))
+
+    def tearDown(self):
+        api.registry = self.original_registry
+        super().tearDown()
+
+    def counted(self, name, fn):
+        def wrapper(*args, **kwargs):
+            self.calls.append(name)
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def test_resume_skips_created_entities(self):
+        """A partial launch resumes with only the failed steps"""
+        failing = {'creative': True}
+        create_creative = self.client_module.create_creative
+
+        def flaky_creative(account_id, **kwargs):
+            if failing['creative'] and kwargs.get('name') == 'Ad 2':
+                raise RuntimeError('creative rejected')
+            return create_creative(account_id, **kwargs)
+
+        self.client_module.create_creative = flaky_creative
+        payload = {**LAUNCH_PAYLOAD, 'launch_id': 'launch-7', 'ads': [
+            {'name': 'Ad 1', 'image_url': 'https://example.com/a.jpg'},
+            {'name': 'Ad 2', 'image_url': 'https://example.com/b.jpg'},
+        ]}
+
+        result = self.client.post('/api/acme/launch-campaign', json=payload).get_json()
+        self.assertEqual(result['status'], 'partial')
+        launch_id = result['launch_id']
+        self.assertEqual(launch_id, 'launch-7')
+        self.assertEqual(self.calls.count('create_campaign'), 1)
+        self.assertEqual(self.calls.count('create_media'), 2)
+
+        launch = self.client.get(f'/api/launches/{launch_id}').get_json()
+        self.assertEqual(launch['status'], 'partial')
+        self.assertIn('ad:0', launch['entities'])
+        self.assertNotIn('creative:1', launch['entities'])
+
+        failing['creative'] = False
+        self.calls.clear()
+        result = self.client.post(f'/api/launches/{launch_id}/resume').get_json()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(self.calls, ['create_creative', 'create_ad'])
+        self.assertEqual(len(result['ad_ids']), 2)
+
+        # 已成功的投放直接返回保存的结果
+        self.calls.clear()
+        self.client.post(f'/api/launches/{launch_id}/resume')
+        self.assertEqual(self.calls, [])
+
+    def test_resubmit_with_launch_id(self):
+        """Resubmitting with a launch_id reuses entities; a different payload is a 409"""
+        payload = {**LAUNCH_PAYLOAD, 'launch_id': 'launch-42'}
+        self.client.post('/api/acme/launch-campaign', json=payload)
+        self.calls.clear()
+
+        response = self.client.post('/api/acme/launch-campaign', json=payload)
+        self.assertEqual(response.get_json()['status'], 'success')
+        self.assertEqual(self.calls, [])
+
+        response = self.client.post('/api/acme/launch-campaign', json={**payload, 'account_id': 'other'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.post('/api/launches/unknown/resume').status_code, 404)
+
+    def test_server_assigned_launch_id(self):
+        """Without a client launch_id the server assigns one that can be resumed"""
+        create_ad = self.client_module.create_ad
+
+        def rejected_ad(ad_squad_id, account_id, **kwargs):
+            raise RuntimeError('ad rejected')
+
+        self.client_module.create_ad = rejected_ad
+        result = self.client.post('/api/acme/launch-campaign', json=LAUNCH_PAYLOAD).get_json()
+        self.assertEqual(result['status'], 'partial')
+        launch_id = result['launch_id']
+        self.assertEqual(self.client.get(f'/api/launches/{launch_id}').get_json()['status'], 'partial')
+
+        self.client_module.create_ad = create_ad
+        self.calls.clear()
+        result = self.client.post(f'/api/launches/{launch_id}/resume').get_json()
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['launch_id'], launch_id)
+        self.assertNotIn('create_campaign', self.calls)
+
+        # 另一次投放分配新的launch_id
+        self.assertNotEqual(self.client.post('/api/acme/launch-campaign', json=LAUNCH_PAYLOAD).get_json()['launch_id'],
+                            launch_id)
+
+    def test_running_launch_conflicts(self):
+        """begin() refuses a launch that is still running: 409 without calling the platform"""
+        payload = {**LAUNCH_PAYLOAD, 'launch_id': 'L9'}
+        api.get_launch_journal().begin('L9', 'acme', payload)
+        response = self.client.post('/api/acme/launch-campaign', json=payload)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('still running', response.get_json()['error'])
+        self.assertEqual(self.client.post('/api/launches/L9/resume').status_code, 409)
+        self.assertEqual(self.calls, [])
+
+    def test_unexpected_error_finishes_launch(self):
+        """An exception outside the steps marks the launch failed instead of leaving it running"""
+        def broken_callback(event):
+            raise RuntimeError('progress consumer gone')
+
+        launcher = api.registry.launcher('acme')
+        payload = {**LAUNCH_PAYLOAD, 'launch_id': 'L1'}
+        with self.assertRaises(RuntimeError):
+            launcher(payload, progress_callback=broken_callback)
+
+        launch = self.client.get('/api/launches/L1').get_json()
+        self.assertEqual(launch['status'], 'failed')
+        self.assertEqual(launch['result']['errors'], ['RuntimeError: progress consumer gone'])
+
+        # 不需要等 lock_timeout 就可以恢复，已创建的campaign直接复用
+        self.calls.clear()
+        result = self.client.post('/api/launches/L1/resume').get_json()
+        self.assertEqual(result['status'], 'success')
+        self.assertNotIn('create_campaign', self.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Import time regression test
+Runs `python -X importtime` in a fresh interpreter and checks that the CLI
+and the Flask server do not load heavy dependencies at import time.
+
+Budgets (milliseconds, cumulative import time of the module) can be raised
+on slow machines with IMPORT_TIME_BUDGET_SCALE=2.
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在真正生成代码时需要的依赖
+HEAVY_MODULES = ('langchain_openai', 'langchain_core', 'openai', 'bs4', 'requests')
+
+BUDGET_SCALE = float(os.getenv('IMPORT_TIME_BUDGET_SCALE', 1))
+
+
+def import_times(*args: str) -> dict:
+    """Run python -X importtime with args; return {module: cumulative ms}"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=ROOT, capture_output=True, text=True, timeout=60
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    """CLI and server startup stay fast"""
+
+    def test_cli_help_skips_generation_dependencies(self):
+        """python -m src.main --help does not import langchain, bs4 or requests"""
+        times = import_times('-m', 'src.main', '--help')
+        loaded = [name for name in HEAVY_MODULES if name in times]
+        self.assertEqual(loaded, [])
+
+    def test_cli_import_budget(self):
+        times = import_times('-c', 'import src.main')
+        self.assertIn('src.main', times)
+        self.assertLess(times['src.main'], 250 * BUDGET_SCALE)
+
+    def test_server_import_budget(self):
+        """The Flask app imports generated clients and generation code lazily"""
+        times = import_times('-c', 'import src.flask_api.api')
+        loaded = [name for name in HEAVY_MODULES if name in times]
+        self.assertEqual(loaded, [])
+        self.assertLess(times['src.flask_api.api'], 1000 * BUDGET_SCALE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,616 @@
+# @Home    : www.pi-apple.com
+# @Author  : Leon
+# @Email   : 88978827@qq.com
+"""
+Test suite for the shared client runtime (src/runtime)
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.runtime import base_url, http, media_upload, routes, tracing
+from src.runtime.breaker import BreakerRegistry, CircuitBreaker, endpoint_key
+from src.runtime.metrics import Registry
+from src.runtime.rate_limit import RateLimiter, TokenBucket, retry_delay
+
+
+class FakeDownload:
+    """Streaming download response producing size bytes in small chunks"""
+
+    def __init__(self, size: int, chunk: int = 1000):
+        self.size = size
+        self.chunk = chunk
+        self.headers = {'Content-Length': str(size), 'Content-Type': 'video/mp4'}
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        sent = 0
+        while sent < self.size:
+            n = min(self.chunk, self.size - sent)
+            sent += n
+            yield b'x' * n
+
+    def close(self):
+        self.closed = True
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.payload = payload
+        self.text = str(payload)
+        self.headers = {}
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Records every POST and consumes streamed bodies chunk by chunk"""
+
+    def __init__(self, download: FakeDownload):
+        self.download = download
+        self.posts = []
+
+    def get(self, url, stream=False, timeout=None):
+        return self.download
+
+    def request(self, method, url, **kwargs):
+        # http.request 发送的上传请求
+        return self.post(url, **kwargs)
+
+    def post(self, url, headers=None, data=None, files=None, timeout=None):
+        record = {'url': url, 'headers': headers, 'files': files, 'bytes': 0, 'max_chunk': 0}
+        if data is not None:
+            record['length'] = len(data) if hasattr(data, '__len__') else None
+            for chunk in data:
+                record['bytes'] += len(chunk)
+                record['max_chunk'] = max(record['max_chunk'], len(chunk))
+        self.posts.append(record)
+
+        if url.endswith('action=INIT'):
+            return FakeResponse({
+                'upload_id': 'up_1',
+                'add_path': '/us/v1/media/m1/multipart-upload-v2?action=ADD',
+                'finalize_path': '/us/v1/media/m1/multipart-upload-v2?action=FINALIZE',
+            })
+        return FakeResponse({'request_status': 'SUCCESS'})
+
+
+class TestMediaUpload(unittest.TestCase):
+    """Test streaming and chunked media upload"""
+
+    def test_small_file_streams_single_request(self):
+        """Small files are piped into one multipart request with a Content-Length"""
+        download = FakeDownload(50_000)
+        session = FakeSession(download)
+
+        result = media_upload.upload_media_from_url(
+            'https://adsapi.snapchat.com/v1', 'm1', 'https://cdn.example.com/a.mp4',
+            headers={'Authorization': 'Bearer t'}, session=session
+        )
+
+        self.assertEqual(result['request_status'], 'SUCCESS')
+        self.assertEqual(len(session.posts), 1)
+        post = session.posts[0]
+        self.assertEqual(post['url'], 'https://adsapi.snapchat.com/v1/media/m1/upload')
+        self.assertTrue(post['headers']['Content-Type'].startswith('multipart/form-data; boundary='))
+        self.assertEqual(post['length'], post['bytes'])
+        self.assertLessEqual(post['max_chunk'], 1000)
+        self.assertTrue(download.closed)
+
+    def test_large_file_uses_chunked_protocol(self):
+        """Large files go through INIT -> ADD x N -> FINALIZE with bounded parts"""
+        session = FakeSession(FakeDownload(25_000))
+        original = media_upload.MULTIPART_THRESHOLD
+        media_upload.MULTIPART_THRESHOLD = 10_000
+        try:
+            media_upload.upload_media_from_url(
+                'https://adsapi.snapchat.com/v1', 'm1', 'https://cdn.example.com/a.mp4',
+                session=session
+            )
+        finally:
+            media_upload.MULTIPART_THRESHOLD = original
+        self.assertTrue(session.posts[0]['url'].endswith('action=INIT'))
+        self.assertTrue(session.posts[-1]['url'].endswith('action=FINALIZE'))
+
+        session = FakeSession(FakeDownload(25_000))
+        media_upload.chunked_upload(
+            'https://adsapi.snapchat.com/v1', 'm1', 'https://cdn.example.com/a.mp4',
+            part_size=10_000, session=session
+        )
+
+        urls = [p['url'] for p in session.posts]
+        self.assertTrue(urls[0].endswith('/v1/media/m1/multipart-upload-v2?action=INIT'))
+        self.assertEqual(session.posts[0]['files']['number_of_parts'], (None, '3'))
+        self.assertEqual(urls[1:4], ['https://adsapi.snapchat.com/us/v1/media/m1/multipart-upload-v2?action=ADD'] * 3)
+        self.assertTrue(urls[4].endswith('action=FINALIZE'))
+
+        part_sizes = [len(p['files']['file'][1]) for p in session.posts[1:4]]
+        self.assertEqual(part_sizes, [10_000, 10_000, 5_000])
+
+    def test_uploads_go_through_runtime(self):
+        """Every upload request is an outbound call: span, platform from the URL host, metrics"""
+        exporter = tracing.InMemoryExporter()
+        tracing.configure(exporter)
+        try:
+            media_upload.chunked_upload(
+                'https://adsapi.snapchat.com/v1', 'm1', 'https://cdn.example.com/a.mp4',
+                part_size=10_000, session=FakeSession(FakeDownload(25_000)), account_id='acc_1'
+            )
+        finally:
+            tracing.configure(None)
+        spans = [span for span in exporter.spans if span.kind == tracing.CLIENT]
+        self.assertEqual(len(spans), 5)
+        self.assertEqual({span.attributes['platform'] for span in spans}, {'snapchat'})
+        self.assertEqual(media_upload.platform_of('https://business-api.tiktok.com/open_api/v1.3'), 'tiktok')
+
+    def test_platform_of_override_target(self):
+        """An override target resolves to the platform it replaces; other IP hosts are 'unknown'"""
+        base_url._overrides = base_url.parse_overrides('https://adsapi.snapchat.com=http://127.0.0.1:5200')
+        try:
+            self.assertEqual(media_upload.platform_of('http://127.0.0.1:5200/v1'), 'snapchat')
+            self.assertEqual(media_upload.platform_of('http://127.0.0.1:5300/v1'), 'unknown')
+            self.assertEqual(media_upload.platform_of('http://localhost:5200/v1'), 'unknown')
+        finally:
+            base_url._overrides = None
+
+    def test_default_session_per_thread(self):
+        """Uploads without a session use the runtime's per-thread session, like http.request"""
+        sessions = []
+        worker = threading.Thread(target=lambda: sessions.append(media_upload.get_session()))
+        worker.start()
+        worker.join()
+        self.assertIs(media_upload.get_session(), http.get_session())
+        self.assertIsNot(sessions[0], http.get_session())
+
+
+class ThrottledSession:
+    """Returns 429 for the first `throttled` requests, then 200"""
+
+    def __init__(self, throttled: int, headers=None):
+        self.throttled = throttled
+        self.headers = headers or {'Retry-After': '0.05'}
+        self.calls = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls.append(time.monotonic())
+        response = FakeResponse({'request_status': 'SUCCESS'})
+        response.headers = {}
+        if len(self.calls) <= self.throttled:
+            response.status_code = 429
+            response.headers = self.headers
+        return response
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test the outbound token-bucket rate limiter"""
+
+    def test_bucket_allows_burst_then_waits(self):
+        """A bucket hands out burst tokens immediately, then refills at rate"""
+        bucket = TokenBucket(rate=20, burst=3)
+        for _ in range(3):
+            self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+
+        start = time.monotonic()
+        self.assertTrue(bucket.acquire())
+        self.assertGreater(time.monotonic() - start, 0.03)
+
+    def test_buckets_keyed_by_platform_and_account(self):
+        """Accounts have separate buckets and platforms have separate limits"""
+        limiter = RateLimiter(limits={'snapchat': (1, 1)}, default_limit=(1, 2))
+        self.assertTrue(limiter.acquire('snapchat', 'acc1', timeout=0))
+        self.assertFalse(limiter.acquire('snapchat', 'acc1', timeout=0))
+        self.assertTrue(limiter.acquire('snapchat', 'acc2', timeout=0))
+        self.assertTrue(limiter.acquire('pinterest', 'acc1', timeout=0))
+        self.assertTrue(limiter.acquire('pinterest', 'acc1', timeout=0))
+
+    def test_retry_delay_headers(self):
+        """Retry-After and exhausted rate-limit headers pause the bucket"""
+        self.assertEqual(retry_delay(429, {'Retry-After': '2'}), 2.0)
+        self.assertEqual(retry_delay(429, {}), 1.0)
+        self.assertIsNone(retry_delay(200, {'X-RateLimit-Remaining': '5'}))
+        self.assertEqual(retry_delay(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '3'}), 3.0)
+        reset_at = str(int(time.time()) + 60)
+        self.assertAlmostEqual(retry_delay(200, {'RateLimit-Remaining': '0', 'RateLimit-Reset': reset_at}), 60, delta=2)
+
+    def test_request_retries_after_429(self):
+        """request() waits for Retry-After and retries throttled calls"""
+        limiter = RateLimiter(default_limit=(100, 100))
+        session = ThrottledSession(throttled=2)
+
+        response = http.request('POST', 'https://adsapi.example.com/v1/campaigns', platform='snapchat',
+                                account_id='acc1', session=session, limiter=limiter)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(session.calls), 3)
+        self.assertGreaterEqual(session.calls[2] - session.calls[0], 0.09)
+
+        session = ThrottledSession(throttled=10)
+        response = http.request('POST', 'https://adsapi.example.com/v1/campaigns', platform='snapchat',
+                                session=session, limiter=limiter, max_retries=1)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(session.calls), 2)
+
+    def test_in_flight_limit(self):
+        """No more than max_in_flight requests run at once per platform"""
+        limiter = RateLimiter(default_limit=(1000, 1000), max_in_flight={'snapchat': 2})
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def call():
+            with limiter.slot('snapchat'):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.02)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(max(peak), 2)
+
+    def test_sqlite_bucket_shared_between_limiters(self):
+        """Limiters using the same database file share one bucket"""
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'rate_limits.db')
+            first = RateLimiter(default_limit=(1, 2), db_path=db_path)
+            second = RateLimiter(default_limit=(1, 2), db_path=db_path)
+
+            self.assertTrue(first.acquire('snapchat', 'acc1', timeout=0))
+            self.assertTrue(second.acquire('snapchat', 'acc1', timeout=0))
+            self.assertFalse(first.acquire('snapchat', 'acc1', timeout=0))
+
+            second.observe('snapchat', 'acc2', 429, {'Retry-After': '30'})
+            self.assertFalse(first.acquire('snapchat', 'acc2', timeout=1))
+
+
+class FailingSession:
+    """Returns the given status codes in order (then repeats the last one)"""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        response = FakeResponse({})
+        response.status_code = self.statuses[min(self.calls, len(self.statuses)) - 1]
+        response.headers = {}
+        return response
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test the per-endpoint circuit breaker"""
+
+    def test_endpoint_key(self):
+        """Entity IDs in request paths are collapsed into {id}"""
+        self.assertEqual(
+            endpoint_key('post', 'https://adsapi.snapchat.com/v1/adaccounts/8f2c91d4-1c2b-4e6a/campaigns'),
+            'POST /v1/adaccounts/{id}/campaigns'
+        )
+        self.assertEqual(
+            endpoint_key('POST', 'https://adsapi.snapchat.com/v1/media/m1/multipart-upload-v2?action=ADD'),
+            'POST /v1/media/m1/multipart-upload-v2'
+        )
+
+    def test_opens_fast_fails_and_recovers(self):
+        """Failures open the breaker; a successful half-open probe closes it"""
+        breaker = CircuitBreaker('snapchat POST /v1/campaigns', min_calls=4, reset_timeout=0.05)
+        for ok in (True, False, False, True):
+            breaker.allow()
+            breaker.record(ok, 0.01)
+        self.assertEqual(breaker.state, 'open')
+
+        start = time.perf_counter()
+        with self.assertRaises(Exception) as ctx:
+            breaker.allow()
+        self.assertLess(time.perf_counter() - start, 0.01)
+        self.assertIn('Circuit open', str(ctx.exception))
+
+        time.sleep(0.06)
+        breaker.allow()
+        with self.assertRaises(Exception):
+            breaker.allow()
+        breaker.record(True, 0.01)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_slow_calls_count_as_failures(self):
+        """Calls slower than slow_call open the breaker like errors"""
+        breaker = CircuitBreaker('x', min_calls=2, slow_call=0.5)
+        breaker.record(True, 1.0)
+        breaker.record(True, 2.0)
+        self.assertEqual(breaker.snapshot()['state'], 'open')
+
+    def test_request_fails_fast_when_open(self):
+        """request() stops sending once the endpoint breaker opens"""
+        breakers = BreakerRegistry(min_calls=3, reset_timeout=60)
+        limiter = RateLimiter(default_limit=(1000, 1000))
+        session = FailingSession(503)
+        url = 'https://adsapi.example.com/v1/adaccounts/8f2c91d4-1c2b/campaigns'
+
+        for _ in range(3):
+            self.assertEqual(http.request('POST', url, platform='snapchat', session=session,
+                                          limiter=limiter, breakers=breakers).status_code, 503)
+        with self.assertRaises(Exception):
+            http.request('POST', url, platform='snapchat', session=session, limiter=limiter, breakers=breakers)
+        self.assertEqual(session.calls, 3)
+
+        # 其他接口不受影响
+        other = FailingSession(200)
+        http.request('GET', 'https://adsapi.example.com/v1/me', platform='snapchat', session=other,
+                     limiter=limiter, breakers=breakers)
+        self.assertEqual(other.calls, 1)
+        self.assertTrue(breakers.any_open())
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the Prometheus metrics registry"""
+
+    def test_counter_render(self):
+        """Counters render one sample per label combination"""
+        registry = Registry()
+        counter = registry.counter('requests_total', 'Requests', ('platform', 'status'))
+        counter.labels('snapchat', 200).inc()
+        counter.labels('snapchat', 200).inc(2)
+        counter.labels('pin"terest', 'error').inc()
+
+        text = registry.render()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{platform="snapchat",status="200"} 3', text)
+        self.assertIn('requests_total{platform="pin\\"terest",status="error"} 1', text)
+        self.assertIs(counter.labels('snapchat', 200), counter.labels('snapchat', '200'))
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Histogram buckets are cumulative and end with +Inf, _sum and _count"""
+        registry = Registry()
+        histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+        child = histogram.labels('/health')
+        for value in (0.05, 0.5, 0.7, 3.0):
+            child.observe(value)
+
+        text = registry.render()
+        self.assertIn('latency_seconds_bucket{route="/health",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="/health",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="/health",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_sum{route="/health"} 4.25', text)
+        self.assertIn('latency_seconds_count{route="/health"} 4', text)
+
+    def test_concurrent_increments(self):
+        """Increments from many threads are not lost"""
+        registry = Registry()
+        child = registry.counter('c_total', 'C', ('x',)).labels('a')
+
+        def work():
+            for _ in range(10000):
+                child.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(child.value, 40000)
+
+    def test_label_count_checked(self):
+        registry = Registry()
+        with self.assertRaises(ValueError):
+            registry.counter('x_total', 'X', ('a', 'b')).labels('only-one')
+
+
+class TestTracing(unittest.TestCase):
+    """Test spans, context propagation and export"""
+
+    def setUp(self):
+        self.exporter = tracing.InMemoryExporter()
+        tracing.configure(self.exporter)
+
+    def tearDown(self):
+        tracing.configure(None)
+
+    def test_nested_spans(self):
+        """Child spans share the trace and point at their parent"""
+        with tracing.span('parent') as parent:
+            with tracing.span('child', step='campaign'):
+                pass
+        child = self.exporter.find('child')[0]
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.parent_id, parent.span_id)
+        self.assertEqual(parent.parent_id, '')
+        self.assertEqual(len(parent.trace_id), 32)
+        self.assertEqual(child.attributes['step'], 'campaign')
+        self.assertIsNone(tracing.current_span())
+
+    def test_error_recorded(self):
+        @tracing.traced('boom')
+        def boom():
+            raise ValueError('bad')
+
+        with self.assertRaises(ValueError):
+            boom()
+        self.assertEqual(self.exporter.find('boom')[0].to_dict()['status']['code'], 'STATUS_CODE_ERROR')
+
+    def test_wrap_propagates_to_threads(self):
+        """Work submitted to another thread via wrap() joins the trace"""
+        with tracing.span('request') as root:
+            plain = threading.Thread(target=lambda: self.exporter.export(tracing.start_span('orphan')[0]))
+
+            def work():
+                with tracing.span('work'):
+                    pass
+
+            worker = threading.Thread(target=tracing.wrap(work))
+            for t in (worker, plain):
+                t.start()
+                t.join()
+        self.assertEqual(self.exporter.find('work')[0].parent_id, root.span_id)
+        self.assertNotEqual(self.exporter.find('orphan')[0].trace_id, root.trace_id)
+
+    def test_outbound_request_span(self):
+        """Every outbound attempt gets a CLIENT span named after its endpoint"""
+        http.request('POST', 'https://adsapi.example.com/v1/adaccounts/123/campaigns',
+                     platform='snap', session=ThrottledSession(1), limiter=RateLimiter(), breakers=BreakerRegistry())
+        throttled, ok = self.exporter.spans
+        self.assertEqual(ok.kind, tracing.CLIENT)
+        self.assertEqual(ok.name, endpoint_key('POST', 'https://adsapi.example.com/v1/adaccounts/123/campaigns'))
+        self.assertEqual(ok.attributes['platform'], 'snap')
+        self.assertEqual((throttled.attributes['http.status_code'], ok.attributes['http.status_code']), (429, 200))
+        self.assertEqual(ok.attributes['retry'], 1)
+
+    def test_json_file_export_and_waterfall(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'traces.jsonl')
+            tracing.configure(tracing.JsonFileExporter(path))
+            with tracing.span('get_api_info'):
+                with tracing.span('extract_schemas'):
+                    pass
+            spans = tracing.load_spans(path)
+        self.assertEqual([s['name'] for s in spans], ['extract_schemas', 'get_api_info'])
+        self.assertEqual(spans[0]['parentSpanId'], spans[1]['spanId'])
+        waterfall = tracing.format_waterfall(spans)
+        self.assertIn('get_api_info', waterfall)
+        self.assertIn('  extract_schemas', waterfall)
+
+    def test_traceparent(self):
+        header = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+        self.assertEqual(tracing.parse_traceparent(header),
+                         ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'))
+        self.assertIsNone(tracing.parse_traceparent('garbage'))
+
+    def test_disabled(self):
+        """Without an exporter spans are no-ops"""
+        tracing.configure(None)
+        with tracing.span('nothing') as span:
+            span.set_attribute('a', 1)
+            self.assertIsNone(tracing.current_span())
+
+
+class TestRoutes(unittest.TestCase):
+    """Test the path-template trie"""
+
+    def setUp(self):
+        self.trie = routes.RouteTrie()
+        self.trie.add('POST', '/v1/adaccounts/{ad_account_id}/campaigns', 'create_campaign')
+        self.trie.add('GET', '/v1/campaigns/{campaign_id}', 'get_campaign')
+        self.trie.add('GET', '/v1/campaigns/stats', 'stats')
+        self.trie.add('GET', '/v1/campaigns/{campaign_id}/stats', 'campaign_stats')
+
+    def test_match(self):
+        self.assertEqual(self.trie.match('post', 'https://adsapi.snapchat.com/v1/adaccounts/8f2c/campaigns?x=1'),
+                         ('/v1/adaccounts/{ad_account_id}/campaigns', 'create_campaign'))
+        # 字面量优先，走不通时回退到参数段
+        self.assertEqual(self.trie.match('GET', '/v1/campaigns/stats')[1], 'stats')
+        self.assertEqual(self.trie.match('GET', '/v1/campaigns/stats/stats')[1], 'campaign_stats')
+        self.assertEqual(self.trie.match('GET', '/v1/campaigns/{campaign_id}')[1], 'get_campaign')
+        self.assertIsNone(self.trie.match('DELETE', '/v1/campaigns/1'))
+        self.assertIsNone(self.trie.match('GET', '/v1/campaigns/1/ads'))
+        self.assertFalse(self.trie.add('GET', '/v1/campaigns/{id}'))
+        self.assertEqual(len(self.trie), 4)
+        self.assertEqual(routes.extract_params('/v1/campaigns/{campaign_id}/stats', '/v1/campaigns/c1/stats'),
+                         {'campaign_id': 'c1'})
+
+    def test_endpoint_key_uses_registered_routes(self):
+        url = 'https://adsapi.snapchat.com/v1/adaccounts/acc_main/campaigns'
+        self.assertEqual(endpoint_key('POST', url, 'routetest'), 'POST /v1/adaccounts/acc_main/campaigns')
+        routes.register('routetest', ['POST /v1/adaccounts/{ad_account_id}/campaigns'])
+        try:
+            self.assertEqual(endpoint_key('POST', url, 'routetest'), 'POST /v1/adaccounts/{ad_account_id}/campaigns')
+            # 未注册的端点按ID形状猜测
+            self.assertEqual(endpoint_key('POST', 'https://adsapi.snapchat.com/v1/media/12345/upload', 'routetest'),
+                             'POST /v1/media/{id}/upload')
+        finally:
+            routes.register('routetest', [])
+        self.assertIsNone(routes.match_route('routetest', 'POST', url))
+
+
+class TestBaseUrlOverride(unittest.TestCase):
+    """Test redirecting generated clients to the stub platform"""
+
+    def setUp(self):
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+        import stub_platform
+        self.server = stub_platform.create_server('127.0.0.1', 0, stub_platform.StubSettings(
+            latency_ms=0, upload_latency_ms=0, rate_limit=20, burst=1
+        ))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.stub_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        base_url._overrides = base_url.parse_overrides(f'https://adsapi.snapchat.com={self.stub_url}')
+
+    def tearDown(self):
+        base_url._overrides = None
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_rewrite(self):
+        self.assertEqual(base_url.rewrite('https://adsapi.snapchat.com/v1/media/1/upload?x=1'),
+                         f'{self.stub_url}/v1/media/1/upload?x=1')
+        self.assertEqual(base_url.rewrite('https://api.pinterest.com/v5/ads'), 'https://api.pinterest.com/v5/ads')
+        self.assertEqual(base_url.parse_overrides('https://a.com=http://b:1, https://c.com/v1=http://d'),
+                         {'https://a.com': 'http://b:1', 'https://c.com': 'http://d'})
+
+    def test_request_reaches_stub(self):
+        """http.request creates entities on the stub and retries its 429s"""
+        limiter = RateLimiter(default_limit=(1000, 1000))
+        url = 'https://adsapi.snapchat.com/v1/adaccounts/acc_1/campaigns'
+        first = http.request('POST', url, platform='stubtest', account_id='acc_1', limiter=limiter,
+                             breakers=BreakerRegistry(), json={'campaigns': [{'name': 'A'}]})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['campaigns'][0]['campaign']['name'], 'A')
+
+        # 桶容量为1: 紧接着的第二个请求先收到429，等待Retry-After后成功
+        second = http.request('POST', url, platform='stubtest', account_id='acc_1', limiter=limiter,
+                              breakers=BreakerRegistry(), json={'campaigns': [{'name': 'B'}]})
+        self.assertEqual(second.status_code, 200)
+        stats = requests.get(f'{self.stub_url}/stats', timeout=5).json()
+        self.assertEqual(stats['POST campaign 200'], 2)
+        self.assertGreaterEqual(stats['POST campaign 429'], 1)
+
+    def test_upload_reaches_stub(self):
+        result = media_upload.upload_media_from_url(
+            'https://adsapi.snapchat.com/v1', 'media_1', f'{self.stub_url}/images/ad.jpg'
+        )
+        self.assertEqual(result['result']['id'], 'media_1')
+        self.assertGreater(result['result']['bytes'], 100 * 1024)
+
+    def test_launch_against_stub(self):
+        """A PRODUCTION-style client launches a full campaign on the stub"""
+        import importlib.util
+        import load_test
+        from src.runtime.orchestrator import launch_campaign
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stubtest_api.py')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(load_test.STUB_CLIENT.format(platform='stubtest'))
+            spec = importlib.util.spec_from_file_location('stubtest_api', path)
+            client = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(client)
+
+        result = launch_campaign(
+            client, 'acc_launch', {'name': 'Stub Campaign'}, [{'name': 'Squad'}],
+            [{'name': 'Ad', 'image_url': f'{self.stub_url}/images/ad.jpg'}]
+        )
+        self.assertEqual(result['status'], 'success', result['errors'])
+        self.assertEqual(len(result['media_ids']), 1)
+        self.assertEqual(len(result['ad_ids']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()